@@ -11,4 +11,5 @@ export interface AuthorizationRequestObject {
   nonce: string;
   wallet_nonce: string | null;
   state: string | null;
+  session_id: string;
 }
@@ -2,4 +2,5 @@ import { FieldRequest } from "~/interfaces/PresentationDefinition/FieldRequest";
 
 export interface FieldSelectionObject {
   field_requests: Array<FieldRequest>;
+  session_id: string | null;
 }
@@ -68,12 +68,16 @@ export async function action({ request }: ActionFunctionArgs) {
 export default function Present() {
   const data = useActionData<typeof action>();
   const definition = data?.presentation_definition;
+  const sessionId = data?.session_id ?? null;
   const submit = useSubmit();
   const navigate = useNavigate();
 
   function handlePresent(event: FormEvent<HTMLFormElement>): void {
     event.preventDefault();
-    const data: SerializeFrom<FieldSelectionObject> = { field_requests: [] };
+    const data: SerializeFrom<FieldSelectionObject> = {
+      field_requests: [],
+      session_id: sessionId,
+    };
     definition?.input_descriptors.forEach((input_descriptor) => {
       input_descriptor.constraints.fields?.map((field) => {
         const formControl = event.currentTarget.elements.namedItem(
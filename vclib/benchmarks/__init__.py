@@ -0,0 +1,7 @@
+"""
+Benchmarks for `vclib`.
+
+Offline performance suites for the library. Each suite can be run as a module
+(e.g. `python -m vclib.benchmarks.sdjwt_vc`) and writes its results as JSON,
+optionally comparing them against a previously saved baseline.
+"""
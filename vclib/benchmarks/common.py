@@ -0,0 +1,241 @@
+"""Helpers shared by the benchmark suites: timing, statistics, JSON reports and
+comparison against a saved baseline."""
+
+import json
+import platform
+import statistics
+import sys
+from argparse import ArgumentParser, Namespace
+from bisect import bisect_left
+from collections.abc import Callable
+from datetime import UTC, datetime
+from importlib.metadata import PackageNotFoundError, version
+from os import cpu_count
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any
+
+# Packages whose versions are recorded alongside results, since they do most of
+# the heavy lifting in the code being measured.
+RECORDED_PACKAGES = ["sd-jwt", "jwcrypto", "cryptography", "fastapi", "pydantic"]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list of samples."""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, round(pct / 100 * len(samples)) - 1))
+    return samples[rank]
+
+
+def summarise(samples_ns: list[int]) -> dict[str, float]:
+    """
+    Summarises a list of timings.
+
+    ### Parameters
+    - samples_ns(`list[int]`): Individual timings, in nanoseconds
+
+    ### Returns
+    - `dict[str, float]`: Summary statistics, in milliseconds (except `n` and
+    `ops_per_sec`)
+    """
+    samples = sorted(s / 1e6 for s in samples_ns)
+    mean = statistics.fmean(samples) if samples else 0.0
+    return {
+        "n": len(samples),
+        "mean_ms": mean,
+        "median_ms": statistics.median(samples) if samples else 0.0,
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "min_ms": samples[0] if samples else 0.0,
+        "max_ms": samples[-1] if samples else 0.0,
+        "stdev_ms": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "ops_per_sec": 1000 / mean if mean else 0.0,
+    }
+
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def histogram(
+    samples_ns: list[int], bounds_ms: list[float] = HISTOGRAM_BOUNDS_MS
+) -> list[dict[str, Any]]:
+    """
+    Counts timings into latency buckets.
+
+    ### Parameters
+    - samples_ns(`list[int]`): Individual timings, in nanoseconds
+    - bounds_ms(`list[float]`): Ascending upper bounds of the buckets, in
+    milliseconds
+
+    ### Returns
+    - `list[dict]`: The number of samples in each bucket, as `{"le_ms": bound,
+    "count": count}`. Samples above the last bound are counted in a final bucket
+    with `le_ms` of `None`.
+    """
+    counts = [0] * (len(bounds_ms) + 1)
+    for sample in samples_ns:
+        counts[bisect_left(bounds_ms, sample / 1e6)] += 1
+    return [
+        {"le_ms": bound, "count": count}
+        for bound, count in zip([*bounds_ms, None], counts, strict=True)
+    ]
+
+
+def measure(fn: Callable[[], Any], *, repeat: int, warmup: int = 1) -> dict[str, float]:
+    """
+    Times repeated calls of `fn`.
+
+    ### Parameters
+    - fn(`() -> Any`): The operation being measured
+    - repeat(`int`): Number of timed calls
+    - warmup(`int = 1`): Number of untimed calls made first
+
+    ### Returns
+    - `dict[str, float]`: See `summarise`
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter_ns()
+        fn()
+        samples.append(perf_counter_ns() - start)
+    return summarise(samples)
+
+
+def environment() -> dict[str, Any]:
+    """Describes the machine and library versions results were recorded on."""
+    packages = {}
+    for package in RECORDED_PACKAGES:
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": cpu_count(),
+        "packages": packages,
+    }
+
+
+def make_report(suite: str, results: list[dict[str, Any]], **extra) -> dict:
+    """Wraps a suite's results with metadata, ready to be written as JSON."""
+    return {
+        "suite": suite,
+        "created_at": datetime.now(tz=UTC).isoformat(),
+        "environment": environment(),
+        **extra,
+        "results": results,
+    }
+
+
+def result_key(result: dict[str, Any]) -> str:
+    """A stable identifier for a result, used to match it against a baseline."""
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+def compare_to_baseline(
+    report: dict,
+    baseline: dict,
+    *,
+    metric: str = "median_ms",
+    threshold: float = 0.1,
+) -> list[dict[str, Any]]:
+    """
+    Compares a report against a baseline report from the same suite.
+
+    ### Parameters
+    - report(`dict`): The report just produced
+    - baseline(`dict`): A previously saved report
+    - metric(`str = "median_ms"`): The statistic to compare. Lower is better.
+    - threshold(`float = 0.1`): Relative change beyond which a result is
+    considered a regression (or an improvement)
+
+    ### Returns
+    - `list[dict]`: One entry per result present in both reports, with the
+    baseline and current values, the relative change, and a `status` of
+    `"regression"`, `"improvement"` or `"unchanged"`.
+    """
+    previous = {result_key(r): r for r in baseline.get("results", [])}
+    comparison = []
+    for result in report["results"]:
+        key = result_key(result)
+        if key not in previous or metric not in previous[key]:
+            continue
+        before = previous[key][metric]
+        after = result[metric]
+        change = (after - before) / before if before else 0.0
+        status = "unchanged"
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improvement"
+        comparison.append(
+            {
+                "key": key,
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "status": status,
+            }
+        )
+    return comparison
+
+
+def add_output_arguments(parser: ArgumentParser):
+    """Adds the output/baseline options every suite accepts."""
+    parser.add_argument(
+        "-o", "--output", type=Path, help="Write the JSON report to this file"
+    )
+    parser.add_argument(
+        "-b", "--baseline", type=Path, help="Compare against a saved JSON report"
+    )
+    parser.add_argument(
+        "--metric",
+        default="median_ms",
+        help="Statistic compared against the baseline (default: median_ms)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown treated as a regression (default: 0.1)",
+    )
+
+
+def write_report(report: dict, args: Namespace) -> int:
+    """
+    Compares a report to a baseline (if one was given on the command line), then
+    writes it to the requested file, or prints it.
+
+    ### Returns
+    - `int`: A process exit code; `1` if any regression was found, otherwise `0`
+    """
+    comparison = []
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        comparison = compare_to_baseline(
+            report, baseline, metric=args.metric, threshold=args.threshold
+        )
+        report["comparison"] = comparison
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+    for c in comparison:
+        print(
+            f"{c['status']:>12} {c['change']:+8.1%} "
+            f"{c['baseline']:10.3f} -> {c['current']:10.3f} {c['metric']} {c['key']}",
+            file=sys.stderr,
+        )
+    return 1 if any(c["status"] == "regression" for c in comparison) else 0
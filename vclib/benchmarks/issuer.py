@@ -0,0 +1,394 @@
+"""
+End-to-end issuance load benchmark for `vclib.issuer.CredentialIssuer`.
+
+Synthetic wallets run the whole OpenID4VCI authorization code flow against the
+example `LicenseIssuer`, loaded with synthetic licence holders, through its ASGI
+app in-process (no network). Each flow goes through the stages:
+- `register`: `POST` to the registration endpoint
+- `authorize`: `GET` the authorization endpoint, fetching the credential form
+- `credential_request`: `POST` the form to the authorization endpoint, getting
+  an authorization code back
+- `token`: exchanging the code for an access token
+- `credential`: requesting the credential, which may be deferred
+- `deferred_credential`: collecting a deferred credential
+
+For each concurrency level, every stage reports latency percentiles, a latency
+histogram and its error rate, and the `flow` result reports the end-to-end
+latency and throughput (completed flows per second of wall time). A flow stops
+at the first stage that fails.
+
+Usage:
+```
+python -m vclib.benchmarks.issuer -o results.json
+python -m vclib.benchmarks.issuer --concurrency 1 16 64 --flows 500 --deferred 0.5
+```
+"""
+
+import asyncio
+import json
+import sys
+from argparse import ArgumentParser
+from base64 import urlsafe_b64encode
+from collections import Counter
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, override
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from vclib.issuer import StatusResponse
+from vclib.issuer.examples.demo_license import LicenseIssuer
+
+from .common import (
+    add_output_arguments,
+    histogram,
+    make_report,
+    summarise,
+    write_report,
+)
+
+SUITE = "issuer"
+
+CREDENTIAL_TYPE = "DriversLicense"
+DEMO_DATA = Path(__file__).parent.parent / "issuer" / "examples" / "demo_data"
+REDIRECT_URI = "https://wallet.example.com/callback"
+
+STAGES = [
+    "register",
+    "authorize",
+    "credential_request",
+    "token",
+    "credential",
+    "deferred_credential",
+]
+
+DEFAULT_CONCURRENCY = [1, 8, 32]
+DEFAULT_FLOWS = 200
+DEFAULT_HOLDERS = 1000
+DEFAULT_DEFERRED = 0.25
+
+
+def make_holders(holders: int) -> dict[int, dict[str, Any]]:
+    """Synthetic licence records, keyed by licence number."""
+    return {
+        license_no: {
+            "given_name": f"Holder{license_no}",
+            "family_name": "Walletson",
+            "date_of_birth": f"19{50 + license_no % 50}-01-{1 + license_no % 28:02}",
+            "address": f"{license_no} A Street, A Suburb",
+            "license_type": "C",
+            "is_over_18": True,
+        }
+        for license_no in range(1, holders + 1)
+    }
+
+
+class SyntheticIssuer(LicenseIssuer):
+    """
+    A `LicenseIssuer` that defers a fixed share of credential requests.
+
+    Deferred credentials are ready as soon as the wallet asks for them at the
+    deferred credential endpoint.
+    """
+
+    @override
+    def __init__(self, data: dict[int, dict[str, Any]], deferred: float):
+        super().__init__(
+            str(DEMO_DATA / "example_jwk_private.pem"),
+            str(DEMO_DATA / "example_diddoc.json"),
+            str(DEMO_DATA / "example_didconf.json"),
+            str(DEMO_DATA / "example_metadata_license.json"),
+            str(DEMO_DATA / "example_oauth_metadata_license.json"),
+            data,
+        )
+        self.deferred = deferred
+
+    @override
+    def get_credential_status(self, cred_id: str) -> StatusResponse:
+        status = super().get_credential_status(cred_id)
+        ticket = self.id_to_info[cred_id]["ticket"]
+        # spreads deferrals evenly, deferring `deferred` of all tickets
+        is_deferred = int(ticket * self.deferred) != int((ticket - 1) * self.deferred)
+        if is_deferred and status.transaction_id is None:
+            transaction_id = f"transaction_{ticket}"
+            self.id_to_info[cred_id]["transaction_id"] = transaction_id
+            self.transaction_id_to_cred_id[transaction_id] = cred_id
+            return status.model_copy(
+                update={"status": "PENDING", "transaction_id": transaction_id}
+            )
+        return status
+
+
+class StageError(Exception):
+    pass
+
+
+class FlowRecorder:
+    """Latencies and errors of each stage, across many concurrent flows."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[int]] = {stage: [] for stage in STAGES}
+        self.errors: Counter[str] = Counter()
+        self.flows: list[int] = []
+        self.failed_flows = 0
+
+    async def stage(self, name: str, request, *expected: int) -> httpx.Response:
+        """
+        Times one request, made by awaiting `request`.
+
+        ### Raises
+        - `StageError`: If the request fails, or its status is not one of
+          `expected`
+        """
+        start = perf_counter_ns()
+        try:
+            res = await request
+        except httpx.HTTPError as e:
+            self.errors[name] += 1
+            raise StageError(name) from e
+        self.latencies[name].append(perf_counter_ns() - start)
+        if res.status_code not in expected:
+            self.errors[name] += 1
+            raise StageError(name)
+        return res
+
+    def results(self, params: dict, wall_ns: int) -> list[dict[str, Any]]:
+        def rates(name: str, completed: int) -> dict[str, Any]:
+            errors = self.failed_flows if name == "flow" else self.errors[name]
+            attempts = completed + errors
+            return {
+                "errors": errors,
+                "error_rate": errors / attempts if attempts else 0,
+            }
+
+        results = []
+        for name, latencies in [*self.latencies.items(), ("flow", self.flows)]:
+            results.append(
+                {
+                    "name": name,
+                    "params": params,
+                    "throughput_per_sec": len(latencies) / (wall_ns / 1e9),
+                    **rates(name, len(latencies)),
+                    **summarise(latencies),
+                    "histogram": histogram(latencies),
+                }
+            )
+        return results
+
+
+async def issue(
+    client: httpx.AsyncClient,
+    issuer: SyntheticIssuer,
+    recorder: FlowRecorder,
+    license_no: int,
+):
+    """Runs one wallet's whole flow, for the holder of licence `license_no`."""
+    oauth = {
+        key: urlparse(issuer.oauth_metadata[f"{key}_endpoint"]).path
+        for key in ["authorization", "token", "registration"]
+    }
+    credential_endpoint = urlparse(issuer.metadata["credential_endpoint"]).path
+    deferred_endpoint = urlparse(issuer.metadata["deferred_credential_endpoint"]).path
+
+    res = await recorder.stage(
+        "register",
+        client.post(
+            oauth["registration"],
+            json={
+                "redirect_uris": [REDIRECT_URI],
+                "credential_offer_endpoint": "https://wallet.example.com/offer",
+            },
+        ),
+        201,
+    )
+    client_id, client_secret = res.json()["client_id"], res.json()["client_secret"]
+
+    params = {
+        "response_type": "code",
+        "client_id": client_id,
+        "redirect_uri": REDIRECT_URI,
+        "state": f"state_{license_no}",
+        "authorization_details": json.dumps(
+            [
+                {
+                    "type": "openid_credential",
+                    "credential_configuration_id": CREDENTIAL_TYPE,
+                }
+            ]
+        ),
+    }
+    await recorder.stage(
+        "authorize", client.get(oauth["authorization"], params=params), 200
+    )
+    res = await recorder.stage(
+        "credential_request",
+        client.post(
+            oauth["authorization"],
+            params=params,
+            json={
+                "license_no": license_no,
+                "date_of_birth": issuer.data[license_no]["date_of_birth"],
+            },
+        ),
+        302,
+    )
+    query = parse_qs(urlparse(res.headers["location"]).query)
+    if "code" not in query:
+        recorder.errors["credential_request"] += 1
+        raise StageError("credential_request")
+
+    basic = urlsafe_b64encode(f"{client_id}:{client_secret}".encode()).decode()
+    res = await recorder.stage(
+        "token",
+        client.post(
+            oauth["token"],
+            data={
+                "grant_type": "authorization_code",
+                "code": query["code"][0],
+                "redirect_uri": REDIRECT_URI,
+            },
+            headers={"Authorization": f"Basic {basic}"},
+        ),
+        200,
+    )
+    token = res.json()
+    bearer = {"Authorization": f"Bearer {token['access_token']}"}
+
+    res = await recorder.stage(
+        "credential",
+        client.post(
+            credential_endpoint,
+            json={
+                "credential_identifier": token["authorization_details"][0][
+                    "credential_identifiers"
+                ][0]
+            },
+            headers=bearer,
+        ),
+        200,
+        202,
+    )
+    if res.status_code == 202:
+        await recorder.stage(
+            "deferred_credential",
+            client.post(
+                deferred_endpoint,
+                json={"transaction_id": res.json()["transaction_id"]},
+                headers=bearer,
+            ),
+            200,
+        )
+
+
+async def bench_concurrency(
+    concurrency: int,
+    *,
+    flows: int,
+    holders: int,
+    deferred: float,
+) -> list[dict[str, Any]]:
+    """
+    Measures a fresh issuer at one concurrency level.
+
+    ### Returns
+    - `list[dict]`: One result per stage, and one for the whole flow
+    """
+    issuer = SyntheticIssuer(make_holders(holders), deferred)
+    recorder = FlowRecorder()
+    queue = iter(range(flows))
+
+    transport = httpx.ASGITransport(app=issuer.get_server())
+    async with httpx.AsyncClient(transport=transport, base_url=issuer.uri) as client:
+
+        async def wallet():
+            for i in queue:
+                start = perf_counter_ns()
+                try:
+                    await issue(client, issuer, recorder, 1 + i % holders)
+                except StageError:
+                    recorder.failed_flows += 1
+                else:
+                    recorder.flows.append(perf_counter_ns() - start)
+
+        # warm up: the first flow builds FastAPI's and pydantic's caches
+        await issue(client, issuer, FlowRecorder(), 1)
+
+        start = perf_counter_ns()
+        await asyncio.gather(*(wallet() for _ in range(concurrency)))
+        wall = perf_counter_ns() - start
+
+    params = {"concurrency": concurrency, "deferred": deferred}
+    return recorder.results(params, wall)
+
+
+def run(
+    concurrency: list[int] = DEFAULT_CONCURRENCY,
+    *,
+    flows: int = DEFAULT_FLOWS,
+    holders: int = DEFAULT_HOLDERS,
+    deferred: float = DEFAULT_DEFERRED,
+) -> dict:
+    """
+    Runs the suite.
+
+    ### Parameters
+    - concurrency(`list[int]`): Numbers of wallets issuing at once
+    - flows(`int`): Credentials issued at each concurrency level
+    - holders(`int`): Synthetic licence holders credentials are issued to
+    - deferred(`float`): Share of credentials that are deferred, between 0 and 1
+
+    ### Returns
+    - `dict`: A report, see `vclib.benchmarks.common.make_report`
+    """
+    if not 0 <= deferred <= 1:
+        raise ValueError("deferred must be between 0 and 1")
+    results = []
+    for level in concurrency:
+        results += asyncio.run(
+            bench_concurrency(level, flows=flows, holders=holders, deferred=deferred)
+        )
+    return make_report(SUITE, results, config={"flows": flows, "holders": holders})
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = ArgumentParser(description="End-to-end issuance load benchmark.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=DEFAULT_CONCURRENCY,
+        help="Wallets issuing at once",
+    )
+    parser.add_argument(
+        "--flows",
+        type=int,
+        default=DEFAULT_FLOWS,
+        help="Credentials issued per concurrency level",
+    )
+    parser.add_argument(
+        "--holders",
+        type=int,
+        default=DEFAULT_HOLDERS,
+        help="Synthetic licence holders",
+    )
+    parser.add_argument(
+        "--deferred",
+        type=float,
+        default=DEFAULT_DEFERRED,
+        help=f"Share of credentials that are deferred (default: {DEFAULT_DEFERRED})",
+    )
+    add_output_arguments(parser)
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.concurrency,
+        flows=args.flows,
+        holders=args.holders,
+        deferred=args.deferred,
+    )
+    return write_report(report, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+Microbenchmarks for the SD-JWT-VC layer (`vclib.common`).
+
+Measures, entirely offline:
+- `issue`: signing a new credential with `SDJWTVCIssuer`
+- `holder_parse`: loading an issued credential with `SDJWTVCHolder` and checking
+  its signature
+- `present`: creating a key-bound presentation disclosing every claim
+- `verify`: verifying that presentation with `SDJWTVCVerifier`
+
+across claim counts, nesting depths and issuer key types. By default each
+dimension is swept on its own while the others stay at their defaults; pass
+`--full-grid` to measure every combination.
+
+Usage:
+```
+python -m vclib.benchmarks.sdjwt_vc -o results.json
+python -m vclib.benchmarks.sdjwt_vc -o new.json -b results.json
+```
+"""
+
+import sys
+from argparse import ArgumentParser
+from collections.abc import Callable, Iterator
+from datetime import UTC, datetime
+from itertools import product
+from time import mktime
+from typing import Any
+
+from jwcrypto.jwk import JWK
+
+from vclib.common import SDJWTVCHolder, SDJWTVCIssuer, SDJWTVCVerifier
+
+from .common import add_output_arguments, make_report, measure, write_report
+
+SUITE = "sdjwt_vc"
+
+ISSUER = "https://issuer.example.com"
+AUDIENCE = "https://verifier.example.com"
+NONCE = "benchmark-nonce"
+
+DEFAULT_CLAIM_COUNTS = [1, 10, 50, 100, 500]
+DEFAULT_DEPTHS = [1, 2, 4]
+DEFAULT_CLAIM_COUNT = 50
+DEFAULT_DEPTH = 1
+
+# Signing algorithm -> key generation parameters (see `jwcrypto.jwk.JWK`)
+KEY_TYPES: dict[str, dict[str, Any]] = {
+    "ES256": {"kty": "EC", "crv": "P-256"},
+    "ES384": {"kty": "EC", "crv": "P-384"},
+    "ES512": {"kty": "EC", "crv": "P-521"},
+    "RS256": {"kty": "RSA", "size": 2048},
+    "PS256": {"kty": "RSA", "size": 2048},
+    "EdDSA": {"kty": "OKP", "crv": "Ed25519"},
+}
+DEFAULT_KEY_TYPE = "ES256"
+
+OPERATIONS = ["issue", "holder_parse", "present", "verify"]
+
+
+def generate_key(key_type: str) -> JWK:
+    """Generates a new issuer key for the given signing algorithm."""
+    params = KEY_TYPES[key_type]
+    return JWK(
+        generate=params["kty"], **{k: v for k, v in params.items() if k != "kty"}
+    )
+
+
+def make_claims(count: int, depth: int = 1) -> dict[str, Any]:
+    """
+    Generates `count` disclosable claims, nested `depth` levels deep.
+
+    With a depth of 1, every claim is top-level. With greater depths, each claim
+    sits inside `depth - 1` nested objects, which are themselves disclosable.
+    """
+    claims: dict[str, Any] = {}
+    for i in range(count):
+        node = claims
+        for level in range(1, depth):
+            node = node.setdefault(f"level{level}_{i % (level + 1)}", {})
+        node[f"claim_{i}"] = f"value_{i}"
+    return claims
+
+
+def disclose_all(claims: dict[str, Any]) -> dict[str, Any]:
+    """Builds a `claims_to_disclose` argument selecting every claim."""
+    return {
+        k: disclose_all(v) if isinstance(v, dict) else True for k, v in claims.items()
+    }
+
+
+def cases(
+    claim_counts: list[int],
+    depths: list[int],
+    key_types: list[str],
+    *,
+    full_grid: bool = False,
+) -> Iterator[tuple[int, int, str]]:
+    """Yields unique `(claim_count, depth, key_type)` combinations to measure.
+
+    Unless `full_grid` is set, each dimension is swept while the other two are
+    held at their defaults (or the first value given, if the default wasn't).
+    """
+    if full_grid:
+        yield from product(claim_counts, depths, key_types)
+        return
+
+    # The value each dimension is held at while another is swept
+    count = (
+        DEFAULT_CLAIM_COUNT if DEFAULT_CLAIM_COUNT in claim_counts else claim_counts[0]
+    )
+    depth = DEFAULT_DEPTH if DEFAULT_DEPTH in depths else depths[0]
+    key_type = DEFAULT_KEY_TYPE if DEFAULT_KEY_TYPE in key_types else key_types[0]
+
+    seen = set()
+    sweeps = [
+        [(c, depth, key_type) for c in claim_counts],
+        [(count, d, key_type) for d in depths],
+        [(count, depth, k) for k in key_types],
+    ]
+    for case in (case for sweep in sweeps for case in sweep):
+        if case not in seen:
+            seen.add(case)
+            yield case
+
+
+def bench_case(
+    claim_count: int,
+    depth: int,
+    key_type: str,
+    *,
+    repeat: int,
+    warmup: int,
+    operations: list[str] = OPERATIONS,
+    issuer_keys: dict[str, JWK] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Measures each operation for one combination of parameters.
+
+    ### Returns
+    - `list[dict]`: One result per operation, with its parameters and timings
+    """
+    issuer_key = (issuer_keys or {}).get(key_type) or generate_key(key_type)
+    issuer_public = JWK.from_json(issuer_key.export_public())
+    holder_key = JWK(generate="EC", crv="P-256")
+
+    claims = make_claims(claim_count, depth)
+    to_disclose = disclose_all(claims)
+    other = {
+        "iss": ISSUER,
+        "vct": f"{ISSUER}/benchmark",
+        "iat": mktime(datetime.now(tz=UTC).timetuple()),
+    }
+
+    def cb_get_issuer_key(iss: str, headers: dict) -> JWK:
+        return issuer_public
+
+    def issue() -> str:
+        return SDJWTVCIssuer(
+            claims, other, issuer_key, holder_key, sign_alg=key_type
+        ).sd_jwt_issuance
+
+    issuance = issue()
+
+    def holder_parse() -> SDJWTVCHolder:
+        held = SDJWTVCHolder(issuance)
+        held.verify_signature(issuer_public)
+        return held
+
+    held = holder_parse()
+
+    def present() -> str:
+        held.create_keybound_presentation(to_disclose, NONCE, AUDIENCE, holder_key)
+        return held.sd_jwt_presentation
+
+    presentation = present()
+
+    def verify() -> dict:
+        return SDJWTVCVerifier(
+            presentation,
+            cb_get_issuer_key,
+            expected_aud=AUDIENCE,
+            expected_nonce=NONCE,
+        ).get_verified_payload()
+
+    functions: dict[str, Callable[[], Any]] = {
+        "issue": issue,
+        "holder_parse": holder_parse,
+        "present": present,
+        "verify": verify,
+    }
+    params = {"claims": claim_count, "depth": depth, "key_type": key_type}
+    sizes = {
+        "issuance_bytes": len(issuance),
+        "presentation_bytes": len(presentation),
+    }
+    return [
+        {
+            "name": op,
+            "params": params,
+            **sizes,
+            **measure(functions[op], repeat=repeat, warmup=warmup),
+        }
+        for op in operations
+    ]
+
+
+def run(
+    claim_counts: list[int] = DEFAULT_CLAIM_COUNTS,
+    depths: list[int] = DEFAULT_DEPTHS,
+    key_types: list[str] = list(KEY_TYPES),
+    *,
+    repeat: int = 20,
+    warmup: int = 2,
+    operations: list[str] = OPERATIONS,
+    full_grid: bool = False,
+) -> dict:
+    """
+    Runs the suite.
+
+    ### Returns
+    - `dict`: A report, see `vclib.benchmarks.common.make_report`
+    """
+    # Keys are generated once per type; RSA key generation in particular would
+    # otherwise dominate the run time of the suite.
+    issuer_keys = {k: generate_key(k) for k in key_types}
+    results = []
+    for claim_count, depth, key_type in cases(
+        claim_counts, depths, key_types, full_grid=full_grid
+    ):
+        results += bench_case(
+            claim_count,
+            depth,
+            key_type,
+            repeat=repeat,
+            warmup=warmup,
+            operations=operations,
+            issuer_keys=issuer_keys,
+        )
+    return make_report(SUITE, results, config={"repeat": repeat, "warmup": warmup})
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = ArgumentParser(description="Microbenchmarks for the SD-JWT-VC layer.")
+    parser.add_argument(
+        "--claims",
+        type=int,
+        nargs="+",
+        default=DEFAULT_CLAIM_COUNTS,
+        help="Claim counts to measure",
+    )
+    parser.add_argument(
+        "--depths", type=int, nargs="+", default=DEFAULT_DEPTHS, help="Nesting depths"
+    )
+    parser.add_argument(
+        "--key-types",
+        nargs="+",
+        choices=list(KEY_TYPES),
+        default=list(KEY_TYPES),
+        help="Issuer signing algorithms",
+    )
+    parser.add_argument(
+        "--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--full-grid",
+        action="store_true",
+        help="Measure every combination rather than one dimension at a time",
+    )
+    add_output_arguments(parser)
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.claims,
+        args.depths,
+        args.key_types,
+        repeat=args.repeat,
+        warmup=args.warmup,
+        operations=args.operations,
+        full_grid=args.full_grid,
+    )
+    return write_report(report, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+import pytest
+
+from vclib.benchmarks import issuer
+from vclib.benchmarks.common import histogram
+
+
+def test_histogram_buckets():
+    buckets = histogram([500_000, 1_000_000, 3_000_000, 9_000_000_000], [1, 5])
+    assert buckets == [
+        {"le_ms": 1, "count": 2},
+        {"le_ms": 5, "count": 1},
+        {"le_ms": None, "count": 1},
+    ]
+
+
+def test_run_reports_each_stage():
+    report = issuer.run([1, 3], flows=8, holders=4, deferred=0.5)
+    assert report["suite"] == "issuer"
+    results = {(r["name"], r["params"]["concurrency"]): r for r in report["results"]}
+    for level in [1, 3]:
+        for stage in issuer.STAGES[:-1]:
+            assert results[(stage, level)]["n"] == 8
+        assert results[("deferred_credential", level)]["n"] == 4
+        flow = results[("flow", level)]
+        assert flow["n"] == 8 and flow["error_rate"] == 0
+        assert flow["throughput_per_sec"] > 0
+        assert sum(b["count"] for b in flow["histogram"]) == 8
+
+
+def test_failed_stages_are_counted():
+    synthetic = issuer.SyntheticIssuer(issuer.make_holders(1), 0)
+    recorder = issuer.FlowRecorder()
+
+    async def register(body: dict):
+        transport = httpx.ASGITransport(app=synthetic.get_server())
+        async with httpx.AsyncClient(
+            transport=transport, base_url=synthetic.uri
+        ) as client:
+            await recorder.stage(
+                "register", client.post("/oauth2/register", json=body), 201
+            )
+
+    with pytest.raises(issuer.StageError):
+        asyncio.run(register({"redirect_uris": []}))
+    assert recorder.errors == {"register": 1}
+    assert len(recorder.latencies["register"]) == 1
@@ -0,0 +1,34 @@
+from vclib.benchmarks import sdjwt_vc
+from vclib.benchmarks.common import compare_to_baseline
+
+
+def test_make_claims_nesting():
+    claims = sdjwt_vc.make_claims(10, depth=3)
+    assert all(k.startswith("level1_") for k in claims)
+
+    def leaves(node):
+        return sum(leaves(v) if isinstance(v, dict) else 1 for v in node.values())
+
+    assert leaves(claims) == 10
+
+
+def test_cases_sweep_each_dimension_once():
+    cases = list(sdjwt_vc.cases([1, 50], [1, 2], ["ES256", "EdDSA"]))
+    assert len(cases) == len(set(cases))
+    assert (50, 1, "ES256") in cases
+    assert (50, 2, "ES256") in cases
+    assert (50, 1, "EdDSA") in cases
+    assert (1, 2, "EdDSA") not in cases
+
+
+def test_run_and_compare_to_baseline():
+    report = sdjwt_vc.run([2], [1], ["ES256"], repeat=1, warmup=0)
+    assert report["suite"] == "sdjwt_vc"
+    assert {r["name"] for r in report["results"]} == set(sdjwt_vc.OPERATIONS)
+
+    slower = {
+        "results": [r | {"median_ms": r["median_ms"] * 2} for r in report["results"]]
+    }
+    comparison = compare_to_baseline(slower, report, threshold=0.5)
+    assert len(comparison) == len(sdjwt_vc.OPERATIONS)
+    assert all(c["status"] == "regression" for c in comparison)
@@ -0,0 +1,23 @@
+from vclib.benchmarks import verifier
+
+
+def test_run_reports_each_phase():
+    report = verifier.run(
+        [1, 2], requests=3, issuers=2, credentials=2, claims=2, profile_top=5
+    )
+    assert report["suite"] == "verifier"
+    assert [(r["name"], r["params"]["concurrency"]) for r in report["results"]] == [
+        ("fetch_request", 1),
+        ("response", 1),
+        ("fetch_request", 2),
+        ("response", 2),
+    ]
+    assert all(r["n"] == 3 and r["throughput_per_sec"] > 0 for r in report["results"])
+    assert len(report["profile"]["2"]) == 5
+
+
+def test_stateless_run():
+    report = verifier.run(
+        [2], requests=2, issuers=1, verifier_options={"state_secret": "secret"}
+    )
+    assert all(r["n"] == 2 for r in report["results"])
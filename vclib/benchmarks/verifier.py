@@ -0,0 +1,397 @@
+"""
+End-to-end throughput benchmark for `vclib.verifier.Verifier`.
+
+Mints credentials from synthetic issuers with `SDJWTVCIssuer`, and has synthetic
+wallets answer authorization requests with `SDJWTVCHolder` presentations, all
+through the verifier's ASGI app in-process (no network). For each concurrency
+level, it measures:
+- `fetch_request`: `POST /request/{ref}`, creating an authorization request
+- `response`: `POST /cb`, verifying a presentation
+
+Wallets prepare their presentations between the two phases, so their own CPU
+time is not counted against the verifier. Results include throughput (completed
+operations per second of wall time) alongside latency percentiles. With
+`--profile`, the response phase is run under `cProfile` and the functions taking
+the most time are reported. Presentations are then verified on the event loop's
+thread instead of in a thread pool, so that one profiler sees all of the work.
+
+Usage:
+```
+python -m vclib.benchmarks.verifier -o results.json
+python -m vclib.benchmarks.verifier --concurrency 1 16 64 --requests 500 --profile
+```
+"""
+
+import asyncio
+import cProfile
+import pstats
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import Executor, Future
+from datetime import UTC, datetime
+from pathlib import Path
+from time import mktime, perf_counter_ns
+from typing import Any
+
+import httpx
+from jwcrypto.jwk import JWK
+
+from vclib.common import (
+    IssuerKeyResolver,
+    SDJWTVCHolder,
+    SDJWTVCIssuer,
+    vp_auth_request,
+)
+from vclib.verifier import Verifier
+
+from .common import add_output_arguments, make_report, summarise, write_report
+
+SUITE = "verifier"
+
+DEFINITION_ID = "benchmark"
+DIDDOC_PATH = (
+    Path(__file__).parent.parent / "verifier" / "examples" / "example_diddoc.json"
+)
+
+DEFAULT_CONCURRENCY = [1, 8, 32]
+DEFAULT_REQUESTS = 200
+DEFAULT_ISSUERS = 4
+DEFAULT_CREDENTIALS = 1
+DEFAULT_CLAIMS = 10
+DEFAULT_PROFILE_TOP = 25
+
+
+def make_definition(credentials: int) -> vp_auth_request.PresentationDefinition:
+    """A definition asking for `credentials` credentials, each proving age."""
+    return vp_auth_request.PresentationDefinition(
+        id=DEFINITION_ID,
+        input_descriptors=[
+            vp_auth_request.InputDescriptor(
+                id=f"credential_{i}",
+                constraints=vp_auth_request.Constraints(
+                    fields=[
+                        vp_auth_request.Field(
+                            path=["$.vct"],
+                            filter={"type": "string", "pattern": f"/{i}$"},
+                        ),
+                        vp_auth_request.Field(
+                            path=["$.is_over_18"],
+                            filter={"type": "boolean", "const": True},
+                        ),
+                    ]
+                ),
+            )
+            for i in range(credentials)
+        ],
+    )
+
+
+class SyntheticIssuers:
+    """Issuers with freshly generated keys, and the credentials they issued."""
+
+    def __init__(self, issuers: int, credentials: int, claims: int):
+        self.keys = {
+            f"https://issuer-{i}.example.com": JWK(generate="EC", crv="P-256")
+            for i in range(issuers)
+        }
+        self.holder_key = JWK(generate="EC", crv="P-256")
+        claim_values = {f"claim_{i}": f"value_{i}" for i in range(claims - 1)}
+        iat = mktime(datetime.now(tz=UTC).timetuple())
+        # each wallet holds one credential of every type, from one issuer
+        self.wallets: list[list[SDJWTVCHolder]] = []
+        for iss, key in self.keys.items():
+            wallet = []
+            for c in range(credentials):
+                held = SDJWTVCHolder(
+                    SDJWTVCIssuer(
+                        {"is_over_18": True, **claim_values},
+                        {"iss": iss, "vct": f"{iss}/credential/{c}", "iat": iat},
+                        key,
+                        self.holder_key,
+                    ).sd_jwt_issuance
+                )
+                held.verify_signature(key)
+                wallet.append(held)
+            self.wallets.append(wallet)
+
+    def resolver(self) -> IssuerKeyResolver:
+        return IssuerKeyResolver(
+            trusted_issuers=list(self.keys),
+            pinned_keys={
+                iss: JWK.from_json(key.export_public())
+                for iss, key in self.keys.items()
+            },
+        )
+
+    def present(self, wallet: int, request: dict) -> dict:
+        """Answers an authorization request, as the wallet with index `wallet`."""
+        tokens = []
+        for held in self.wallets[wallet % len(self.wallets)]:
+            held.create_keybound_presentation(
+                {"is_over_18": True},
+                request["nonce"],
+                request["client_id"],
+                self.holder_key,
+            )
+            tokens.append(held.sd_jwt_presentation)
+        return {
+            "vp_token": tokens,
+            "presentation_submission": {
+                "id": f"submission_{wallet}",
+                "definition_id": DEFINITION_ID,
+                "descriptor_map": [
+                    {"id": f"credential_{i}", "format": "vc+sd-jwt", "path": f"$[{i}]"}
+                    for i in range(len(tokens))
+                ],
+            },
+            "state": request["state"],
+        }
+
+
+async def drive(jobs: list, call, concurrency: int) -> tuple[list[Any], list[int], int]:
+    """
+    Runs `call(job)` for every job, at most `concurrency` at a time.
+
+    ### Returns
+    - `tuple[list, list[int], int]`: The result of each call, the latency of
+      each call and the total wall time, in nanoseconds
+    """
+    results: list[Any] = [None] * len(jobs)
+    latencies: list[int] = []
+    queue = iter(enumerate(jobs))
+
+    async def worker():
+        for i, job in queue:
+            start = perf_counter_ns()
+            results[i] = await call(job)
+            latencies.append(perf_counter_ns() - start)
+
+    start = perf_counter_ns()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, latencies, perf_counter_ns() - start
+
+
+class InlineExecutor(Executor):
+    """
+    Runs each submitted call straight away, on the submitting thread. Only one
+    profiler can be active at a time, so when profiling, work the verifier
+    would hand to its thread pool is run where the profiler can see it.
+    """
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def top_functions(profile: cProfile.Profile, n: int) -> list[dict[str, Any]]:
+    """The `n` functions with the most time spent in them (not callees)."""
+    stats = pstats.Stats(profile)
+    rows = []
+    for (file, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append(
+            {
+                "function": f"{Path(file).name}:{line}({name})",
+                "calls": calls,
+                "tottime_ms": tottime * 1000,
+                "cumtime_ms": cumtime * 1000,
+            }
+        )
+    rows.sort(key=lambda row: row["tottime_ms"], reverse=True)
+    return rows[:n]
+
+
+async def bench_concurrency(
+    issuers: SyntheticIssuers,
+    concurrency: int,
+    *,
+    requests: int,
+    credentials: int,
+    claims: int,
+    profile_top: int = 0,
+    verifier_options: dict | None = None,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]] | None]:
+    """
+    Measures a fresh verifier at one concurrency level.
+
+    ### Returns
+    - `tuple[list[dict], list[dict] | None]`: One result per phase, and the
+      profile of the response phase if `profile_top` is set
+    """
+    verifier = Verifier(
+        {DEFINITION_ID: make_definition(credentials)},
+        str(DIDDOC_PATH),
+        "https://verifier.example.com",
+        issuer_key_resolver=issuers.resolver(),
+        verification_workers=concurrency,
+        **(verifier_options or {}),
+    )
+    profiler = None
+    if profile_top:
+        profiler = cProfile.Profile()
+        verifier.verification_pool.shutdown()
+        verifier.verification_pool = InlineExecutor()
+
+    transport = httpx.ASGITransport(app=verifier.get_server())
+    async with httpx.AsyncClient(
+        transport=transport, base_url=verifier.base_url
+    ) as client:
+
+        async def fetch_request(_) -> dict:
+            res = await client.post(f"/request/{DEFINITION_ID}")
+            res.raise_for_status()
+            return res.json()
+
+        async def respond(response: dict):
+            res = await client.post("/cb", json=response)
+            res.raise_for_status()
+
+        # warm up: the first request compiles and caches what it can
+        await respond(issuers.present(0, await fetch_request(None)))
+
+        auth_requests, fetch_latencies, fetch_wall = await drive(
+            list(range(requests)), fetch_request, concurrency
+        )
+        responses = [
+            issuers.present(i, request) for i, request in enumerate(auth_requests)
+        ]
+        if profiler:
+            profiler.enable()
+        _, response_latencies, response_wall = await drive(
+            responses, respond, concurrency
+        )
+        if profiler:
+            profiler.disable()
+
+    verifier.verification_pool.shutdown()
+    params = {
+        "concurrency": concurrency,
+        "credentials": credentials,
+        "claims": claims,
+        "issuers": len(issuers.keys),
+    }
+    results = [
+        {
+            "name": name,
+            "params": params,
+            "throughput_per_sec": len(latencies) / (wall / 1e9),
+            **summarise(latencies),
+        }
+        for name, latencies, wall in [
+            ("fetch_request", fetch_latencies, fetch_wall),
+            ("response", response_latencies, response_wall),
+        ]
+    ]
+    return results, top_functions(profiler, profile_top) if profiler else None
+
+
+def run(
+    concurrency: list[int] = DEFAULT_CONCURRENCY,
+    *,
+    requests: int = DEFAULT_REQUESTS,
+    issuers: int = DEFAULT_ISSUERS,
+    credentials: int = DEFAULT_CREDENTIALS,
+    claims: int = DEFAULT_CLAIMS,
+    profile_top: int = 0,
+    verifier_options: dict | None = None,
+) -> dict:
+    """
+    Runs the suite.
+
+    ### Parameters
+    - concurrency(`list[int]`): Numbers of wallets responding at once
+    - requests(`int`): Presentations made at each concurrency level
+    - issuers(`int`): Synthetic issuers credentials are spread across
+    - credentials(`int`): Credentials presented in each response
+    - claims(`int`): Claims in each credential
+    - profile_top(`int`): If not 0, profile the response phase and report this
+      many of the most expensive functions
+    - verifier_options(`dict | None`): Extra keyword arguments for `Verifier`
+
+    ### Returns
+    - `dict`: A report, see `vclib.benchmarks.common.make_report`
+    """
+    synthetic = SyntheticIssuers(issuers, credentials, claims)
+    results = []
+    profiles = {}
+    for level in concurrency:
+        level_results, profile = asyncio.run(
+            bench_concurrency(
+                synthetic,
+                level,
+                requests=requests,
+                credentials=credentials,
+                claims=claims,
+                profile_top=profile_top,
+                verifier_options=verifier_options,
+            )
+        )
+        results += level_results
+        if profile is not None:
+            profiles[str(level)] = profile
+    extra = {"config": {"requests": requests}}
+    if profiles:
+        extra["profile"] = profiles
+    return make_report(SUITE, results, **extra)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = ArgumentParser(description="End-to-end verifier throughput benchmark.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=DEFAULT_CONCURRENCY,
+        help="Wallets responding at once",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=DEFAULT_REQUESTS,
+        help="Presentations per concurrency level",
+    )
+    parser.add_argument("--issuers", type=int, default=DEFAULT_ISSUERS)
+    parser.add_argument(
+        "--credentials",
+        type=int,
+        default=DEFAULT_CREDENTIALS,
+        help="Credentials presented in each response",
+    )
+    parser.add_argument(
+        "--claims", type=int, default=DEFAULT_CLAIMS, help="Claims per credential"
+    )
+    parser.add_argument(
+        "--stateless",
+        action="store_true",
+        help="Run the verifier with sealed state instead of a nonce store",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        type=int,
+        const=DEFAULT_PROFILE_TOP,
+        default=0,
+        metavar="TOP",
+        help="Profile the response phase, reporting the TOP most expensive "
+        f"functions (default: {DEFAULT_PROFILE_TOP})",
+    )
+    add_output_arguments(parser)
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.concurrency,
+        requests=args.requests,
+        issuers=args.issuers,
+        credentials=args.credentials,
+        claims=args.claims,
+        profile_top=args.profile,
+        verifier_options={"state_secret": "benchmark"} if args.stateless else None,
+    )
+    return write_report(report, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,14 @@ the VC model.
 """
 
 # Add imports from `common/src` here to expose objects under vclib.common
+from .src.compilation_cache import CompilationCache as CompilationCache
+from .src.compilation_cache import compilation_cache as compilation_cache
+from .src.compilation_cache import compile_jsonpath as compile_jsonpath
+from .src.compilation_cache import compile_schema as compile_schema
 from .src.data_transfer_objects import vp_auth_request as vp_auth_request
 from .src.data_transfer_objects import vp_auth_response as vp_auth_response
+from .src.key_resolver import IssuerKeyResolutionError as IssuerKeyResolutionError
+from .src.key_resolver import IssuerKeyResolver as IssuerKeyResolver
 from .src.sdjwt_vc.exceptions import (
     SDJWTVCNoHolderPublicKeyError as SDJWTVCNoHolderPublicKeyError,
 )
@@ -16,3 +22,4 @@ from .src.sdjwt_vc.exceptions import (
 from .src.sdjwt_vc.holder import SDJWTVCHolder as SDJWTVCHolder
 from .src.sdjwt_vc.issuer import SDJWTVCIssuer as SDJWTVCIssuer
 from .src.sdjwt_vc.verifier import SDJWTVCVerifier as SDJWTVCVerifier
+from .src.ttl_store import TTLStore as TTLStore
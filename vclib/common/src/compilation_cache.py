@@ -0,0 +1,143 @@
+import hashlib
+import json
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from copy import deepcopy
+from threading import Lock
+from typing import Any
+
+from jsonpath_ng import JSONPath
+from jsonpath_ng.ext import parse as parse_jsonpath
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
+
+DEFAULT_MAX_JSONPATHS = 1024
+DEFAULT_MAX_VALIDATORS = 256
+
+
+class _LRU:
+    """A bounded, thread-safe least-recently-used cache, counting hits and misses."""
+
+    def __init__(self, max_size: int):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, compile: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+        # Compiled outside the lock, so a slow compile does not hold up hits
+        value = compile()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+def schema_digest(schema: dict) -> str:
+    """A hash of a JSON Schema's content, the same however its keys are ordered."""
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CompilationCache:
+    """
+    Parsed JSONPath expressions and JSON Schema validators, kept so that the
+    same expression or schema is only compiled once.
+
+    Expressions are keyed by their text, and schemas by a hash of their content,
+    so equal schemas from different presentation definitions share a validator.
+    Each cache evicts its least recently used entries once full.
+    """
+
+    def __init__(
+        self,
+        max_jsonpaths: int = DEFAULT_MAX_JSONPATHS,
+        max_validators: int = DEFAULT_MAX_VALIDATORS,
+    ):
+        """
+        ### Parameters
+        - max_jsonpaths(`int`): Most parsed JSONPath expressions kept
+        - max_validators(`int`): Most JSON Schema validators kept
+        """
+        self._jsonpaths = _LRU(max_jsonpaths)
+        self._validators = _LRU(max_validators)
+
+    def jsonpath(self, path: str) -> JSONPath:
+        """
+        ### Returns
+        - `JSONPath`: The parsed expression, using `jsonpath_ng`'s extended syntax
+
+        ### Raises
+        - `Exception`: If the expression is invalid
+        """
+        return self._jsonpaths.get(path, lambda: parse_jsonpath(path))
+
+    def validator(self, schema: dict) -> Validator:
+        """
+        ### Returns
+        - `Validator`: A validator for `schema`, for the draft it declares
+
+        ### Raises
+        - `jsonschema.SchemaError`: If the schema is invalid
+        """
+
+        def compile() -> Validator:
+            # Copied, so later changes to the caller's schema can't affect it
+            schema_copy = deepcopy(schema)
+            validator_class = validator_for(schema_copy)
+            validator_class.check_schema(schema_copy)
+            return validator_class(schema_copy)
+
+        return self._validators.get(schema_digest(schema), compile)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Hits, misses and size of each cache."""
+        return {
+            "jsonpath": self._jsonpaths.stats(),
+            "validator": self._validators.stats(),
+        }
+
+    def clear(self):
+        self._jsonpaths.clear()
+        self._validators.clear()
+
+
+# Shared by the holder and verifier
+compilation_cache = CompilationCache()
+
+
+def compile_jsonpath(path: str) -> JSONPath:
+    """Parses a JSONPath expression, with the shared `compilation_cache`."""
+    return compilation_cache.jsonpath(path)
+
+
+def compile_schema(schema: dict) -> Validator:
+    """Builds a JSON Schema validator, with the shared `compilation_cache`."""
+    return compilation_cache.validator(schema)
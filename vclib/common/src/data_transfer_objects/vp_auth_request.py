@@ -1,7 +1,14 @@
 from typing import Any, Literal, Self
 
 from jsonschema.protocols import Validator
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    field_validator,
+    model_serializer,
+    model_validator,
+)
+from pydantic import Field as ModelField
 
 
 class Field(BaseModel):
@@ -46,18 +53,54 @@ class InputDescriptor(BaseModel):
     name: str | None = None
     purpose: str | None = None
     format: Any | None = None
+    group: list[str] | None = None
+
+
+class SubmissionRequirement(BaseModel):
+    """
+    Each submission_requirement **MUST** have a "rule" property, and either a
+    "from" property naming a group of input_descriptors, or a "from_nested"
+    property of further submission_requirements.\n
+    A "pick" rule **MAY** have "count", "min" and "max" properties.\n
+    Each submission_requirement **MAY** have "name" and "purpose" properties.
+    """
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    rule: Literal["all", "pick"]
+    count: int | None = ModelField(default=None, ge=0)
+    min: int | None = ModelField(default=None, ge=0)
+    max: int | None = ModelField(default=None, ge=0)
+    from_: str | None = ModelField(default=None, alias="from")
+    from_nested: list["SubmissionRequirement"] | None = None
+    name: str | None = None
+    purpose: str | None = None
+
+    @model_validator(mode="after")
+    def verify_from_exclusive(self) -> Self:
+        if (self.from_ is None) == (self.from_nested is None):
+            raise ValueError("Expected one of `from` or `from_nested` but not both")
+        return self
+
+    @model_serializer(mode="wrap")
+    def serialize_from(self, handler) -> dict[str, Any]:
+        # `from` is a keyword, so the field can't be named after it
+        data = handler(self)
+        data["from"] = data.pop("from_")
+        return data
 
 
 class PresentationDefinition(BaseModel):
     """presentation_definitions **MAY** have an "id", and an
     "input_descriptors" property.\n presentation_definitions **MAY**
-    have "name", "purpose", and "format" properties.
+    have "name", "purpose", "format" and "submission_requirements" properties.
     """
 
     id: str
     input_descriptors: list[InputDescriptor]
     name: str | None = None
     purpose: str | None = None
+    submission_requirements: list[SubmissionRequirement] | None = None
 
 
 class AuthorizationRequestObject(BaseModel):
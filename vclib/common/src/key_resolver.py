@@ -0,0 +1,290 @@
+import json
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from threading import Lock, Thread
+from time import monotonic
+from urllib.parse import quote, unquote, urlparse
+
+import httpx
+from jwcrypto.jwk import JWK
+from jwcrypto.jwt import JWT
+
+# Algorithms accepted on DID configuration (domain linkage) JWTs
+LINKAGE_ALGS = ["ES256", "ES384", "ES512", "RS256", "PS256", "EdDSA"]
+
+
+class IssuerKeyResolutionError(Exception):
+    """Raised when no trusted key can be found for an issuer."""
+
+
+@dataclass
+class _CacheEntry:
+    keys: dict[str, JWK]  # kid -> key, in DID document order
+    attempted_at: float  # last fetch, including failed refetches
+    expires_at: float
+    refresh_at: float
+    error: str | None = None  # set on negative entries
+
+
+def did_web_from_url(url: str) -> str:
+    """
+    Converts an HTTPS origin (and optional path) to the `did:web` identifier
+    hosted there, e.g. `https://issuer-lib:8082` -> `did:web:issuer-lib%3A8082`.
+    """
+    parsed = urlparse(url)
+    did = f"did:web:{quote(parsed.netloc, safe='')}"
+    segments = [s for s in parsed.path.split("/") if s]
+    return ":".join([did, *segments])
+
+
+def url_from_did_web(did: str) -> str:
+    """Converts a `did:web` identifier back to the HTTPS URL it is hosted at."""
+    host, *segments = did.removeprefix("did:web:").split("#")[0].split(":")
+    return "/".join([f"https://{unquote(host)}", *map(unquote, segments)])
+
+
+class IssuerKeyResolver:
+    """
+    Resolves the public key an issuer signed a credential with, from the DID
+    document the issuer serves at `/.well-known/did.json`. The DID document must
+    belong to the issuer's domain (`did:web`), and unless disabled, that link must
+    be confirmed by a signed entry in the issuer's `/.well-known/did-configuration`.
+
+    Resolved keys are cached for `ttl` seconds and refreshed in the background
+    shortly before they expire, so lookups for a known issuer never wait on the
+    network. Failures are cached for `negative_ttl` seconds, and concurrent
+    lookups for the same issuer share a single fetch.
+
+    Instances are callable with the `(iss, headers)` signature expected of
+    `cb_get_issuer_key` callbacks, and are safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        *,
+        negative_ttl: float = 30,
+        refresh_ahead: float = 0.1,
+        trusted_issuers: list[str] | None = None,
+        pinned_keys: dict[str, JWK | list[JWK]] = {},
+        check_did_configuration: bool = True,
+        timeout: float = 5,
+        client: httpx.Client | None = None,
+        clock: Callable[[], float] = monotonic,
+    ):
+        """
+        ### Parameters
+        - ttl(`float`): Seconds resolved keys are cached for
+        - negative_ttl(`float`): Seconds a failed lookup is cached for. Also the
+          minimum time between refetches triggered by an unknown `kid`.
+        - refresh_ahead(`float`): Fraction of `ttl`, before expiry, at which a
+          cached entry is refreshed in the background
+        - trusted_issuers(`list[str] | None`): If given, only these issuers are
+          resolved; any other issuer is rejected without a request being made
+        - pinned_keys(`dict[str, JWK | list[JWK]]`): Keys to use for the given
+          issuers instead of fetching them
+        - check_did_configuration(`bool`): Whether to require a valid domain
+          linkage entry in the issuer's DID configuration
+        - timeout(`float`): Timeout for each request, in seconds
+        - client(`httpx.Client | None`): Client used to make requests
+        - clock(`() -> float`): Source of the current time, in seconds
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_ahead = refresh_ahead
+        self.trusted_issuers = None if trusted_issuers is None else set(trusted_issuers)
+        self.check_did_configuration = check_did_configuration
+        self.clock = clock
+        self.client = client or httpx.Client(timeout=timeout)
+
+        self.pinned_keys: dict[str, dict[str, JWK]] = {}
+        for iss, keys in pinned_keys.items():
+            keys = keys if isinstance(keys, list) else [keys]
+            self.pinned_keys[iss] = {k.get("kid") or k.thumbprint(): k for k in keys}
+
+        self._entries: dict[str, _CacheEntry] = {}
+        self._inflight: dict[str, Future] = {}
+        self._lock = Lock()
+
+    def __call__(self, iss: str, headers: dict) -> JWK:
+        return self.resolve(iss, headers.get("kid"))
+
+    def resolve(self, iss: str, kid: str | None = None) -> JWK:
+        """
+        ### Parameters
+        - iss(`str`): The issuer, as an HTTPS URL or `did:web` identifier
+        - kid(`str | None`): Identifier of the signing key, from the JWT header.
+          May also be a DID URL naming one of the issuer's verification
+          methods, e.g. `did:web:example.com#key-1`.
+
+        ### Returns
+        - `JWK`: The issuer's public key with the given `kid`, or its first key
+          if no `kid` is given
+
+        ### Raises
+        - `IssuerKeyResolutionError`: If the issuer is not trusted, its keys
+          could not be fetched, or it has no key with the given `kid`
+        """
+        if not iss:
+            raise IssuerKeyResolutionError("Credential has no issuer")
+        if kid is not None and "#" in kid:
+            did, _, fragment = kid.partition("#")
+            if did == (iss if iss.startswith("did:") else did_web_from_url(iss)):
+                kid = fragment
+        if iss in self.pinned_keys:
+            return self._select(iss, self.pinned_keys[iss], kid)
+
+        now = self.clock()
+        entry = self._entries.get(iss)
+        if entry is None or now >= entry.expires_at:
+            entry = self._load(iss)
+        elif now >= entry.refresh_at:
+            self._refresh_in_background(iss)
+
+        if (
+            entry.error is None
+            and kid is not None
+            and kid not in entry.keys
+            and now - entry.attempted_at >= self.negative_ttl
+        ):
+            # The issuer may have rotated its keys since they were cached
+            entry = self._load(iss)
+
+        if entry.error is not None:
+            raise IssuerKeyResolutionError(entry.error)
+        return self._select(iss, entry.keys, kid)
+
+    def prefetch(self, issuers: list[str]):
+        """Resolves the given issuers ahead of time, in the background."""
+        for iss in issuers:
+            if iss not in self.pinned_keys and iss not in self._entries:
+                self._refresh_in_background(iss)
+
+    def invalidate(self, iss: str | None = None):
+        """Forgets cached keys for `iss`, or for every issuer."""
+        with self._lock:
+            if iss is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(iss, None)
+
+    @staticmethod
+    def _select(iss: str, keys: dict[str, JWK], kid: str | None) -> JWK:
+        if kid is None:
+            if keys:
+                return next(iter(keys.values()))
+            raise IssuerKeyResolutionError(f"Issuer {iss} has no keys")
+        if kid not in keys:
+            raise IssuerKeyResolutionError(f"Issuer {iss} has no key '{kid}'")
+        return keys[kid]
+
+    def _refresh_in_background(self, iss: str):
+        with self._lock:
+            if iss in self._inflight:
+                return
+        Thread(target=self._load, args=(iss,), daemon=True).start()
+
+    def _load(self, iss: str) -> _CacheEntry:
+        """Fetches `iss`'s keys, or waits for a fetch already in progress."""
+        with self._lock:
+            future = self._inflight.get(iss)
+            owner = future is None
+            if owner:
+                future = self._inflight[iss] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            entry = self._fetch(iss)
+            with self._lock:
+                previous = self._entries.get(iss)
+                if (
+                    entry.error is not None
+                    and previous is not None
+                    and previous.error is None
+                    and self.clock() < previous.expires_at
+                ):
+                    # Keep serving the keys we have until they expire, and
+                    # try again later
+                    previous.attempted_at = self.clock()
+                    previous.refresh_at = previous.attempted_at + self.negative_ttl
+                    entry = previous
+                self._entries[iss] = entry
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[iss]
+
+    def _fetch(self, iss: str) -> _CacheEntry:
+        now = self.clock()
+        try:
+            keys = self._fetch_keys(iss)
+        except Exception as e:
+            return _CacheEntry(
+                keys={},
+                attempted_at=now,
+                expires_at=now + self.negative_ttl,
+                refresh_at=now + self.negative_ttl,
+                error=f"Could not resolve keys for issuer {iss}: {e}",
+            )
+        return _CacheEntry(
+            keys=keys,
+            attempted_at=now,
+            expires_at=now + self.ttl,
+            refresh_at=now + self.ttl * (1 - self.refresh_ahead),
+        )
+
+    def _fetch_keys(self, iss: str) -> dict[str, JWK]:
+        if self.trusted_issuers is not None and iss not in self.trusted_issuers:
+            raise IssuerKeyResolutionError("Issuer is not trusted")
+
+        if iss.startswith("did:web:"):
+            did, base_url = iss, url_from_did_web(iss)
+        else:
+            did, base_url = did_web_from_url(iss), iss.rstrip("/")
+
+        res = self.client.get(f"{base_url}/.well-known/did.json")
+        res.raise_for_status()
+        diddoc = res.json()
+        if diddoc.get("id") != did:
+            raise IssuerKeyResolutionError(
+                f"DID document {diddoc.get('id')} does not belong to {did}"
+            )
+
+        keys: dict[str, JWK] = {}
+        for method in diddoc.get("verificationMethod", []):
+            if "publicKeyJwk" not in method:
+                continue
+            key = JWK(**method["publicKeyJwk"])
+            kid = key.get("kid") or method["id"].partition("#")[2]
+            keys[kid or key.thumbprint()] = key
+        if not keys:
+            raise IssuerKeyResolutionError("DID document contains no keys")
+
+        if self.check_did_configuration:
+            self._check_did_configuration(did, base_url, keys)
+        return keys
+
+    def _check_did_configuration(self, did: str, base_url: str, keys: dict[str, JWK]):
+        """Checks the DID is linked to the domain by a JWT signed with its key."""
+        res = self.client.get(f"{base_url}/.well-known/did-configuration")
+        res.raise_for_status()
+        for entry in res.json().get("entries", []):
+            entry_did, _, kid = entry.get("did", "").partition("#")
+            if entry_did != did:
+                continue
+            for key in [keys[kid]] if kid in keys else keys.values():
+                try:
+                    token = JWT(jwt=entry["jwt"], key=key, algs=LINKAGE_ALGS)
+                except Exception:
+                    continue
+                if json.loads(token.claims).get("iss") == did:
+                    return
+        raise IssuerKeyResolutionError(
+            "DID configuration does not link the DID to the issuer's domain"
+        )
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from threading import Lock
+from time import monotonic
+from typing import Any
+
+_MISSING = object()
+
+
+class TTLStore:
+    """
+    A bounded, thread-safe mapping whose entries expire a fixed time after they
+    were last written.
+
+    Every entry shares the same time-to-live, so insertion order is also expiry
+    order: expired entries are always at the front, and purging them costs
+    nothing more than the entries removed. When the store is full, the oldest
+    entry (the one closest to expiring anyway) is evicted to make room.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int | None = None,
+        *,
+        clock: Callable[[], float] = monotonic,
+    ):
+        """
+        ### Parameters
+        - ttl(`float`): Seconds an entry remains valid after it is written
+        - max_size(`int | None`): Maximum number of entries kept. Unbounded if
+          `None`.
+        - clock(`() -> float`): Source of the current time, in seconds
+        """
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if max_size is not None and max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _purge_expired(self, now: float) -> int:
+        purged = 0
+        while self._entries:
+            expires_at, _ = next(iter(self._entries.values()))
+            if expires_at > now:
+                break
+            self._entries.popitem(last=False)
+            purged += 1
+        return purged
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Stores `value` under `key`, replacing (and renewing) any existing entry.
+        """
+        with self._lock:
+            now = self.clock()
+            self._purge_expired(now)
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl, value)
+            if self.max_size is not None:
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        ### Returns
+        - `Any`: The value stored under `key`, or `default` if there is none or
+          it has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return default
+            return entry[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Removes the entry stored under `key`.
+
+        ### Returns
+        - `Any`: The value that was stored, or `default` if there was none or it
+          had expired
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= self.clock():
+                return default
+            return entry[1]
+
+    def purge_expired(self) -> int:
+        """
+        Removes every expired entry.
+
+        ### Returns
+        - `int`: The number of entries removed
+        """
+        with self._lock:
+            return self._purge_expired(self.clock())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,51 @@
+import pytest
+from jsonschema import SchemaError
+
+from vclib.common import CompilationCache
+
+
+def test_jsonpaths_parsed_once():
+    cache = CompilationCache()
+    path = cache.jsonpath("$.is_over_18")
+    assert cache.jsonpath("$.is_over_18") is path
+    assert [m.value for m in path.find({"is_over_18": True})] == [True]
+    assert cache.stats()["jsonpath"] == {
+        "hits": 1,
+        "misses": 1,
+        "size": 1,
+        "max_size": 1024,
+    }
+
+
+def test_equal_schemas_share_a_validator():
+    cache = CompilationCache()
+    schema = {"type": "string", "pattern": "^AU$"}
+    validator = cache.validator(schema)
+    assert cache.validator({"pattern": "^AU$", "type": "string"}) is validator
+    assert validator.is_valid("AU")
+    assert not validator.is_valid("NZ")
+
+    # the cached validator is not affected by changes to the caller's schema
+    schema["pattern"] = "^NZ$"
+    assert validator.is_valid("AU")
+    assert cache.validator(schema) is not validator
+    assert cache.stats()["validator"]["misses"] == 2
+
+    with pytest.raises(SchemaError):
+        cache.validator({"type": 5})
+
+
+def test_least_recently_used_evicted():
+    cache = CompilationCache(max_jsonpaths=2)
+    first = cache.jsonpath("$.a")
+    cache.jsonpath("$.b")
+    cache.jsonpath("$.a")
+    cache.jsonpath("$.c")
+    assert cache.jsonpath("$.a") is first
+    assert cache.stats()["jsonpath"]["size"] == 2
+
+    cache.jsonpath("$.b")
+    assert cache.stats()["jsonpath"]["misses"] == 4
+
+    cache.clear()
+    assert cache.stats()["jsonpath"]["size"] == 0
@@ -0,0 +1,195 @@
+import json
+from threading import Event, Thread
+
+import httpx
+import pytest
+from jwcrypto.jwk import JWK
+from jwcrypto.jwt import JWT
+
+from vclib.common import IssuerKeyResolutionError, IssuerKeyResolver
+
+ISSUER = "https://issuer.example.com:8082"
+DID = "did:web:issuer.example.com%3A8082"
+
+
+def make_did_documents(key: JWK, did: str = DID) -> dict[str, dict]:
+    public = json.loads(key.export_public())
+    public["kid"] = key.thumbprint()
+    linkage = JWT(
+        header={"alg": "ES256"}, claims={"iss": did, "domain": "issuer.example.com"}
+    )
+    linkage.make_signed_token(key)
+    return {
+        "/.well-known/did.json": {
+            "@context": ["https://www.w3.org/ns/did/v1"],
+            "id": did,
+            "verificationMethod": [
+                {
+                    "id": f"{did}#{public['kid']}",
+                    "type": "JsonWebKey2020",
+                    "controller": did,
+                    "publicKeyJwk": public,
+                }
+            ],
+            "authentication": [f"{did}#{public['kid']}"],
+        },
+        "/.well-known/did-configuration": {
+            "entries": [{"did": f"{did}#{public['kid']}", "jwt": linkage.serialize()}]
+        },
+    }
+
+
+class FakeIssuer:
+    def __init__(self, key: JWK):
+        self.documents = make_did_documents(key)
+        self.requests = 0
+        self.gate: Event | None = None
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.gate:
+            self.gate.wait(5)
+        if request.url.path not in self.documents:
+            return httpx.Response(404)
+        return httpx.Response(200, json=self.documents[request.url.path])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def issuer_key() -> JWK:
+    return JWK(generate="EC", crv="P-256")
+
+
+@pytest.fixture
+def fake_issuer(issuer_key) -> FakeIssuer:
+    return FakeIssuer(issuer_key)
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def resolver(fake_issuer, clock) -> IssuerKeyResolver:
+    return IssuerKeyResolver(
+        ttl=100,
+        negative_ttl=10,
+        client=httpx.Client(transport=httpx.MockTransport(fake_issuer.handle)),
+        clock=clock,
+    )
+
+
+def test_resolve_and_cache(resolver, fake_issuer, issuer_key):
+    key = resolver(ISSUER, {"alg": "ES256"})
+    assert key.thumbprint() == issuer_key.thumbprint()
+    assert resolver.resolve(ISSUER, issuer_key.thumbprint()) is key
+    assert resolver.resolve(DID) is not None  # did:web issuers resolve too
+
+    # did.json and did-configuration, for each of ISSUER and DID
+    assert fake_issuer.requests == 4
+
+
+def test_negative_cache(resolver, fake_issuer, clock):
+    fake_issuer.documents.pop("/.well-known/did-configuration")
+    for _ in range(3):
+        with pytest.raises(IssuerKeyResolutionError):
+            resolver(ISSUER, {})
+    assert fake_issuer.requests == 2
+
+    clock.now += 11
+    with pytest.raises(IssuerKeyResolutionError):
+        resolver(ISSUER, {})
+    assert fake_issuer.requests == 4
+
+
+def test_wrong_domain(fake_issuer, resolver, issuer_key):
+    fake_issuer.documents = make_did_documents(issuer_key, "did:web:elsewhere.com")
+    with pytest.raises(IssuerKeyResolutionError):
+        resolver(ISSUER, {})
+
+
+def test_untrusted_and_pinned(fake_issuer, issuer_key):
+    pinned = JWK(generate="EC", crv="P-256")
+    resolver = IssuerKeyResolver(
+        trusted_issuers=[ISSUER],
+        pinned_keys={"https://pinned.example.com": pinned},
+        client=httpx.Client(transport=httpx.MockTransport(fake_issuer.handle)),
+    )
+    assert resolver("https://pinned.example.com", {}) is pinned
+    with pytest.raises(IssuerKeyResolutionError):
+        resolver("https://untrusted.example.com", {})
+    assert fake_issuer.requests == 0
+
+
+def test_unknown_kid(resolver, fake_issuer, clock):
+    resolver(ISSUER, {})
+    with pytest.raises(IssuerKeyResolutionError):
+        resolver(ISSUER, {"kid": "unknown"})
+    assert fake_issuer.requests == 2  # too soon to refetch
+
+    clock.now += 11
+    with pytest.raises(IssuerKeyResolutionError):
+        resolver(ISSUER, {"kid": "unknown"})
+    assert fake_issuer.requests == 4
+
+
+def test_unknown_kid_refetch_fails(resolver, fake_issuer, clock):
+    resolver(ISSUER, {})
+    fake_issuer.documents.clear()
+    clock.now += 11
+    for _ in range(3):
+        with pytest.raises(IssuerKeyResolutionError):
+            resolver(ISSUER, {"kid": "unknown"})
+    # the failed refetch is rate limited like a successful one
+    assert fake_issuer.requests == 3
+    assert resolver(ISSUER, {}) is not None  # the cached keys are still served
+
+
+def test_did_url_kid(resolver, fake_issuer, issuer_key):
+    kid = issuer_key.thumbprint()
+    assert resolver.resolve(DID, f"{DID}#{kid}").thumbprint() == kid
+    assert resolver.resolve(ISSUER, f"{DID}#{kid}").thumbprint() == kid
+    # a verification method of another DID is not the issuer's
+    with pytest.raises(IssuerKeyResolutionError):
+        resolver.resolve(DID, f"did:web:elsewhere.com#{kid}")
+
+
+def test_single_flight(resolver, fake_issuer):
+    fake_issuer.gate = Event()
+    results = []
+    threads = [
+        Thread(target=lambda: results.append(resolver(ISSUER, {}))) for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    fake_issuer.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 5
+    assert fake_issuer.requests == 2
+
+
+def test_background_refresh(resolver, fake_issuer, clock):
+    key = resolver(ISSUER, {})
+    fake_issuer.gate = Event()
+
+    # within the refresh window, the cached key is returned immediately
+    clock.now += 95
+    assert resolver(ISSUER, {}) is key
+    fake_issuer.gate.set()
+    for _ in range(100):
+        if not resolver._inflight:
+            break
+        Event().wait(0.01)
+
+    assert fake_issuer.requests == 4
+    assert resolver._entries[ISSUER].expires_at == clock.now + 100
@@ -12,11 +12,17 @@ from .src.models.credential_offer import CredentialOffer as CredentialOffer
 from .src.models.credential_offer import CredentialSelection as CredentialSelection
 from .src.models.credentials import Credential as Credential
 from .src.models.credentials import DeferredCredential as DeferredCredential
+from .src.models.credentials import RefreshOutcome as RefreshOutcome
 from .src.models.issuer_metadata import AuthorizationMetadata as AuthorizationMetadata
 from .src.models.issuer_metadata import IssuerMetadata as IssuerMetadata
 from .src.models.oauth import AccessToken as AccessToken
 from .src.models.oauth import AuthorizationDetails as AuthorizationDetails
 from .src.models.oauth import OAuthTokenResponse as OAuthTokenResponse
+from .src.models.presentation_session import PresentationSession as PresentationSession
+from .src.presentation_exchange import Candidate as Candidate
+from .src.presentation_exchange import DescriptorMatch as DescriptorMatch
+from .src.presentation_exchange import PresentationMatch as PresentationMatch
+from .src.refresh_scheduler import RefreshScheduler as RefreshScheduler
 from .src.storage.abstract_storage_provider import (
     AbstractStorageProvider as AbstractStorageProvider,
 )
@@ -0,0 +1,193 @@
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import count
+from json import loads
+from typing import Any
+
+import jwt
+from jsonpath_ng.jsonpath import Child, Fields, Root
+from sd_jwt.common import SDJWTCommon
+
+from vclib.common import compile_jsonpath
+
+from .models.credentials import Credential, DeferredCredential
+from .storage.abstract_storage_provider import (
+    AbstractStorageProvider,
+    CredentialListener,
+)
+
+
+@lru_cache(maxsize=1024)
+def _first_claim(path: str) -> str | None:
+    """
+    The top-level claim a JSONPath starts with, e.g. `address` for
+    `$.address.country`, or `None` if it could start with any claim.
+    """
+    node, first = compile_jsonpath(path), None
+    while isinstance(node, Child):
+        node, first = node.left, node.right
+    if not isinstance(node, Root):
+        first = node
+    if isinstance(first, Fields) and len(first.fields) == 1:
+        name = first.fields[0]
+        return None if name == "*" else name
+    return None
+
+
+@dataclass(frozen=True)
+class IndexedDisclosure:
+    encoded: str
+    claim: dict[str, Any]  # {claim name: value}
+
+
+@dataclass
+class IndexedCredential:
+    id: str
+    seq: int  # keeps matches in the order credentials were stored
+    raw: str
+    received_at: str
+    payload: dict[str, Any]
+    disclosures: list[IndexedDisclosure] = field(default_factory=list)
+    # names of the claims in its payload, or disclosed
+    claim_names: frozenset[str] = frozenset()
+
+
+class ClaimIndex(CredentialListener):
+    """
+    The claims of every received credential, decoded once and indexed by their
+    top-level name, for matching presentation definition fields.
+
+    The index is kept up to date by its storage provider's notifications, and is
+    (re)loaded when first needed after a login.
+    """
+
+    def __init__(self, store: AbstractStorageProvider):
+        self.store = store
+        self._loaded = False
+        self._seq = count()
+        self._credentials: dict[str, IndexedCredential] = {}
+        # claim name -> IDs of credentials with it in their payload, or disclosed
+        self._in_payload: dict[str, set[str]] = defaultdict(set)
+        self._in_disclosures: dict[str, set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._credentials)
+
+    def credentials(self) -> list[IndexedCredential]:
+        """Every indexed credential, in the order they were stored."""
+        if not self._loaded:
+            self.load()
+        return sorted(self._credentials.values(), key=lambda indexed: indexed.seq)
+
+    def load(self):
+        """Indexes every received credential in storage, replacing the index."""
+        self.clear()
+        for cred in self.store.get_received_credentials():
+            self._add(cred)
+        self._loaded = True
+
+    def clear(self):
+        self._credentials.clear()
+        self._in_payload.clear()
+        self._in_disclosures.clear()
+        self._loaded = False
+
+    def credentials_changed(self, creds: list[Credential | DeferredCredential]):
+        if not self._loaded:
+            return
+        for cred in creds:
+            self._remove(cred.id)
+            if isinstance(cred, Credential):
+                self._add(cred)
+
+    def credentials_deleted(self, cred_ids: list[str]):
+        for cred_id in cred_ids:
+            self._remove(cred_id)
+
+    def credentials_reset(self):
+        self.clear()
+
+    def _add(self, cred: Credential):
+        parts = cred.raw_sdjwtvc.split("~")
+        try:
+            payload = jwt.decode(parts[0], options={"verify_signature": False})
+            disclosures = []
+            for encoded in parts[1:-1]:
+                decoded = loads(SDJWTCommon._base64url_decode(encoded).decode("utf-8"))
+                disclosures.append(IndexedDisclosure(encoded, {decoded[1]: decoded[2]}))
+        except Exception:
+            # not an SD-JWT, so it can never match
+            return
+
+        self._credentials[cred.id] = IndexedCredential(
+            cred.id,
+            next(self._seq),
+            cred.raw_sdjwtvc,
+            cred.received_at,
+            payload,
+            disclosures,
+            frozenset(payload).union(*(d.claim for d in disclosures)),
+        )
+        for name in payload:
+            self._in_payload[name].add(cred.id)
+        for disclosure in disclosures:
+            for name in disclosure.claim:
+                self._in_disclosures[name].add(cred.id)
+
+    def _remove(self, cred_id: str):
+        indexed = self._credentials.pop(cred_id, None)
+        if indexed is None:
+            return
+        for name in indexed.payload:
+            self._in_payload[name].discard(cred_id)
+        for disclosure in indexed.disclosures:
+            for name in disclosure.claim:
+                self._in_disclosures[name].discard(cred_id)
+
+    def _candidates(self, path: str) -> list[IndexedCredential]:
+        name = _first_claim(path)
+        if name is None:
+            candidates = list(self._credentials.values())
+        else:
+            ids = self._in_payload.get(name, set()) | self._in_disclosures.get(
+                name, set()
+            )
+            candidates = [self._credentials[cred_id] for cred_id in ids]
+        return sorted(candidates, key=lambda indexed: indexed.seq)
+
+    def find(
+        self, paths: list[str], accept: Callable[[Any], bool]
+    ) -> dict[str, list[str]]:
+        """
+        Finds the credentials with a claim at any of `paths`.
+
+        ### Parameters
+        - paths(`list[str]`): JSONPaths, as in a presentation definition field
+        - accept(`(value) -> bool`): Whether a disclosed claim's value satisfies
+          the field's filter
+
+        ### Returns
+        - `dict[str, list[str]]`: The matching credentials, mapped to the encoded
+          disclosure of the claim (or no disclosures, if the claim is in the
+          credential's payload)
+        """
+        if not self._loaded:
+            self.load()
+        matched_credentials: dict[str, list[str]] = {}
+        for path in paths:
+            expr = compile_jsonpath(path)
+            name = _first_claim(path)
+            for indexed in self._candidates(path):
+                if expr.find(indexed.payload):
+                    matched_credentials[indexed.raw] = []
+                    continue
+                for disclosure in indexed.disclosures:
+                    if name is not None and name not in disclosure.claim:
+                        continue
+                    if expr.find(disclosure.claim) and accept(
+                        next(iter(disclosure.claim.values()))
+                    ):
+                        matched_credentials[indexed.raw] = [disclosure.encoded]
+        return matched_credentials
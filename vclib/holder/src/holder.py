@@ -1,48 +1,164 @@
-from datetime import UTC, datetime
+import asyncio
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from datetime import UTC, datetime, timedelta
+from email.utils import parsedate_to_datetime
 from json import dumps, loads
 from typing import Any
-from urllib.parse import urlencode
 
 import httpx
-import jsonpath_ng
 import jwt
-from jsonschema import validate
-from requests import Response, Session
-from requests.auth import HTTPBasicAuth
-from requests_oauthlib import OAuth2Session
+from oauthlib.common import generate_token
+from oauthlib.oauth2 import WebApplicationClient
 from sd_jwt.common import SDJWTCommon
 
+from vclib.common import (
+    IssuerKeyResolver,
+    SDJWTVCHolder,
+    TTLStore,
+    compile_schema,
+    vp_auth_request,
+)
+
+from .claim_index import ClaimIndex
+from .http_cache import HTTPCache
 from .models.client_metadata import RegisteredClientMetadata, WalletClientMetadata
 from .models.credential_offer import CredentialOffer
-from .models.credentials import Credential, DeferredCredential
+from .models.credentials import Credential, DeferredCredential, RefreshOutcome
 from .models.issuer_metadata import AuthorizationMetadata, IssuerMetadata
 from .models.oauth import AccessToken, OAuthTokenResponse
+from .presentation_exchange import PresentationMatch, match_presentation_definition
+from .refresh_scheduler import RefreshScheduler
 from .storage.abstract_storage_provider import AbstractStorageProvider
 
+ISSUER_METADATA_PATH = "/.well-known/openid-credential-issuer"
+AUTH_METADATA_PATH = "/.well-known/oauth-authorization-server"
+
+# Outbound requests share one pooled client, which negotiates HTTP/2 where the
+# server supports it (needs the `httpx[http2]` extra).
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=30
+)
+
+# Deferred credentials polled at once by `refresh_all_deferred_credentials`
+DEFAULT_REFRESH_CONCURRENCY = 16
+DEFAULT_REFRESH_PER_ISSUER = 4
+
+# Seconds a user has to finish authorizing with an issuer, and the most
+# authorizations in progress at once. The oldest are dropped first.
+DEFAULT_AUTHORIZATION_TTL = 600
+DEFAULT_MAX_AUTHORIZATIONS = 1000
+
+# Seconds between sweeps of expired authorizations (and other expiring state),
+# while `lifespan` runs
+AUTHORIZATION_SWEEP_INTERVAL = 60
+
+# Seconds before a registered client's secret expires that a new client is
+# registered. The secret is only used once the user has finished authorizing,
+# which can take a while.
+CLIENT_SECRET_EXPIRY_MARGIN = 600
+
+# Credentials requested at once after authorization, when the issuer has no batch
+# credential endpoint
+DEFAULT_CREDENTIAL_REQUEST_CONCURRENCY = 8
+
+# Seconds issuer metadata is used for without revalidating it, if the issuer's
+# response does not say (with `Cache-Control: max-age`)
+DEFAULT_METADATA_TTL = 300
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """
+    The seconds an issuer asked a wallet to wait before polling again, with a
+    `Retry-After` header (in seconds, or as an HTTP date) or an `interval` in its
+    response body.
+    """
+    header = response.headers.get("Retry-After")
+    if header is not None:
+        if header.strip().isdigit():
+            return float(header)
+        try:
+            wait = parsedate_to_datetime(header) - datetime.now(tz=UTC)
+        except (TypeError, ValueError):
+            pass  # not a date, or one without a timezone
+        else:
+            return max(0.0, wait.total_seconds())
+    try:
+        return _interval(response.json())
+    except ValueError:
+        return None
+
+
+def _error_code(response: httpx.Response) -> str | None:
+    """The OAuth2 `error` in an error response's body, if it has one."""
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return body.get("error") if isinstance(body, dict) else None
+
+
+def _interval(body: Any) -> float | None:
+    """The `interval` in an issuer's response body, if it has one."""
+    interval = body.get("interval") if isinstance(body, dict) else None
+    if isinstance(interval, int | float) and not isinstance(interval, bool):
+        return float(interval)
+    return None
+
 
 class Holder:
     """
     ## Base IdentityOwner class
 
     ### Attributes
-    - oauth_clients(`dict[str, RegisteredClientMetadata]`): A dictionary of objects
-    representing registered OAuth2 clients. At any given time, the user may have
-    multiple OAuth contexts, for different issuers. During client registration &
+    - oauth_clients(`TTLStore`): Objects representing registered OAuth2 clients
+    (`RegisteredClientMetadata`). At any given time, the user may have multiple
+    OAuth contexts, for different issuers. During client registration &
     constructing the authorization redirect for the end user, the `state` parameter
     representing the new context is used as the key to store the relevant oauth client
-    data. These only need to be stored in memory, they do not need to persist.
+    data. These only need to be stored in memory, they do not need to persist. Each
+    is removed by the callback it is used in, or once it expires.
+
+    Clients registered with issuers are kept by the storage provider (see
+    `get_oauth_client`), so each issuer is registered with once rather than for
+    every issuance.
 
     - issuer_metadata_store(`dict[str, IssuerMetadata]`): A dictionary of objects
-    containing an issuer's metadata, stored under the issuer's URI.
+    containing an issuer's metadata, stored under the issuer's URI. Metadata put
+    here is used as is, instead of being requested from the issuer.
 
     - auth_metadata_store(`dict[str, AuthorizationMetadata]`): A dictionary of objects
     containing an issuer's authorization server, stored under the issuer's URI.
+    Like `issuer_metadata_store`, these are never requested or refreshed.
+
+    - http_cache(`HTTPCache`): Documents fetched by URI, e.g. issuer metadata and
+    presentation definitions passed by reference, kept according to their HTTP
+    cache headers.
+
+    - http_client(`httpx.AsyncClient`): Client shared by every request to issuers
+    and verifiers, keeping connections alive between them. Closed by `aclose`, or
+    at the end of `lifespan`.
+
+    - claim_index(`ClaimIndex`): The claims of the logged in user's credentials,
+    decoded ahead of time for matching presentation requests.
+
+    - refresh_scheduler(`RefreshScheduler`): Polls the logged in user's deferred
+    credentials in the background, for the life of `lifespan`.
     """
 
     def __init__(
         self,
         oauth_client_metadata: dict[str, Any],
         storage_provider: AbstractStorageProvider,
+        issuer_key_resolver: IssuerKeyResolver | None = None,
+        *,
+        metadata_ttl: float = DEFAULT_METADATA_TTL,
+        http_client: httpx.AsyncClient | None = None,
+        poll_deferred: bool = True,
+        authorization_ttl: float = DEFAULT_AUTHORIZATION_TTL,
+        max_authorizations: int | None = DEFAULT_MAX_AUTHORIZATIONS,
     ):
         """
         Create a new Identity Owner
@@ -53,16 +169,87 @@ class Holder:
         For additional entries, see `WalletClientMetadata`.
         - storage_provider(`AbstractStorageProvider`): An implementation of the
         `AbstractStorageProvider` abstract class.
+        - issuer_key_resolver(`IssuerKeyResolver | None`): If given, used to check
+        the signature of every credential received from an issuer before it is
+        stored.
+        - metadata_ttl(`float`): Seconds fetched issuer metadata is used for
+        before it is revalidated, unless the issuer's `Cache-Control` says otherwise.
+        - http_client(`httpx.AsyncClient | None`): Client to make requests with.
+        By default, one is created when first needed, see `make_http_client`.
+        - poll_deferred(`bool`): Whether `lifespan` polls deferred credentials in
+        the background, see `refresh_scheduler`.
+        - authorization_ttl(`float`): Seconds a user has to authorize with an issuer
+        before the authorization's state is no longer accepted.
+        - max_authorizations(`int | None`): Most authorizations in progress at once.
+        The oldest are dropped first.
         """
         self.client_metadata = WalletClientMetadata.model_validate(
             oauth_client_metadata
         )
 
-        self.oauth_clients: dict[str, RegisteredClientMetadata] = {}
+        self.oauth_clients = TTLStore(authorization_ttl, max_authorizations)
+        self._registrations: dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
         self.issuer_metadata_store: dict[str, IssuerMetadata] = {}
         self.auth_metadata_store: dict[str, AuthorizationMetadata] = {}
+        self.http_cache = HTTPCache()
+        self.metadata_ttl = metadata_ttl
+        self._http_client = http_client
 
         self.store = storage_provider
+        self.issuer_key_resolver = issuer_key_resolver
+        self.claim_index = ClaimIndex(storage_provider)
+        storage_provider.add_listener(self.claim_index)
+
+        self.poll_deferred = poll_deferred
+        self.refresh_scheduler = RefreshScheduler(self)
+
+    def make_http_client(self) -> httpx.AsyncClient:
+        """
+        Creates the client outbound requests are made with. Override to change
+        its timeouts, limits, proxies or certificates.
+        """
+        return httpx.AsyncClient(http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = self.make_http_client()
+        return self._http_client
+
+    async def aclose(self):
+        """Closes the shared HTTP client's connections."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    @asynccontextmanager
+    async def lifespan(self, _app=None) -> AsyncIterator[None]:
+        """
+        Opens the shared HTTP client for the life of an app, closing it when the
+        app shuts down. Meanwhile, expired authorizations are swept from
+        `oauth_clients`, and deferred credentials polled if `poll_deferred`. Can be
+        passed as a FastAPI app's `lifespan`.
+        """
+        _ = self.http_client
+        if self.poll_deferred:
+            self.refresh_scheduler.start()
+        sweeper = asyncio.create_task(self._sweep_expired())
+        try:
+            yield
+        finally:
+            sweeper.cancel()
+            with suppress(asyncio.CancelledError):
+                await sweeper
+            await self.refresh_scheduler.stop()
+            await self.aclose()
+
+    def _purge_expired(self):
+        self.oauth_clients.purge_expired()
+
+    async def _sweep_expired(self):
+        while True:
+            await asyncio.sleep(AUTHORIZATION_SWEEP_INTERVAL)
+            self._purge_expired()
 
     def _get_credential_payload(self, sd_jwt_vc: str):
         return sd_jwt_vc.split("~")[0]
@@ -96,10 +283,23 @@ class Holder:
             encoded_to_decoded_disclosures[disclosure] = decoded_disclosure_claim
         return encoded_to_decoded_disclosures
 
+    async def _verify_credential_signature(self, sd_jwt_vc: str):
+        """Checks a received credential was signed by its issuer, if an
+        `issuer_key_resolver` was given. Raises an exception if it wasn't."""
+        if self.issuer_key_resolver is None:
+            return
+        header = jwt.get_unverified_header(self._get_credential_payload(sd_jwt_vc))
+        payload = self._get_decoded_credential_payload(sd_jwt_vc)
+        # The resolver may block on fetching the issuer's DID document
+        key = await asyncio.to_thread(
+            self.issuer_key_resolver, payload.get("iss"), header
+        )
+        SDJWTVCHolder(sd_jwt_vc).verify_signature(key)
+
     def _validate_disclosure(self, disclosure: dict[str, Any], filter=None) -> bool:
         if filter:
             try:
-                validate(disclosure, filter)
+                return compile_schema(filter).is_valid(disclosure)
             except Exception:
                 return False
         return True
@@ -110,41 +310,35 @@ class Holder:
         filter: dict,  # a jsonschema
     ) -> dict[str, list[str]]:
         """returns list(credential, [encoded disclosure])"""
-        sdjwts = [
-            credential.raw_sdjwtvc
-            for credential in self.store.get_received_credentials()
-            if "." in credential.raw_sdjwtvc
-        ]  # dying because some of the example
-        # raw sdjwts aren't sdjwts?
-        # will ask mack l8r
-        matched_credentials = {}
-        for path in paths:
-            expr = jsonpath_ng.parse(path)
-            for credential in sdjwts:
-                payload = self._get_decoded_credential_payload(credential)
-                matches = expr.find(payload)
-                if matches not in ([], None):
-                    matched_credentials[credential] = []
-                    continue
-
-                encoded_to_decoded_disclosures = (
-                    self._get_decoded_credential_disclosures(credential)
-                )
-                disclosures = encoded_to_decoded_disclosures.values()
-                for disclosure in disclosures:
-                    matches = expr.find(disclosure)
-                    if matches not in ([], None):
-                        disclosure_passes_filter = self._validate_disclosure(
-                            next(iter(disclosure.values())), filter
-                        )
-                        if not disclosure_passes_filter:
-                            continue
-                        disclosure_idx = list(disclosures).index(disclosure)
-                        encoded_disclosures = encoded_to_decoded_disclosures.keys()
-                        encoded_disclosure = list(encoded_disclosures)[disclosure_idx]
-                        matched_credentials[credential] = [encoded_disclosure]
-
-        return matched_credentials
+        return self.claim_index.find(
+            paths, lambda value: self._validate_disclosure(value, filter)
+        )
+
+    def match_presentation_definition(
+        self,
+        definition: vp_auth_request.PresentationDefinition,
+        approved_fields: list[vp_auth_request.Field] | None = None,
+    ) -> PresentationMatch:
+        """
+        Finds the credentials that could be presented for a presentation
+        definition, see `presentation_exchange.match_presentation_definition`.
+
+        ### Parameters
+        - definition(`PresentationDefinition`): The presentation definition
+        - approved_fields(`list[Field] | None`): The fields the user agreed to
+          present. Defaults to all of them.
+
+        ### Returns
+        - `PresentationMatch`: The ranked candidates for each input descriptor,
+          and the descriptors to present
+        """
+        approved = None
+        if approved_fields is not None:
+
+            def approved(field: vp_auth_request.Field) -> bool:
+                return field in approved_fields
+
+        return match_presentation_definition(definition, self.claim_index, approved)
 
     ###
     ### Credential Issuance (OAuth2)
@@ -181,10 +375,9 @@ class Holder:
         offer: CredentialOffer
         if credential_offer_uri:
             # Create a credential offer obj from the URI
-            with Session() as s:
-                res: Response = s.get(credential_offer_uri)
-                res.raise_for_status()
-                offer = CredentialOffer.model_validate_json(res.content)
+            res = await self.http_client.get(credential_offer_uri)
+            res.raise_for_status()
+            offer = CredentialOffer.model_validate_json(res.content)
         else:
             offer = CredentialOffer.model_validate_json(credential_offer)
 
@@ -201,9 +394,10 @@ class Holder:
         ### Parameters:
         - issuer_uri(`str`): The issuer's URI
         - force_refresh(`bool = False`): If `True`, will force the `IdentityOwner`
-         to request from the issuer's metadata endpoints. Otherwise, it will
-         attempt to load the metadata from memory, and only request it if it cannot
-         be found.
+         to revalidate the issuer's metadata with its metadata endpoints, ignoring
+         metadata in `issuer_metadata_store` and `auth_metadata_store`. Otherwise,
+         metadata is only requested if it is not stored or cached, or its cached
+         copy has expired.
 
         ### Returns:
         - Tuple[`IssuerMetadata`, `AuthorizationMetadata`]: A tuple containing two
@@ -216,29 +410,30 @@ class Holder:
             issuer_metadata = self.issuer_metadata_store.get(issuer_uri, None)
             auth_metadata = self.auth_metadata_store.get(issuer_uri, None)
 
-        # If not already retrieved, get issuer metadata
-        if not issuer_metadata:
-            issuer_metadata = IssuerMetadata.model_validate(
-                await self.get_issuer_metadata(issuer_uri)
+        async def fetch(path: str, stored: Any) -> Any:
+            if stored:
+                return None
+            return await self.get_issuer_metadata(
+                issuer_uri, path, revalidate=force_refresh
             )
+
+        # Fetch whatever is missing at the same time, rather than one by one
+        issuer_body, auth_body = await asyncio.gather(
+            fetch(ISSUER_METADATA_PATH, issuer_metadata),
+            fetch(AUTH_METADATA_PATH, auth_metadata),
+        )
+
+        if not issuer_metadata:
+            issuer_metadata = IssuerMetadata.model_validate(issuer_body)
             # Check that the metadata matches
             if issuer_uri != issuer_metadata.credential_issuer:
                 raise Exception("Bad Issuer Metadata")
-            # Store it for easier access later if valid
-            self.issuer_metadata_store[issuer_uri] = issuer_metadata
 
-        # If not already retrieved, get authorization metadata
         if not auth_metadata:
-            auth_metadata = AuthorizationMetadata.model_validate(
-                await self.get_issuer_metadata(
-                    issuer_uri, path="/.well-known/oauth-authorization-server"
-                )
-            )
+            auth_metadata = AuthorizationMetadata.model_validate(auth_body)
             # Check that the metadata matches
             if issuer_uri != auth_metadata.issuer:
                 raise Exception("Bad Issuer Authorization Metadata")
-            # Store it for easier access later if valid
-            self.auth_metadata_store[issuer_uri] = auth_metadata
 
         return (issuer_metadata, auth_metadata)
 
@@ -252,7 +447,8 @@ class Holder:
         received credential offer, and returns an OAuth2 authorization URL.
 
         OAuth2 Client parameters are stored in `self.oauth_clients` under the
-        generated `state` as the key.
+        generated `state` as the key, until the callback or for `authorization_ttl`
+        seconds.
 
         ### Parameters:
         - credential_configuration_id: The selected credential configuration.
@@ -280,36 +476,37 @@ class Holder:
             issuer_url
         )
 
-        # Register as OAuth client
-        wallet_metadata = await self.register_client(
+        # Register as OAuth client, if not already registered
+        wallet_metadata = await self.get_oauth_client(
             auth_metadata.registration_endpoint, issuer_metadata.credential_issuer
         )
 
-        # Create an OAuth2 session.
-        # Use as context so the session closes at the end of the function call
-        with OAuth2Session(
-            client_id=wallet_metadata.client_id,
-            redirect_uri=wallet_metadata.redirect_uris[0],
-        ) as oauth2_client:
-            # create authorization_details parameter (url encoded JSON)
-            auth_details = {
-                "authorization_details": dumps(
-                    [
-                        {
-                            "type": "openid_credential",
-                            "credential_configuration_id": credential_configuration_id,
-                        }
-                    ]
-                )
-            }
-
-            # Store OAuth2 client details
-            (authorization_url, state) = oauth2_client.authorization_url(
-                auth_metadata.authorization_endpoint, **auth_details
+        # create authorization_details parameter (url encoded JSON)
+        auth_details = {
+            "authorization_details": dumps(
+                [
+                    {
+                        "type": "openid_credential",
+                        "credential_configuration_id": credential_configuration_id,
+                    }
+                ]
             )
+        }
 
-            self.oauth_clients[state] = wallet_metadata
-            return authorization_url
+        # Building the URL needs no request, so this stays off the network
+        state = generate_token()
+        authorization_url = WebApplicationClient(
+            wallet_metadata.client_id
+        ).prepare_request_uri(
+            auth_metadata.authorization_endpoint,
+            redirect_uri=wallet_metadata.redirect_uris[0],
+            state=state,
+            **auth_details,
+        )
+
+        # Store OAuth2 client details
+        self.oauth_clients.put(state, wallet_metadata)
+        return authorization_url
 
     async def get_access_token_and_credentials_from_callback(
         self,
@@ -322,8 +519,9 @@ class Holder:
         then attempts to retrieve one or more credentials from the issuer, depending
         on what the end user authorized the wallet to access.
 
-        The retrieved credentials are only saved if every credential request was
-        successful.
+        Credentials are requested concurrently, or all in one request if the issuer
+        has a batch credential endpoint. The retrieved credentials are only saved if
+        every credential request was successful.
 
         ### Parameters:
         - code(`str`): The authorization code, to be used in the token request.
@@ -336,144 +534,257 @@ class Holder:
         - (`List[Credential | DeferredCredential]`): A list containing the
         credential(s) retrieved from the issuer using the acquired access token.
         """
+        # Each state is accepted once, whether the authorization succeeded or not
+        oauth_client_info = self.oauth_clients.pop(state, None)
+
         if error is not None:
+            if error == "invalid_client" and oauth_client_info is not None:
+                self._forget_oauth_client(oauth_client_info)
             raise Exception(f"Bad Authorization Request: {error}")
 
         if code is None:
             raise Exception("Bad Authorization Request: Missing authorization code")
 
-        oauth_client_info = self.oauth_clients.get(state, None)
         if not oauth_client_info:
             raise Exception("Bad Authorization Redirect")
 
         # Don't save any new credentials until everything is done.
         # Should avoid malformed credentials this way.
         new_credentials = []
+        # Seconds the issuer asked to wait before polling each deferred credential
+        intervals: dict[str, float | None] = {}
 
         issuer_uri = oauth_client_info.issuer_uri
 
-        with OAuth2Session(
-            client_id=oauth_client_info.client_id,
-            redirect_uri=oauth_client_info.redirect_uris[0],
-            state=state,
-        ) as oauth2_client:
-            basic_auth = HTTPBasicAuth(
-                oauth_client_info.client_id, oauth_client_info.client_secret
-            )
-            auth_metadata = self.auth_metadata_store.get(issuer_uri, None)
-            if not auth_metadata:
-                auth_metadata = AuthorizationMetadata.model_validate(
-                    await self.get_issuer_metadata(
-                        issuer_uri, path="/.well-known/oauth-authorization-server"
-                    )
-                )
+        basic_auth = httpx.BasicAuth(
+            oauth_client_info.client_id, oauth_client_info.client_secret
+        )
+        issuer_metadata, auth_metadata = await self.get_issuer_and_auth_metadata(
+            issuer_uri
+        )
 
-            token_endpoint = auth_metadata.token_endpoint
-            headers = {
-                "Accept": "application/json",
-                "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8",
-            }
+        token_endpoint = auth_metadata.token_endpoint
+        headers = {"Accept": "application/json"}
 
-            params = {
-                "grant_type": "authorization_code",
-                "code": code,
-                "redirect_uri": oauth_client_info.redirect_uris[0],
-            }
+        params = {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": oauth_client_info.redirect_uris[0],
+        }
 
-            # Note - using post instead of fetch_token because fetch_token doesn't
-            # return the full request body
-            r: Response = oauth2_client.post(
-                token_endpoint, data=urlencode(params), auth=basic_auth, headers=headers
-            )
-            r.raise_for_status()
+        r = await self.http_client.post(
+            token_endpoint, data=params, auth=basic_auth, headers=headers
+        )
+        if r.is_error and _error_code(r) == "invalid_client":
+            # The code was issued to this client, so this authorization is lost,
+            # but the next one registers a new client.
+            self._forget_oauth_client(oauth_client_info)
+        r.raise_for_status()
+
+        access_token_res = OAuthTokenResponse.model_validate_json(r.content)
+        headers = {"Authorization": f"Bearer {access_token_res.access_token}"}
+
+        # Skip credential types the wallet does not support
+        requested = [
+            (detail.type, detail.credential_configuration_id, identifier)
+            for detail in access_token_res.authorization_details
+            if detail.type in self.client_metadata.authorization_details_types
+            for identifier in detail.credential_identifiers
+        ]
+        responses = await self._request_credentials(
+            issuer_metadata, [identifier for _, _, identifier in requested], headers
+        )
 
-            access_token_res = OAuthTokenResponse.model_validate_json(r.content)
-            # Update session
-            oauth2_client.token = access_token_res.model_dump()
+        expires_at = datetime.now(tz=UTC) + timedelta(
+            seconds=access_token_res.expires_in
+        )
+        token = AccessToken(
+            access_token=access_token_res.access_token,
+            token_type=access_token_res.token_type,
+            expires_in=access_token_res.expires_in,
+            expires_at=expires_at.isoformat(),
+        )
+        for (cred_type, config_id, _), (is_deferred, body, retry_after) in zip(
+            requested, responses, strict=True
+        ):
+            if not is_deferred:
+                # Immediate - load right away
+                new = body.get("credential", None)
+                if not new:
+                    err = "Invalid credential response from issuer: "
+                    err += "Value 'credential' missing from response."
+                    raise Exception(err)
+                await self._verify_credential_signature(new)
 
-            # Make requests for credentials
-            issuer_metadata = self.issuer_metadata_store.get(issuer_uri, None)
-            if not issuer_metadata:
-                issuer_metadata = IssuerMetadata.model_validate(
-                    await self.get_issuer_metadata(issuer_uri)
+                new_credential = Credential(
+                    issuer_url=issuer_uri,
+                    credential_configuration_id=config_id,
+                    is_deferred=False,
+                    c_type=cred_type,
+                    received_at=datetime.now(tz=UTC).isoformat(),
+                    raw_sdjwtvc=new,
                 )
 
-            for detail in access_token_res.authorization_details:
-                cred_type = detail.type
-                # Check if type is supported by wallet, skip if not
-                if cred_type not in self.client_metadata.authorization_details_types:
-                    continue
-
-                config_id = detail.credential_configuration_id
-                for identifier in detail.credential_identifiers:
-                    body = {"credential_identifier": identifier}
-                    headers = {
-                        "Authorization": f"Bearer {oauth2_client.token["access_token"]}",  # noqa e501
-                    }
-                    cred_response: Response = oauth2_client.request(
-                        "POST", issuer_metadata.credential_endpoint, json=body
-                    )
-                    cred_response.raise_for_status()
-                    # Determine if immediate or deferred
-                    if cred_response.status_code == 200:
-                        # Immediate - load right away
-                        new = cred_response.json().get("credential", None)
-                        if not new:
-                            err = "Invalid credential response from issuer: "
-                            err += "Value 'credential' missing from response."
-                            raise Exception(err)
-
-                        new_credential = Credential(
-                            issuer_url=issuer_uri,
-                            credential_configuration_id=config_id,
-                            is_deferred=False,
-                            c_type=cred_type,
-                            received_at=datetime.now(tz=UTC).isoformat(),
-                            raw_sdjwtvc=new,
-                        )
-
-                        new_credentials.append(new_credential)
-
-                    elif cred_response.status_code == 202:
-                        # Deferred - store tx id, access token, etc. to retrieve later.
-                        tx_id = cred_response.json().get("transaction_id", None)
-                        if not tx_id:
-                            err = "Invalid credential response from issuer: "
-                            err += "Value 'transaction_id' missing from response."
-                            raise Exception(err)
-                        deferred = issuer_metadata.deferred_credential_endpoint
-                        token = AccessToken(
-                            access_token=access_token_res.access_token,
-                            token_type=access_token_res.token_type,
-                            expires_in=access_token_res.expires_in,
-                        )
-                        new_credential = DeferredCredential(
-                            issuer_url=issuer_uri,
-                            credential_configuration_id=config_id,
-                            is_deferred=True,
-                            c_type=cred_type,
-                            transaction_id=tx_id,
-                            deferred_credential_endpoint=deferred,
-                            access_token=token,
-                            last_request=datetime.now(tz=UTC).isoformat(),
-                        )
-
-                        new_credentials.append(new_credential)
-
-                    else:
-                        raise Exception("Invalid credential response")
+                new_credentials.append(new_credential)
+
+            else:
+                # Deferred - store tx id, access token, etc. to retrieve later.
+                tx_id = body.get("transaction_id", None)
+                if not tx_id:
+                    err = "Invalid credential response from issuer: "
+                    err += "Value 'transaction_id' missing from response."
+                    raise Exception(err)
+                new_credential = DeferredCredential(
+                    issuer_url=issuer_uri,
+                    credential_configuration_id=config_id,
+                    is_deferred=True,
+                    c_type=cred_type,
+                    transaction_id=tx_id,
+                    deferred_credential_endpoint=(
+                        issuer_metadata.deferred_credential_endpoint
+                    ),
+                    access_token=token,
+                    last_request=datetime.now(tz=UTC).isoformat(),
+                )
+
+                new_credentials.append(new_credential)
+                intervals[new_credential.id] = retry_after
 
         self.store.add_many(new_credentials)
+        for cred in new_credentials:
+            if isinstance(cred, DeferredCredential):
+                self.refresh_scheduler.schedule(cred, intervals[cred.id])
         return new_credentials
 
+    async def _request_credentials(
+        self,
+        issuer_metadata: IssuerMetadata,
+        identifiers: list[str],
+        headers: dict[str, str],
+        *,
+        max_concurrency: int = DEFAULT_CREDENTIAL_REQUEST_CONCURRENCY,
+    ) -> list[tuple[bool, dict, float | None]]:
+        """
+        Requests credentials from an issuer: all in one request, if the issuer has a
+        batch credential endpoint, or else concurrently, at most `max_concurrency`
+        at a time.
+
+        ### Returns
+        - `list[tuple[bool, dict, float | None]]`: For each identifier, in order,
+        whether the credential was deferred, the issuer's response for it, and the
+        seconds the issuer asked to wait before polling for it, if it said
+
+        ### Raises
+        - `Exception`: If any request fails. The remaining requests are cancelled.
+        """
+        batch_endpoint = issuer_metadata.batch_credential_endpoint
+        if batch_endpoint is not None and len(identifiers) > 1:
+            body = {
+                "credential_requests": [
+                    {"credential_identifier": identifier} for identifier in identifiers
+                ]
+            }
+            res = await self.http_client.post(
+                batch_endpoint, json=body, headers=headers
+            )
+            res.raise_for_status()
+            responses = res.json().get("credential_responses", None)
+            if (
+                not isinstance(responses, list)
+                or len(responses) != len(identifiers)
+                or not all(isinstance(r, dict) for r in responses)
+            ):
+                raise Exception("Invalid batch credential response from issuer")
+            retry_after = _retry_after(res)
+            return [
+                ("transaction_id" in r, r, _interval(r) or retry_after)
+                for r in responses
+            ]
+
+        limit = asyncio.Semaphore(max_concurrency)
+
+        async def request(identifier: str) -> tuple[bool, dict, float | None]:
+            async with limit:
+                res = await self.http_client.post(
+                    issuer_metadata.credential_endpoint,
+                    json={"credential_identifier": identifier},
+                    headers=headers,
+                )
+            res.raise_for_status()
+            if res.status_code not in (200, 202):
+                raise Exception("Invalid credential response")
+            return res.status_code == 202, res.json(), _retry_after(res)
+
+        tasks = [asyncio.ensure_future(request(i)) for i in identifiers]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
     async def get_issuer_metadata(
-        self, issuer_uri, path="/.well-known/openid-credential-issuer"
-    ):
-        body: Any
-        with httpx.AsyncClient() as client:
-            res: Response = client.get(f"{issuer_uri}{path}")
-            body = res.json()
-        return body
+        self, issuer_uri, path=ISSUER_METADATA_PATH, *, revalidate: bool = False
+    ) -> Any:
+        """
+        Gets one of an issuer's metadata documents, from `http_cache` if possible.
+        Concurrent requests for the same document share one request.
+
+        ### Parameters
+        - issuer_uri(`str`): The issuer's URI
+        - path(`str`): The document's path, e.g. `ISSUER_METADATA_PATH` or
+        `AUTH_METADATA_PATH`
+        - revalidate(`bool = False`): Whether to check a cached document with the
+        issuer even if it has not expired
+
+        ### Returns
+        - `Any`: The decoded JSON document
+
+        ### Raises
+        - `httpx.HTTPError`: If the document could not be retrieved
+        """
+        return await self.http_cache.get_json(
+            f"{issuer_uri}{path}",
+            self.http_client,
+            revalidate=revalidate,
+            default_ttl=self.metadata_ttl,
+        )
+
+    async def get_oauth_client(
+        self, registration_url: str, issuer_uri: str
+    ) -> RegisteredClientMetadata:
+        """
+        Gets the OAuth client registered with an issuer, from storage if possible.
+
+        A new client is registered (see `register_client`) and stored if none is
+        stored, its secret is about to expire, or it was registered with other
+        redirect URIs. Concurrent calls for one issuer share one registration.
+
+        ### Parameters
+        - registration_url(`str`): The issuer's registration endpoint
+        - issuer_uri(`str`): The issuer's URI
+
+        ### Returns
+        - `RegisteredClientMetadata`: The registered client
+        """
+        async with self._registrations[issuer_uri]:
+            client = self.store.get_oauth_client(issuer_uri)
+            if (
+                client is None
+                or client.secret_expires_within(CLIENT_SECRET_EXPIRY_MARGIN)
+                or client.redirect_uris != self.client_metadata.redirect_uris
+            ):
+                client = await self.register_client(registration_url, issuer_uri)
+                self.store.put_oauth_client(client)
+            return client
+
+    def _forget_oauth_client(self, client: RegisteredClientMetadata):
+        """
+        Forgets a client the issuer no longer accepts, unless it has been replaced.
+        """
+        stored = self.store.get_oauth_client(client.issuer_uri)
+        if stored is not None and stored.client_id == client.client_id:
+            self.store.delete_oauth_client(client.issuer_uri)
 
     async def register_client(
         self, registration_url, issuer_uri, wallet_metadata=None
@@ -482,11 +793,11 @@ class Holder:
         registered: RegisteredClientMetadata
         if not metadata:
             metadata = self.client_metadata.model_dump()
-        async with httpx.AsyncClient() as client:
-            res: httpx.Response = await client.post(registration_url, json=metadata)
-            body: dict = res.json()
-            body["issuer_uri"] = issuer_uri
-            registered = RegisteredClientMetadata.model_validate(body)
+        res = await self.http_client.post(registration_url, json=metadata)
+        res.raise_for_status()
+        body: dict = res.json()
+        body["issuer_uri"] = issuer_uri
+        registered = RegisteredClientMetadata.model_validate(body)
         return registered
 
     ###
@@ -495,11 +806,16 @@ class Holder:
 
     def login(self, username: str, password: str):
         self.store.login(username, password)
+        self.claim_index.load()
+        self.refresh_scheduler.load()
 
     def register(self, username: str, password: str):
         self.store.register(username, password)
+        self.claim_index.load()
+        self.refresh_scheduler.load()
 
     def logout(self):
+        self.refresh_scheduler.clear()
         self.store.logout()
 
     ###
@@ -544,62 +860,148 @@ class Holder:
         if isinstance(cred, Credential):
             return cred
 
-        token = cred.access_token.model_dump()
+        refreshed, retry_after = await self._request_deferred_credential(cred)
+        self.store.update_credential(refreshed)
+        if isinstance(refreshed, DeferredCredential):
+            self.refresh_scheduler.schedule(refreshed, retry_after)
+        else:
+            self.refresh_scheduler.unschedule(cred_id)
+        return refreshed
+
+    async def _request_deferred_credential(
+        self, cred: DeferredCredential
+    ) -> tuple[Credential | DeferredCredential, float | None]:
+        """
+        Asks the issuer for a deferred credential, without storing the result.
+
+        ### Returns
+        - `tuple[Credential | DeferredCredential, float | None]`: The issued
+        credential, or the deferred credential with an updated `last_request` if it
+        is still pending, and the seconds the issuer asked to wait before asking
+        again, if it said
+        """
         headers = {
             "Authorization": f"Bearer {cred.access_token.access_token}",
         }
         body = {"transaction_id": cred.transaction_id}
-        with OAuth2Session(token=token) as s:
-            s.headers = headers
-            refresh: Response = s.request(
-                "POST", cred.deferred_credential_endpoint, json=body
-            )
+        refresh = await self.http_client.post(
+            cred.deferred_credential_endpoint, json=body, headers=headers
+        )
 
-            if (
-                refresh.status_code == 400
-                and refresh.json()["error"] == "issuance_pending"
-            ):
-                cred.last_request = datetime.now(tz=UTC).isoformat()
-                self.store.update_credential(cred)
-                return cred
+        if refresh.status_code == 400 and _error_code(refresh) == "issuance_pending":
+            pending = cred.model_copy(
+                update={"last_request": datetime.now(tz=UTC).isoformat()}
+            )
+            return pending, _retry_after(refresh)
+
+        # Pending credentials also use 400
+        refresh.raise_for_status()
+
+        if refresh.status_code == 200:
+            new = refresh.json().get("credential", None)
+            if not new:
+                err = "Invalid credential response from issuer: "
+                err += "Value 'credential' missing from response."
+                raise Exception(err)
+            await self._verify_credential_signature(new)
+
+            issued = Credential(
+                id=cred.id,
+                issuer_url=cred.issuer_url,
+                credential_configuration_id=cred.credential_configuration_id,
+                is_deferred=False,
+                c_type=cred.c_type,
+                received_at=datetime.now(tz=UTC).isoformat(),
+                raw_sdjwtvc=new,
+            )
+            return issued, None
 
-            # Pending credentials also use 400
-            refresh.raise_for_status()
+        raise Exception("Invalid credential response")
 
-            if refresh.status_code == 200:
-                new = refresh.json().get("credential", None)
-                if not new:
-                    err = "Invalid credential response from issuer: "
-                    err += "Value 'credential' missing from response."
-                    raise Exception(err)
+    async def refresh_all_deferred_credentials(
+        self,
+        *,
+        max_concurrency: int = DEFAULT_REFRESH_CONCURRENCY,
+        max_per_issuer: int = DEFAULT_REFRESH_PER_ISSUER,
+    ) -> list[RefreshOutcome]:
+        """
+        Polls the issuer for updates on all outstanding credential requests.
 
-                new_credential = Credential(
-                    id=cred_id,
-                    issuer_url=cred.issuer_url,
-                    credential_configuration_id=cred.credential_configuration_id,
-                    is_deferred=False,
-                    c_type=cred.c_type,
-                    received_at=datetime.now(tz=UTC).isoformat(),
-                    raw_sdjwtvc=new,
-                )
-                self.store.update_credential(new_credential)
-                return new_credential
+        Requests are made concurrently, at most `max_per_issuer` at a time to any
+        one issuer. Every credential's update is then written to storage at once,
+        and saved once.
 
-            raise Exception("Invalid credential response")
+        ### Parameters
+        - max_concurrency(`int`): Most requests in flight at once
+        - max_per_issuer(`int`): Most requests in flight at once to one issuer
 
-    async def refresh_all_deferred_credentials(self) -> list[str]:
+        ### Returns
+        - `list[RefreshOutcome]`: The outcome for every credential that was deferred
+        before calling this method. Credentials still pending have their
+        `last_request` attribute updated. A credential whose request failed is
+        left unchanged.
         """
-        Polls the issuer for updates on all outstanding credential requests.
+        results = await self._refresh_many(
+            self.store.get_deferred_credentials(),
+            max_concurrency=max_concurrency,
+            max_per_issuer=max_per_issuer,
+        )
+        for refreshed, outcome, retry_after in results:
+            if isinstance(refreshed, DeferredCredential):
+                self.refresh_scheduler.schedule(refreshed, retry_after)
+            elif refreshed is not None:
+                self.refresh_scheduler.unschedule(outcome.credential_id)
+        return [outcome for _, outcome, _ in results]
+
+    async def _refresh_many(
+        self,
+        creds: list[DeferredCredential],
+        *,
+        max_concurrency: int = DEFAULT_REFRESH_CONCURRENCY,
+        max_per_issuer: int = DEFAULT_REFRESH_PER_ISSUER,
+    ) -> list[
+        tuple[Credential | DeferredCredential | None, RefreshOutcome, float | None]
+    ]:
+        """
+        Requests deferred credentials concurrently, and stores the results at once.
 
         ### Returns
-        - `list[str]` A list of credential IDs that a refresh was attempted on. Note
-        that the IDs all credentials that were deferred before calling this method will
-        be returned; even if the credential is still deferred, because the
-        `last_request` attribute will be updated.
+        - `list[tuple]`: For each credential, what it was updated to (`None` if
+        its request failed), its outcome, and the seconds the issuer asked to wait
+        before asking again, if it said
         """
-        updated = []
-        for cred in self.store.get_deferred_credentials():
-            await self.refresh_credential(cred.id)
-            updated.append(cred.id)
-
-        return updated
+        by_issuer: dict[str, list[DeferredCredential]] = defaultdict(list)
+        for cred in creds:
+            by_issuer[cred.issuer_url].append(cred)
+
+        limit = asyncio.Semaphore(max_concurrency)
+
+        async def refresh(
+            cred: DeferredCredential, issuer_limit: asyncio.Semaphore
+        ) -> tuple[
+            Credential | DeferredCredential | None, RefreshOutcome, float | None
+        ]:
+            async with issuer_limit, limit:
+                try:
+                    refreshed, retry_after = await self._request_deferred_credential(
+                        cred
+                    )
+                except Exception as e:
+                    outcome = RefreshOutcome(
+                        credential_id=cred.id, status="failed", error=str(e)
+                    )
+                    return None, outcome, None
+            status = "pending" if refreshed.is_deferred else "issued"
+            outcome = RefreshOutcome(credential_id=cred.id, status=status)
+            return refreshed, outcome, retry_after
+
+        requests = []
+        for issuer_creds in by_issuer.values():
+            issuer_limit = asyncio.Semaphore(max_per_issuer)
+            requests += [refresh(cred, issuer_limit) for cred in issuer_creds]
+        results = await asyncio.gather(*requests)
+
+        updates = [refreshed for refreshed, _, _ in results if refreshed is not None]
+        if updates:
+            self.store.update_many(updates)
+        return results
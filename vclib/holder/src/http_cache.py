@@ -0,0 +1,188 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any
+
+import httpx
+
+
+def parse_cache_control(header: str | None) -> dict[str, str | None]:
+    """Parses a `Cache-Control` header into its directives (lowercased)."""
+    directives = {}
+    for part in (header or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') if value else None
+    return directives
+
+
+@dataclass
+class CacheEntry:
+    etag: str | None
+    value: Any
+    expires_at: float  # when the entry must be revalidated
+    immutable: bool = False
+
+
+class HTTPCache:
+    """
+    A small client-side cache for JSON documents, keyed by URI and validated by
+    ETag.
+
+    Responses are reused without a request while fresh, according to their
+    `Cache-Control` header (`max-age`, `immutable`, `no-cache`, `no-store`).
+    Once stale, they are revalidated with `If-None-Match`, so an unchanged
+    document costs a `304` rather than a download. At most `max_entries`
+    documents are kept, least recently used first out.
+
+    Concurrent requests for the same URI are merged into one (single-flight),
+    so every caller waiting on it gets the same response.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        *,
+        default_ttl: float = 0,
+        clock: Callable[[], float] = monotonic,
+    ):
+        """
+        ### Parameters
+        - max_entries(`int`): Maximum number of documents kept
+        - default_ttl(`float`): Seconds a response without `max-age` is fresh
+          for. By default such responses are always revalidated.
+        - clock(`() -> float`): Source of the current time, in seconds
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, uri: str) -> bool:
+        return uri in self._entries
+
+    def get_fresh(self, uri: str) -> Any | None:
+        """
+        ### Returns
+        - `Any | None`: The cached document, if it can be used without
+          revalidating it
+        """
+        entry = self._entries.get(uri)
+        if entry is None or not (entry.immutable or self.clock() < entry.expires_at):
+            return None
+        self._entries.move_to_end(uri)
+        return entry.value
+
+    def invalidate(self, uri: str | None = None):
+        if uri is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(uri, None)
+
+    def _expiry(
+        self, directives: dict[str, str | None], default_ttl: float | None = None
+    ) -> float:
+        if "no-cache" in directives:
+            return 0
+        if default_ttl is None:
+            default_ttl = self.default_ttl
+        try:
+            ttl = float(directives.get("max-age") or default_ttl)
+        except ValueError:
+            ttl = default_ttl
+        return self.clock() + ttl
+
+    async def get_json(
+        self,
+        uri: str,
+        client: httpx.AsyncClient,
+        parse: Callable[[httpx.Response], Any] = httpx.Response.json,
+        *,
+        revalidate: bool = False,
+        default_ttl: float | None = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Gets a document, from the cache if possible.
+
+        ### Parameters
+        - uri(`str`): The document's URI
+        - client(`httpx.AsyncClient`): Client used if a request is needed
+        - parse(`(Response) -> Any`): Turns a successful response into the value
+          to cache. Defaults to decoding it as JSON. A document is cached by its
+          URI alone, so a URI should always be parsed the same way.
+        - revalidate(`bool`): Whether to check a fresh document with the server
+          anyway
+        - default_ttl(`float | None`): Overrides `default_ttl` for this document
+        - Any other keyword arguments are passed to `client.get`
+
+        ### Returns
+        - `Any`: The parsed document
+
+        ### Raises
+        - `httpx.HTTPStatusError`: If the document could not be retrieved
+        """
+        if not revalidate:
+            value = self.get_fresh(uri)
+            if value is not None:
+                return value
+
+        inflight = self._inflight.get(uri)
+        if inflight is None:
+            inflight = asyncio.ensure_future(
+                self._fetch(uri, client, parse, default_ttl, kwargs)
+            )
+            self._inflight[uri] = inflight
+
+            def done(_):
+                if self._inflight.get(uri) is inflight:
+                    del self._inflight[uri]
+
+            inflight.add_done_callback(done)
+        # shielded, so one caller giving up does not cancel the others' request
+        return await asyncio.shield(inflight)
+
+    async def _fetch(
+        self,
+        uri: str,
+        client: httpx.AsyncClient,
+        parse: Callable[[httpx.Response], Any],
+        default_ttl: float | None,
+        kwargs: dict[str, Any],
+    ) -> Any:
+        entry = self._entries.get(uri)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+
+        res = await client.get(uri, headers=headers, **kwargs)
+        directives = parse_cache_control(res.headers.get("Cache-Control"))
+
+        if res.status_code == 304 and entry is not None:
+            entry.expires_at = self._expiry(directives, default_ttl)
+            entry.immutable = "immutable" in directives
+            self._entries.move_to_end(uri)
+            return entry.value
+
+        res.raise_for_status()
+        value = parse(res)
+        if "no-store" in directives:
+            self._entries.pop(uri, None)
+            return value
+
+        self._entries[uri] = CacheEntry(
+            etag=res.headers.get("ETag"),
+            value=value,
+            expires_at=self._expiry(directives, default_ttl),
+            immutable="immutable" in directives,
+        )
+        self._entries.move_to_end(uri)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
@@ -1,3 +1,5 @@
+from time import time
+
 from pydantic import BaseModel, Field
 
 
@@ -18,5 +20,14 @@ class WalletClientMetadata(BaseModel):
 class RegisteredClientMetadata(WalletClientMetadata):
     client_id: str
     client_secret: str
+    client_id_issued_at: int | None = Field(default=None)
+    # 0 if the secret does not expire, see RFC7591 Section 3.2.1
+    client_secret_expires_at: int | None = Field(default=None)
 
     issuer_uri: str
+
+    def secret_expires_within(self, seconds: float) -> bool:
+        """Whether the client secret expires in the next `seconds` seconds."""
+        if not self.client_secret_expires_at:
+            return False
+        return self.client_secret_expires_at <= time() + seconds
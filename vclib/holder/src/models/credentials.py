@@ -1,3 +1,4 @@
+from typing import Literal
 from uuid import uuid4
 
 from pydantic import BaseModel, Field
@@ -25,3 +26,11 @@ class DeferredCredential(BaseCredential):
 class Credential(BaseCredential):
     raw_sdjwtvc: str
     received_at: str
+
+
+class RefreshOutcome(BaseModel):
+    """The result of asking an issuer for one deferred credential."""
+
+    credential_id: str
+    status: Literal["issued", "pending", "failed", "expired"]
+    error: str | None = Field(default=None)
@@ -11,3 +11,6 @@ class FieldRequest(BaseModel):
 
 class FieldSelectionObject(BaseModel):
     field_requests: list[FieldRequest]
+    # the `PresentationSession` the fields were selected for. If not given, the
+    # most recently fetched authorization request is answered.
+    session_id: str | None = None
@@ -1,7 +1,7 @@
 import sqlite3
 from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class AuthorizationDetails(BaseModel):
@@ -14,6 +14,8 @@ class AccessToken(BaseModel):
     access_token: str
     token_type: str
     expires_in: int
+    # When the token expires, as an ISO 8601 timestamp, if known
+    expires_at: str | None = Field(default=None)
 
     def __conform__(self, protocol):
         if protocol is sqlite3.PrepareProtocol:
@@ -0,0 +1,12 @@
+from vclib.common import vp_auth_request
+
+
+class PresentationSession(vp_auth_request.AuthorizationRequestObject):
+    """
+    An authorization request from a verifier, awaiting the user's selection.
+
+    `session_id` is an opaque ID the wallet gives each request, which a
+    `FieldSelectionObject` refers back to.
+    """
+
+    session_id: str
@@ -0,0 +1,262 @@
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from vclib.common import compile_jsonpath, compile_schema, vp_auth_request
+
+from .claim_index import ClaimIndex, IndexedCredential, _first_claim
+
+if TYPE_CHECKING:
+    from jsonpath_ng import JSONPath
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """A credential that satisfies an input descriptor, and what it discloses."""
+
+    credential_id: str
+    credential: str  # the SD-JWT VC, with all of its disclosures
+    # encoded disclosures presented, in the order of the descriptor's fields
+    disclosures: tuple[str, ...]
+    # IDs (or paths) of the optional fields it satisfies
+    optional_fields: tuple[str, ...] = ()
+
+    def vp_token(self) -> str:
+        """The credential, with only the disclosures it presents."""
+        payload = self.credential.split("~")[0]
+        return "~".join([payload, *self.disclosures, ""])
+
+
+@dataclass
+class DescriptorMatch:
+    descriptor: vp_auth_request.InputDescriptor
+    # best first
+    candidates: list[Candidate] = field(default_factory=list)
+
+    @property
+    def best(self) -> Candidate | None:
+        return self.candidates[0] if self.candidates else None
+
+
+@dataclass
+class PresentationMatch:
+    """
+    The credentials that could be presented for a presentation definition.
+
+    - descriptors(`dict[str, DescriptorMatch]`): The ranked candidates for each
+      input descriptor, by descriptor ID, in the definition's order
+    - selected(`list[str]`): IDs of the descriptors to present, meeting the
+      definition's submission requirements. Without any, every descriptor with
+      a candidate is selected.
+    - satisfied(`bool`): Whether the selected descriptors meet the whole
+      definition
+    """
+
+    descriptors: dict[str, DescriptorMatch]
+    selected: list[str]
+    satisfied: bool
+
+
+class _FieldMatcher:
+    """A presentation definition field, with its paths and filter compiled."""
+
+    def __init__(self, field: vp_auth_request.Field):
+        self.field = field
+        self.key = field.id or field.path[0]
+        self.optional = bool(field.optional)
+        self.paths: list[tuple[JSONPath, str | None]] = [
+            (compile_jsonpath(path), _first_claim(path)) for path in field.path
+        ]
+        # top-level claims a credential needs one of, or None if any could do
+        names = {name for _, name in self.paths}
+        self.claim_names = None if None in names else frozenset(names)
+
+    def accepts(self, value: Any) -> bool:
+        if not self.field.filter:
+            return True
+        try:
+            return compile_schema(self.field.filter).is_valid(value)
+        except Exception:
+            return False
+
+    def match(self, indexed: IndexedCredential) -> tuple[bool, str | None]:
+        """
+        ### Returns
+        - `tuple[bool, str | None]`: Whether the credential has a claim at one of
+          the field's paths that passes its filter, and the encoded disclosure
+          of that claim (`None` if the claim is in the credential's payload)
+        """
+        if self.claim_names is not None and self.claim_names.isdisjoint(
+            indexed.claim_names
+        ):
+            return False, None
+        for expr, name in self.paths:
+            if any(self.accepts(m.value) for m in expr.find(indexed.payload)):
+                return True, None
+            for disclosure in indexed.disclosures:
+                if name is not None and name not in disclosure.claim:
+                    continue
+                if any(self.accepts(m.value) for m in expr.find(disclosure.claim)):
+                    return True, disclosure.encoded
+        return False, None
+
+
+class _DescriptorMatcher:
+    def __init__(
+        self,
+        descriptor: vp_auth_request.InputDescriptor,
+        approved: Callable[[vp_auth_request.Field], bool],
+    ):
+        self.descriptor = descriptor
+        fields = descriptor.constraints.fields or []
+        # A required field that was not approved can't be presented, so nothing
+        # can satisfy the descriptor
+        self.satisfiable = all(approved(f) for f in fields if not f.optional)
+        limited = descriptor.constraints.limit_disclosure == "required"
+        self.fields = [
+            _FieldMatcher(f)
+            for f in fields
+            # disclosing optional fields is left out where disclosure is limited
+            if approved(f) and not (f.optional and limited)
+        ]
+
+    def match(self, indexed: IndexedCredential) -> Candidate | None:
+        disclosures: list[str] = []
+        optional_fields: list[str] = []
+        for matcher in self.fields:
+            matched, disclosure = matcher.match(indexed)
+            if not matched:
+                if matcher.optional:
+                    continue
+                return None
+            if matcher.optional:
+                optional_fields.append(matcher.key)
+            if disclosure is not None and disclosure not in disclosures:
+                disclosures.append(disclosure)
+        return Candidate(
+            indexed.id, indexed.raw, tuple(disclosures), tuple(optional_fields)
+        )
+
+
+def _received_timestamp(indexed: IndexedCredential) -> float:
+    try:
+        return datetime.fromisoformat(indexed.received_at).timestamp()
+    except ValueError:
+        return 0
+
+
+def _select(
+    requirements: list[vp_auth_request.SubmissionRequirement],
+    descriptors: dict[str, DescriptorMatch],
+) -> list[str] | None:
+    """
+    The descriptors to present to meet every submission requirement, or `None`
+    if they can't all be met. Where a requirement lets a choice be made, the
+    fewest descriptors are picked, earliest in the definition first.
+    """
+    groups: dict[str, list[str]] = {}
+    for descriptor_id, match in descriptors.items():
+        for group in match.descriptor.group or []:
+            groups.setdefault(group, []).append(descriptor_id)
+
+    def meet(requirement: vp_auth_request.SubmissionRequirement) -> list[str] | None:
+        if requirement.from_ is not None:
+            options = [
+                [descriptor_id] if descriptors[descriptor_id].candidates else None
+                for descriptor_id in groups.get(requirement.from_, [])
+            ]
+        else:
+            options = [meet(nested) for nested in requirement.from_nested]
+        available = [option for option in options if option is not None]
+
+        if requirement.rule == "all":
+            if len(available) < len(options):
+                return None
+            picked = available
+        else:
+            if requirement.count is not None:
+                needed = requirement.count
+            else:
+                needed = max(requirement.min or 0, 1)
+                if requirement.max is not None:
+                    needed = min(needed, requirement.max)
+            if len(available) < needed:
+                return None
+            picked = available[:needed]
+        return [descriptor_id for option in picked for descriptor_id in option]
+
+    selected: set[str] = set()
+    for requirement in requirements:
+        met = meet(requirement)
+        if met is None:
+            return None
+        selected.update(met)
+    return [descriptor_id for descriptor_id in descriptors if descriptor_id in selected]
+
+
+def match_presentation_definition(
+    definition: vp_auth_request.PresentationDefinition,
+    index: ClaimIndex,
+    approved: Callable[[vp_auth_request.Field], bool] | None = None,
+) -> PresentationMatch:
+    """
+    Finds the credentials that satisfy each of a presentation definition's input
+    descriptors, looking at each credential in the wallet once.
+
+    A credential satisfies a descriptor if it has a claim passing the filter of
+    each required field. Optional fields it has are disclosed too, unless the
+    descriptor's `limit_disclosure` is `required`. Candidates are ranked by the
+    most optional fields satisfied, then the fewest disclosures, then the most
+    recently received, so the same wallet always presents the same credential.
+
+    ### Parameters
+    - definition(`PresentationDefinition`): The presentation definition
+    - index(`ClaimIndex`): The claims of the wallet's credentials
+    - approved(`(Field) -> bool | None`): Whether the user agreed to present a
+      field. Fields that were not approved are not disclosed, and a descriptor
+      with a required field that was not approved can't be satisfied. Defaults
+      to every field being approved.
+
+    ### Returns
+    - `PresentationMatch`: The ranked candidates for each descriptor, and the
+      descriptors to present
+    """
+    if approved is None:
+
+        def approved(_: vp_auth_request.Field) -> bool:
+            return True
+
+    matchers = [
+        _DescriptorMatcher(descriptor, approved)
+        for descriptor in definition.input_descriptors
+    ]
+    ranked: list[list[tuple[tuple, Candidate]]] = [[] for _ in matchers]
+    for indexed in index.credentials():
+        received = _received_timestamp(indexed)
+        for matcher, candidates in zip(matchers, ranked, strict=True):
+            if not matcher.satisfiable:
+                continue
+            candidate = matcher.match(indexed)
+            if candidate is not None:
+                rank = (
+                    -len(candidate.optional_fields),
+                    len(candidate.disclosures),
+                    -received,
+                    indexed.seq,
+                )
+                candidates.append((rank, candidate))
+
+    descriptors = {
+        matcher.descriptor.id: DescriptorMatch(
+            matcher.descriptor,
+            [candidate for _, candidate in sorted(candidates, key=lambda c: c[0])],
+        )
+        for matcher, candidates in zip(matchers, ranked, strict=True)
+    }
+
+    if definition.submission_requirements:
+        selected = _select(definition.submission_requirements, descriptors)
+        return PresentationMatch(descriptors, selected or [], selected is not None)
+    selected = [d for d, match in descriptors.items() if match.candidates]
+    return PresentationMatch(descriptors, selected, len(selected) == len(descriptors))
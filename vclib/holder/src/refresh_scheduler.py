@@ -0,0 +1,276 @@
+import asyncio
+import heapq
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import count
+from time import time
+from typing import TYPE_CHECKING
+
+from .models.credentials import DeferredCredential, RefreshOutcome
+
+if TYPE_CHECKING:
+    from .holder import Holder
+
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_MAX_POLL_INTERVAL = 600
+DEFAULT_POLL_BACKOFF = 2.0
+
+# Seconds before an access token expires that a last poll is made
+EXPIRY_MARGIN = 5
+
+# Outcomes kept for a subscriber that is not keeping up
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+@dataclass
+class _Schedule:
+    due: float
+    interval: float
+    expires_at: float | None
+    seq: int
+
+
+def _timestamp(iso: str | None) -> float | None:
+    if not iso:
+        return None
+    try:
+        return datetime.fromisoformat(iso).timestamp()
+    except ValueError:
+        return None
+
+
+class RefreshScheduler:
+    """
+    Polls a holder's deferred credentials in the background, each on its own
+    schedule.
+
+    Credentials are kept in a priority queue ordered by when they are next due.
+    A credential still pending is polled again after an interval that grows by
+    `backoff` each time, up to `max_interval`, unless the issuer asked for a
+    specific wait (with `Retry-After`, or an `interval` in its response). Polling
+    stops once the credential's access token has expired.
+
+    Every outcome is published to subscribers, e.g. a UI listening for
+    server-sent events.
+    """
+
+    def __init__(
+        self,
+        holder: "Holder",
+        *,
+        initial_interval: float = DEFAULT_POLL_INTERVAL,
+        max_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+        backoff: float = DEFAULT_POLL_BACKOFF,
+        clock: Callable[[], float] = time,
+    ):
+        """
+        ### Parameters
+        - holder(`Holder`): The holder whose credentials are polled
+        - initial_interval(`float`): Seconds between a credential being deferred
+          and its first poll
+        - max_interval(`float`): Longest wait between polls, in seconds
+        - backoff(`float`): Factor the wait grows by after each pending poll
+        - clock(`() -> float`): Source of the current time, as a UNIX timestamp
+        """
+        self.holder = holder
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.clock = clock
+
+        # (due, seq, credential ID); entries replaced by a later `schedule` are
+        # left in the heap and skipped when popped
+        self._heap: list[tuple[float, int, str]] = []
+        self._schedules: dict[str, _Schedule] = {}
+        self._seq = count()
+        self._wakeup = asyncio.Event()
+        self._subscribers: set[asyncio.Queue[RefreshOutcome]] = set()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def __contains__(self, cred_id: str) -> bool:
+        return cred_id in self._schedules
+
+    def next_due(self) -> float | None:
+        """When the next credential is due to be polled, if any are scheduled."""
+        while self._heap:
+            due, seq, cred_id = self._heap[0]
+            schedule = self._schedules.get(cred_id)
+            if schedule is not None and schedule.seq == seq:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def schedule(
+        self,
+        cred: DeferredCredential,
+        delay: float | None = None,
+        *,
+        interval: float | None = None,
+    ):
+        """
+        Schedules a credential's next poll, replacing any earlier schedule.
+
+        ### Parameters
+        - cred(`DeferredCredential`): The credential
+        - delay(`float | None`): Seconds until the poll. Defaults to `interval`.
+        - interval(`float | None`): The current wait between polls. Defaults to
+          `initial_interval`.
+        """
+        now = self.clock()
+        interval = self.initial_interval if interval is None else interval
+        due = now + (interval if delay is None else delay)
+        expires_at = _timestamp(cred.access_token.expires_at)
+        if expires_at is not None and due >= expires_at - EXPIRY_MARGIN:
+            # One last try just before the token expires. If that has passed,
+            # the credential is next looked at when it expires, and dropped.
+            last_try = expires_at - EXPIRY_MARGIN
+            due = last_try if last_try > now else expires_at
+
+        seq = next(self._seq)
+        self._schedules[cred.id] = _Schedule(due, interval, expires_at, seq)
+        heapq.heappush(self._heap, (due, seq, cred.id))
+        self._wakeup.set()
+
+    def unschedule(self, cred_id: str):
+        self._schedules.pop(cred_id, None)
+
+    def clear(self):
+        self._schedules.clear()
+        self._heap.clear()
+        self._wakeup.set()
+
+    def load(self):
+        """
+        Schedules every deferred credential in the holder's storage, due
+        `initial_interval` seconds after it was last requested.
+        """
+        self.clear()
+        now = self.clock()
+        for cred in self.holder.store.get_deferred_credentials():
+            last_request = _timestamp(cred.last_request) or now
+            self.schedule(cred, max(0, last_request + self.initial_interval - now))
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Queue[RefreshOutcome]]:
+        """
+        Receives every outcome published while the context is open. A subscriber
+        that falls behind loses its oldest outcomes.
+        """
+        queue: asyncio.Queue[RefreshOutcome] = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    def publish(self, outcome: RefreshOutcome):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(outcome)
+
+    def _pop_due(self) -> list[str]:
+        now = self.clock()
+        due = []
+        while (next_due := self.next_due()) is not None and next_due <= now:
+            _, _, cred_id = heapq.heappop(self._heap)
+            due.append(cred_id)
+        return due
+
+    async def run_once(self) -> list[RefreshOutcome]:
+        """
+        Polls every credential that is due, all at once.
+
+        ### Returns
+        - `list[RefreshOutcome]`: The outcome for each credential polled
+        """
+        due = self._pop_due()
+        if not due:
+            return []
+        popped = {cred_id: self._schedules[cred_id].seq for cred_id in due}
+        try:
+            return await self._poll(due)
+        except BaseException:
+            # Put back the credentials that weren't rescheduled, so they are
+            # tried again rather than forgotten. Any unscheduled meanwhile (e.g.
+            # by a logout) stay that way.
+            for cred_id, seq in popped.items():
+                schedule = self._schedules.get(cred_id)
+                if schedule is not None and schedule.seq == seq:
+                    heapq.heappush(self._heap, (schedule.due, seq, cred_id))
+            raise
+
+    async def _poll(self, due: list[str]) -> list[RefreshOutcome]:
+        deferred = {c.id: c for c in self.holder.store.get_deferred_credentials()}
+
+        creds: list[DeferredCredential] = []
+        outcomes: list[RefreshOutcome] = []
+        for cred_id in due:
+            schedule = self._schedules[cred_id]
+            cred = deferred.get(cred_id)
+            if cred is None:
+                # issued or deleted in the meantime
+                self.unschedule(cred_id)
+            elif (
+                schedule.expires_at is not None and self.clock() >= schedule.expires_at
+            ):
+                self.unschedule(cred_id)
+                outcomes.append(
+                    RefreshOutcome(
+                        credential_id=cred_id,
+                        status="expired",
+                        error="Access token expired",
+                    )
+                )
+            else:
+                creds.append(cred)
+
+        for refreshed, outcome, retry_after in await self.holder._refresh_many(creds):
+            outcomes.append(outcome)
+            if outcome.status == "issued":
+                self.unschedule(outcome.credential_id)
+                continue
+            schedule = self._schedules.get(outcome.credential_id)
+            if schedule is None:
+                # unscheduled while it was polled, e.g. by a logout
+                continue
+            cred = refreshed or deferred[outcome.credential_id]
+            interval = min(schedule.interval * self.backoff, self.max_interval)
+            self.schedule(cred, retry_after, interval=interval)
+
+        for outcome in outcomes:
+            self.publish(outcome)
+        return outcomes
+
+    async def run(self):
+        """Polls credentials as they fall due, until cancelled."""
+        while True:
+            self._wakeup.clear()
+            next_due = self.next_due()
+            if next_due is None or next_due > self.clock():
+                timeout = None if next_due is None else next_due - self.clock()
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue
+            try:
+                await self.run_once()
+            except Exception:
+                # e.g. storage became unavailable; try again later rather than
+                # stopping for good
+                await asyncio.sleep(self.initial_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
@@ -1,9 +1,52 @@
 from abc import ABCMeta, abstractmethod
 
+from vclib.holder.src.models.client_metadata import RegisteredClientMetadata
 from vclib.holder.src.models.credentials import Credential, DeferredCredential
 
 
+class CredentialListener:
+    """
+    Notified by a storage provider when its credentials change, e.g. to keep an
+    index of them up to date. Notifications are only sent once a change has been
+    made.
+    """
+
+    def credentials_changed(self, creds: list[Credential | DeferredCredential]):
+        """Credentials were added or updated."""
+
+    def credentials_deleted(self, cred_ids: list[str]):
+        """Credentials were deleted."""
+
+    def credentials_reset(self):
+        """
+        Any credential may have changed, e.g. because another user logged in, or a
+        change was rolled back.
+        """
+
+
 class AbstractStorageProvider(metaclass=ABCMeta):
+    def __init__(self):
+        self._listeners: list[CredentialListener] = []
+
+    def add_listener(self, listener: CredentialListener):
+        """Notifies `listener` of every change to the stored credentials."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: CredentialListener):
+        self._listeners.remove(listener)
+
+    def _notify_changed(self, creds: list[Credential | DeferredCredential]):
+        for listener in self._listeners:
+            listener.credentials_changed(creds)
+
+    def _notify_deleted(self, cred_ids: list[str]):
+        for listener in self._listeners:
+            listener.credentials_deleted(cred_ids)
+
+    def _notify_reset(self):
+        for listener in self._listeners:
+            listener.credentials_reset()
+
     @abstractmethod
     def register(self, *args, **kwargs):
         """
@@ -116,6 +159,27 @@ class AbstractStorageProvider(metaclass=ABCMeta):
         """
         [self.upsert_credential(c, *args, **kwargs) for c in creds]
 
+    def get_oauth_client(
+        self, issuer_uri: str, *args, **kwargs
+    ) -> RegisteredClientMetadata | None:
+        """
+        Retrieves the OAuth client registered with an issuer, if one is stored.
+        Providers that do not store clients return `None`, and the holder registers
+        a new client for every issuance.
+        """
+        return None
+
+    def put_oauth_client(self, client: RegisteredClientMetadata, *args, **kwargs):
+        """
+        Stores the OAuth client registered with `client.issuer_uri`, replacing any
+        stored before.
+        """
+
+    def delete_oauth_client(self, issuer_uri: str, *args, **kwargs):
+        """
+        Forgets the OAuth client registered with an issuer, if one is stored.
+        """
+
     @abstractmethod
     def save(self):
         """
@@ -15,6 +15,7 @@ from uuid import uuid4
 from argon2 import PasswordHasher
 from pyzipper import WZ_AES, ZIP_LZMA, AESZipFile
 
+from vclib.holder.src.models.client_metadata import RegisteredClientMetadata
 from vclib.holder.src.models.credentials import Credential, DeferredCredential
 
 from .abstract_storage_provider import AbstractStorageProvider
@@ -69,6 +70,14 @@ CREATE TABLE deferred_credentials (
 );
 """
 
+# Created on login too, for wallets made before clients were stored
+OAUTH_CLIENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS oauth_clients (
+    issuer_uri TEXT PRIMARY KEY NOT NULL,
+    client JSON NOT NULL
+);
+"""
+
 
 def dict_factory(cursor: Cursor, row: Row):
     # Ripped straight out of the sqlite3 row factory example, to make model
@@ -128,6 +137,7 @@ class LocalStorageProvider(AbstractStorageProvider):
 
     LOCAL_CONFIG_SCHEMA = CONFIG_SCHEMA
     LOCAL_CREDENTIAL_SCHEMA = WALLET_SCHEMA
+    LOCAL_OAUTH_CLIENT_SCHEMA = OAUTH_CLIENT_SCHEMA
 
     # Aliases all columns so that they can be quickly converted
     # to a [Deferred]Credential object
@@ -196,6 +206,7 @@ class LocalStorageProvider(AbstractStorageProvider):
         or expect the directory containing wallet data. If provided, this MUST be
         a directory. If not provided, will default to `Path.home()`
         """
+        super().__init__()
         self.active_user = None
         # Resolve storage path
         if storage_dir_path:
@@ -252,6 +263,7 @@ class LocalStorageProvider(AbstractStorageProvider):
         except Exception as e:
             conn.rollback()
             raise Exception(f"Problem when purging database: {e}")
+        self._notify_reset()
 
     def _check_storage_directory(self):
         # Check directory structure
@@ -356,6 +368,7 @@ class LocalStorageProvider(AbstractStorageProvider):
 
             # Create tables
             cursor = u_con.executescript(self.LOCAL_CREDENTIAL_SCHEMA)
+            cursor.executescript(self.LOCAL_OAUTH_CLIENT_SCHEMA)
             cursor.close()
 
             # Commit
@@ -379,6 +392,7 @@ class LocalStorageProvider(AbstractStorageProvider):
             config.close()
 
         self.active_user = self.ActiveUser(username, u_secret, user_store_path, u_con)
+        self._notify_reset()
 
     def login(self, username: str, password: str):
         """
@@ -438,10 +452,12 @@ class LocalStorageProvider(AbstractStorageProvider):
             u_zip.setpassword(user_secret)
 
             u_con.deserialize(u_zip.read(self.LOCAL_U_WALLET_FILENAME))
+        u_con.executescript(self.LOCAL_OAUTH_CLIENT_SCHEMA)
 
         self.active_user = self.ActiveUser(
             username, password.encode(), user_store_path, u_con
         )
+        self._notify_reset()
 
     def logout(self):
         """
@@ -456,6 +472,7 @@ class LocalStorageProvider(AbstractStorageProvider):
         self.save(close_after=True)
         del self.active_user
         self.active_user = None
+        self._notify_reset()
 
     def get_credential(self, cred_id: str) -> Credential | DeferredCredential:
         """
@@ -574,6 +591,7 @@ class LocalStorageProvider(AbstractStorageProvider):
         except Exception as e:
             self.get_db_conn().rollback()
             raise Exception(f"Credential could not be added: {e}")
+        self._notify_changed([cred])
         if save_after:
             self.save()
 
@@ -594,6 +612,7 @@ class LocalStorageProvider(AbstractStorageProvider):
             "DELETE FROM credential_info WHERE id = :cred_id", {"cred_id": cred_id}
         )
         cursor.close()
+        self._notify_deleted([cred_id])
         if save_after:
             self.save()
 
@@ -691,6 +710,7 @@ class LocalStorageProvider(AbstractStorageProvider):
             self.get_db_conn().rollback()
             raise Exception(f"Credential {cred.id} could not be updated: {e}")
         cursor.close()
+        self._notify_changed([cred])
         if save_after:
             self.save()
 
@@ -736,6 +756,7 @@ class LocalStorageProvider(AbstractStorageProvider):
             [self.add_credential(c, save_after=False) for c in creds]
         except Exception as e:
             self.get_db_conn().rollback()
+            self._notify_reset()
             raise e
         if save_after:
             self.save()
@@ -756,6 +777,7 @@ class LocalStorageProvider(AbstractStorageProvider):
         except Exception as e:
             self.get_db_conn().rollback()
             raise Exception(f"Problem when deleting credentials: {e}")
+        self._notify_deleted(cred_ids)
 
         if save_after:
             self.save()
@@ -774,6 +796,7 @@ class LocalStorageProvider(AbstractStorageProvider):
             [self.update_credential(c, save_after=False) for c in creds]
         except Exception as e:
             self.get_db_conn().rollback()
+            self._notify_reset()
             raise e
         if save_after:
             self.save()
@@ -792,10 +815,68 @@ class LocalStorageProvider(AbstractStorageProvider):
             [self.upsert_credential(c, save_after=False) for c in creds]
         except Exception as e:
             self.get_db_conn().rollback()
+            self._notify_reset()
             raise e
         if save_after:
             self.save()
 
+    def get_oauth_client(self, issuer_uri: str) -> RegisteredClientMetadata | None:
+        """
+        Retrieves the OAuth client registered with an issuer, if one is stored
+
+        ### Parameters
+        - issuer_uri(`str`): The issuer's URI
+        """
+        self._check_active_user()
+        row = (
+            self.get_db_conn()
+            .execute(
+                "SELECT client FROM oauth_clients WHERE issuer_uri = :issuer_uri",
+                {"issuer_uri": issuer_uri},
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return RegisteredClientMetadata.model_validate(row["client"])
+
+    def put_oauth_client(
+        self, client: RegisteredClientMetadata, *, save_after: bool = True
+    ):
+        """
+        Stores an OAuth client, replacing any stored for the same issuer
+
+        ### Parameters
+        - client(`RegisteredClientMetadata`): The client to store
+        - save_after(`bool = True`): If True (default), will call `save()` on finish.
+        """
+        self._check_active_user()
+        self.get_db_conn().execute(
+            """
+            INSERT OR REPLACE INTO oauth_clients (issuer_uri, client)
+            VALUES (:issuer_uri, :client)
+            """,
+            {"issuer_uri": client.issuer_uri, "client": client.model_dump()},
+        ).close()
+        if save_after:
+            self.save()
+
+    def delete_oauth_client(self, issuer_uri: str, *, save_after: bool = True):
+        """
+        Forgets the OAuth client registered with an issuer, if one is stored
+
+        ### Parameters
+        - issuer_uri(`str`): The issuer's URI
+        - save_after(`bool = True`): If True (default), will call `save()` on finish.
+        """
+        self._check_active_user()
+        self.get_db_conn().execute(
+            "DELETE FROM oauth_clients WHERE issuer_uri = :issuer_uri",
+            {"issuer_uri": issuer_uri},
+        ).close()
+        if save_after:
+            self.save()
+
     def save(self, *, to_disk=True, close_after=False):
         """
         Performs operations to push data to persistent storage (e.g. flushing to a
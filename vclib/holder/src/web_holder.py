@@ -1,16 +1,31 @@
+import asyncio
+from contextlib import suppress
 from datetime import UTC, datetime, timedelta
-from secrets import token_bytes
+from secrets import token_bytes, token_urlsafe
 from typing import Annotated, Any
 from urllib.parse import urlparse
 from uuid import uuid4
 
 import httpx
 from fastapi import FastAPI, Header, HTTPException
-from fastapi.responses import RedirectResponse
-from jwt import DecodeError, ExpiredSignatureError, decode, encode
+from fastapi.responses import RedirectResponse, StreamingResponse
+from jwt import (
+    DecodeError,
+    ExpiredSignatureError,
+    PyJWTError,
+    decode,
+    encode,
+    get_unverified_header,
+)
 from pydantic import ValidationError
 
-from vclib.common import vp_auth_request, vp_auth_response
+from vclib.common import (
+    IssuerKeyResolutionError,
+    IssuerKeyResolver,
+    TTLStore,
+    vp_auth_request,
+    vp_auth_response,
+)
 from vclib.holder.src.models.login_register import (
     LoginRequest,
     RegisterRequest,
@@ -20,8 +35,26 @@ from vclib.holder.src.storage.abstract_storage_provider import AbstractStoragePr
 
 from .holder import Holder
 from .models.credential_offer import CredentialOffer, CredentialSelection
-from .models.credentials import Credential, DeferredCredential
+from .models.credentials import Credential, DeferredCredential, RefreshOutcome
 from .models.field_selection_object import FieldSelectionObject
+from .models.presentation_session import PresentationSession
+
+# Seconds between comments sent to keep an idle event stream open
+SSE_KEEPALIVE_INTERVAL = 15
+
+# Seconds a user has to respond to a verifier's request, and the most requests
+# awaiting a response at once. The oldest are dropped first.
+DEFAULT_PRESENTATION_TTL = 600
+DEFAULT_MAX_PRESENTATIONS = 1000
+
+# Algorithms accepted on signed request objects (JAR)
+REQUEST_OBJECT_ALGS = ["ES256", "ES384", "ES512", "RS256", "PS256", "EdDSA"]
+
+
+def _parse_presentation_definition(
+    res: httpx.Response,
+) -> vp_auth_request.PresentationDefinition:
+    return vp_auth_request.PresentationDefinition.model_validate_json(res.content)
 
 
 class WebHolder(Holder):
@@ -40,6 +73,12 @@ class WebHolder(Holder):
         storage_provider: AbstractStorageProvider,
         *,
         oauth_client_options: dict[str, Any] = {},
+        issuer_key_resolver: IssuerKeyResolver | None = None,
+        verifier_key_resolver: IssuerKeyResolver | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        poll_deferred: bool = True,
+        presentation_ttl: float = DEFAULT_PRESENTATION_TTL,
+        max_presentations: int | None = DEFAULT_MAX_PRESENTATIONS,
     ):
         """
         Create a new Identity Owner
@@ -65,6 +104,27 @@ class WebHolder(Holder):
 
         - storage_provider(`AbstractStorageProvider`): An implementation of the
         `AbstractStorageProvider` abstract class.
+
+        - issuer_key_resolver(`IssuerKeyResolver | None`): Used to check the
+        signatures of received credentials. See `Holder`.
+
+        - verifier_key_resolver(`IssuerKeyResolver | None`): Used to check the
+        signatures of signed authorization requests, resolving the verifier's
+        key from its `client_id`. Defaults to resolving the key from the DID
+        document the verifier serves, without checking its DID configuration.
+
+        - http_client(`httpx.AsyncClient | None`): Client to make requests with.
+        See `Holder`.
+
+        - poll_deferred(`bool = True`): Whether to poll deferred credentials in
+        the background while the server runs. See `Holder`.
+
+        - presentation_ttl(`float`): Seconds a user has to respond to a
+        verifier's authorization request, once it has been fetched.
+
+        - max_presentations(`int | None`): Most authorization requests awaiting
+        a response at once. The oldest are dropped to make room. Unbounded if
+        `None`.
         """
 
         # Referenced in `get_server`
@@ -75,16 +135,26 @@ class WebHolder(Holder):
         oauth_client_info = oauth_client_options
         oauth_client_info["redirect_uris"] = redirect_uris
         oauth_client_info["credential_offer_endpoint"] = cred_offer_endpoint
-        super().__init__(oauth_client_info, storage_provider)
-        self.current_transaction: vp_auth_request.AuthorizationRequestObject | None = (
-            None
+        super().__init__(
+            oauth_client_info,
+            storage_provider,
+            issuer_key_resolver=issuer_key_resolver,
+            http_client=http_client,
+            poll_deferred=poll_deferred,
+        )
+        self.verifier_key_resolver = verifier_key_resolver or IssuerKeyResolver(
+            check_did_configuration=False
         )
+        # Authorization requests awaiting the user's response, by session ID
+        self.presentations = TTLStore(presentation_ttl, max_presentations)
+        # Answered when a selection names no session, as before sessions existed
+        self._latest_presentation: str | None = None
 
         self.SECRET = token_bytes(32)
         self.SESSION_TOKEN_ALG = "HS256"
 
     def get_server(self) -> FastAPI:
-        router = FastAPI()
+        router = FastAPI(lifespan=self.lifespan)
 
         # Authentication
         router.post("/login")(self.user_login)
@@ -95,6 +165,7 @@ class WebHolder(Holder):
         router.get("/credentials/{cred_id}")(self.get_credential)
         router.get("/credentials")(self.get_credentials)
         router.delete("/credentials/{cred_id}")(self.delete_credential)
+        router.get("/refresh/events")(self.refresh_events)
         router.get("/refresh/{cred_id}")(self.refresh)
         router.get("/refresh")(self.refresh_all)
 
@@ -193,6 +264,15 @@ class WebHolder(Holder):
         """
         self.logout()
 
+    def logout(self):
+        self.presentations.clear()
+        self._latest_presentation = None
+        super().logout()
+
+    def _purge_expired(self):
+        super()._purge_expired()
+        self.presentations.purge_expired()
+
     ###
     ### Interaction with Wallet
     ###
@@ -279,13 +359,47 @@ class WebHolder(Holder):
     async def refresh_all(
         self,
         authorization: Annotated[str | None, Header()] = None,
-    ) -> list[str]:
+    ) -> list[RefreshOutcome]:
         """
         Refresh all credentials.
         """
         self.check_token(authorization)
         return await self.refresh_all_deferred_credentials()
 
+    async def refresh_events(
+        self,
+        authorization: Annotated[str | None, Header()] = None,
+    ) -> StreamingResponse:
+        """
+        Streams the outcome of every background poll of a deferred credential as
+        server-sent `refresh` events, each a `RefreshOutcome`, until the session
+        ends.
+        """
+        self.check_token(authorization)
+
+        async def events():
+            with self.refresh_scheduler.subscribe() as outcomes:
+                while True:
+                    outcome = None
+                    with suppress(TimeoutError):
+                        outcome = await asyncio.wait_for(
+                            outcomes.get(), SSE_KEEPALIVE_INTERVAL
+                        )
+                    if outcome is not None:
+                        yield f"event: refresh\ndata: {outcome.model_dump_json()}\n\n"
+                        continue
+                    try:
+                        self.check_token(authorization)
+                    except HTTPException:
+                        return
+                    yield ": keepalive\n\n"
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-store"},
+        )
+
     async def credential_offer(
         self,
         credential_offer_uri: str | None = None,
@@ -347,13 +461,25 @@ class WebHolder(Holder):
         self,
         request_uri,
         authorization: Annotated[str | None, Header()] = None,
-    ) -> vp_auth_request.AuthorizationRequestObject:
-        """Get authorization request from a verifier."""
+    ) -> PresentationSession:
+        """
+        Get authorization request from a verifier.
+
+        The request is kept for `presentation_ttl` seconds under a new
+        `session_id`, which the user's `FieldSelectionObject` refers back to, so
+        that any number of presentations can be in progress at once.
+        """
         self.check_token(authorization)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(request_uri)
-        if response.json() is None:
+        response = await self.http_client.post(request_uri)
+        if response.headers.get("content-type", "").startswith(
+            "application/oauth-authz-req+jwt"
+        ):
+            # Signed request object (JAR); the claims are the request parameters
+            request = await self._verify_request_object(response.text)
+        else:
+            request = response.json()
+        if not isinstance(request, dict):
             raise HTTPException(
                 status_code=400, detail="Could not retrieve any data from request_uri"
             )
@@ -363,26 +489,80 @@ class WebHolder(Holder):
         # although it shouldn't include sensitive info unless the user has
         # opted to share that information
         try:
-            self.current_transaction = vp_auth_request.AuthorizationRequestObject(
-                **response.json()
+            session = PresentationSession.model_validate(
+                {**request, "session_id": token_urlsafe(24)}
             )
         except ValidationError as e:
             raise HTTPException(status_code=400, detail=f"Bad Request: {e}")
 
-        return self.current_transaction
+        if uri := session.presentation_definition_uri:
+            # Passed by reference; likely already cached from an earlier request
+            try:
+                definition = await self.http_cache.get_json(
+                    uri,
+                    self.http_client,
+                    _parse_presentation_definition,
+                )
+            except (httpx.HTTPError, ValidationError) as e:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Could not retrieve presentation definition: {e}",
+                )
+            session = session.model_copy(update={"presentation_definition": definition})
+
+        self.presentations.put(session.session_id, session)
+        self._latest_presentation = session.session_id
+        return session
+
+    async def _verify_request_object(self, request_object: str) -> dict:
+        """
+        Checks a signed request object was signed by the verifier named by its
+        `client_id`.
+
+        ### Returns
+        - `dict`: The request parameters
+
+        ### Raises
+        - `HTTPException`: 400 if the request's signature could not be verified
+        """
+        try:
+            header = get_unverified_header(request_object)
+            client_id = decode(request_object, options={"verify_signature": False})[
+                "client_id"
+            ]
+            # The resolver may block on fetching the verifier's DID document
+            key = await asyncio.to_thread(self.verifier_key_resolver, client_id, header)
+            return decode(
+                request_object,
+                key.export_to_pem(),
+                algorithms=REQUEST_OBJECT_ALGS,
+                options={"verify_aud": False},
+            )
+        except (PyJWTError, IssuerKeyResolutionError, KeyError, ValueError) as e:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid signed request object: {e}"
+            )
 
     async def present_selection(
         self,
         field_selections: FieldSelectionObject,
         authorization: Annotated[str | None, Header()] = None,
     ):
-        """Send verifiable presentation to the verifier."""
+        """
+        Send verifiable presentation to the verifier, answering the request
+        `field_selections.session_id` was given for, or the most recently
+        fetched request if it names no session.
+        """
         # find which attributes in which credentials fit the presentation definition
         # mark which credential and attribute for disclosure
-        if self.current_transaction is None:
+        self.check_token(authorization)
+        session_id = field_selections.session_id or self._latest_presentation
+        session: PresentationSession | None = None
+        if session_id is not None:
+            session = self.presentations.get(session_id)
+        if session is None:
             raise HTTPException(status_code=400, detail="No ongoing presentation found")
 
-        self.check_token(authorization)
         approved_fields = [
             x.field for x in field_selections.field_requests if x.approved
         ]
@@ -390,60 +570,20 @@ class WebHolder(Holder):
             raise HTTPException(
                 status_code=403, detail="Access Denied: credential request rejected"
             )
-        pd = self.current_transaction.presentation_definition
-        ids = pd.input_descriptors
-
-        # list[tuple[input_descriptor_id, vp_token]]
-        id_vp_tokens: list[tuple[str, str]] = []
-
-        for id_object in ids:
-            input_descriptor_id = id_object.id
-            # dict[credential, [list[encoded disclosures]]]
-            valid_credentials = {}
-            ordered_approved_fields = [
-                x for x in id_object.constraints.fields if x in approved_fields
-            ]
-            for field in ordered_approved_fields:
-                paths = field.path
-                filter = field.filter
-                # find all credentials with said field
-                new_valid_creds = self._get_credentials_with_field(paths, filter)
-
-                if valid_credentials == {}:
-                    valid_credentials = new_valid_creds
-                    continue
-                # if we the field is not optional,
-                # we need to get rid of all the old credentials that don't
-                # have the field.
-                if not field.optional:
-                    creds = set(valid_credentials.keys()).intersection(
-                        set(new_valid_creds.keys())
-                    )
-
-                    # Cull keys
-                    valid_credentials = {c: valid_credentials[c] for c in creds}
-                    new_valid_creds = {c: new_valid_creds[c] for c in creds}
-
-                # add the new disclosures to the old disclosures
-                for cred in valid_credentials:
-                    valid_credentials[cred] += new_valid_creds[cred]
-
-            # if no valid credentials found, go next
-            if valid_credentials == {}:
-                continue
-
-            # create the vp_token
-            credential, disclosures = valid_credentials.popitem()
-            vp_token = f"{self._get_credential_payload(credential)}~"
-            for disclosure in disclosures:
-                vp_token += f"{disclosure}~"
-
-            id_vp_tokens.append((input_descriptor_id, vp_token))
+        pd = session.presentation_definition
+        match = self.match_presentation_definition(pd, approved_fields)
+
+        # list[tuple[input_descriptor_id, vp_token]], presenting the best
+        # credential for each descriptor
+        id_vp_tokens: list[tuple[str, str]] = [
+            (descriptor_id, match.descriptors[descriptor_id].best.vp_token())
+            for descriptor_id in match.selected
+        ]
 
         final_vp_token = None
         descriptor_maps = []
-        definition_id = self.current_transaction.presentation_definition.id
-        transaction_id = self.current_transaction.state
+        definition_id = pd.id
+        transaction_id = session.state
 
         if len(id_vp_tokens) == 1:
             input_descriptor_id, vp_token = id_vp_tokens[0]
@@ -490,14 +630,16 @@ class WebHolder(Holder):
             state=transaction_id,
         )
 
-        response_uri = self.current_transaction.response_uri
+        # Each request is only answered once, even if presented twice at once
+        if self.presentations.pop(session.session_id) is None:
+            raise HTTPException(status_code=400, detail="No ongoing presentation found")
+
+        response_uri = session.response_uri
         # make sure response_mode is direct_post
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{response_uri}", data=authorization_response.model_dump_json()
-            )
+        response = await self.http_client.post(
+            f"{response_uri}", content=authorization_response.model_dump_json()
+        )
 
-        self.current_transaction = None
         if response.status_code == 200:
             return "success"
         return response.json()
@@ -0,0 +1,95 @@
+from datetime import UTC, datetime
+
+import pytest
+from jwcrypto.jwk import JWK
+
+from vclib.common import SDJWTVCIssuer
+from vclib.holder import Credential, LocalStorageProvider
+from vclib.holder.src.claim_index import ClaimIndex, _first_claim
+
+ISSUER_KEY = JWK(generate="EC", crv="P-256")
+
+
+def credential(cred_id: str, claims: dict) -> Credential:
+    issuance = SDJWTVCIssuer(
+        claims,
+        {"iss": "https://example.com", "vct": "https://example.com/licence", "iat": 0},
+        ISSUER_KEY,
+        None,
+    ).sd_jwt_issuance
+    return Credential(
+        id=cred_id,
+        issuer_url="https://example.com",
+        credential_configuration_id="Licence",
+        is_deferred=False,
+        c_type="openid_credential",
+        raw_sdjwtvc=issuance,
+        received_at=datetime.now(tz=UTC).isoformat(),
+    )
+
+
+@pytest.fixture
+def store(tmp_path_factory):
+    store = LocalStorageProvider(
+        storage_dir_path=tmp_path_factory.mktemp("test_storage")
+    )
+    store.register("asdf", "1234567890")
+    return store
+
+
+def accept_all(_) -> bool:
+    return True
+
+
+def test_first_claim():
+    assert _first_claim("$.is_over_18") == "is_over_18"
+    assert _first_claim("$.address.country") == "address"
+    assert _first_claim("is_over_18") == "is_over_18"
+    assert _first_claim("$.*") is None
+    assert _first_claim("$..country") is None
+
+
+def test_find(store: LocalStorageProvider):
+    adult = credential("adult", {"is_over_18": True, "given_name": "Jo"})
+    child = credential("child", {"is_over_18": False})
+    store.add_many([adult, child])
+    index = ClaimIndex(store)
+    store.add_listener(index)
+
+    matched = index.find(["$.is_over_18"], lambda value: value is True)
+    assert list(matched) == [adult.raw_sdjwtvc]
+    (disclosure,) = matched[adult.raw_sdjwtvc]
+    assert disclosure in adult.raw_sdjwtvc.split("~")
+
+    assert list(index.find(["$.given_name"], accept_all)) == [adult.raw_sdjwtvc]
+    # claims in the payload need no disclosure
+    assert index.find(["$.vct"], accept_all) == {
+        adult.raw_sdjwtvc: [],
+        child.raw_sdjwtvc: [],
+    }
+    assert index.find(["$.missing"], accept_all) == {}
+
+
+def test_kept_up_to_date(store: LocalStorageProvider):
+    index = ClaimIndex(store)
+    store.add_listener(index)
+    assert index.find(["$.is_over_18"], accept_all) == {}
+
+    adult = credential("adult", {"is_over_18": True})
+    store.add_credential(adult)
+    assert list(index.find(["$.is_over_18"], accept_all)) == [adult.raw_sdjwtvc]
+
+    renewed = credential("adult", {"is_over_21": True})
+    store.update_credential(renewed)
+    assert index.find(["$.is_over_18"], accept_all) == {}
+    assert list(index.find(["$.is_over_21"], accept_all)) == [renewed.raw_sdjwtvc]
+
+    store.delete_credential("adult")
+    assert index.find(["$.is_over_21"], accept_all) == {}
+    assert len(index) == 0
+
+    store.add_credential(adult)
+    store.logout()
+    assert len(index) == 0
+    store.login("asdf", "1234567890")
+    assert list(index.find(["$.is_over_18"], accept_all)) == [adult.raw_sdjwtvc]
@@ -0,0 +1,108 @@
+import asyncio
+
+import httpx
+import pytest
+
+from vclib.holder.src.http_cache import HTTPCache, parse_cache_control
+
+URI = "https://verifier.example.com/presentationdefs/example"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_client(cache_control: str, requests: list[httpx.Request]) -> httpx.AsyncClient:
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        headers = {"ETag": '"v1"', "Cache-Control": cache_control}
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, headers=headers, json={"id": "example"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+
+def test_parse_cache_control():
+    assert parse_cache_control('public, max-age="60", Immutable') == {
+        "public": None,
+        "max-age": "60",
+        "immutable": None,
+    }
+    assert parse_cache_control(None) == {}
+
+
+@pytest.mark.asyncio
+async def test_immutable():
+    requests = []
+    cache = HTTPCache()
+    async with make_client("max-age=0, immutable", requests) as client:
+        for _ in range(3):
+            assert await cache.get_json(URI, client) == {"id": "example"}
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_revalidation():
+    requests = []
+    clock = Clock()
+    cache = HTTPCache(clock=clock)
+    async with make_client("max-age=60", requests) as client:
+        await cache.get_json(URI, client)
+        await cache.get_json(URI, client)
+        assert len(requests) == 1
+
+        clock.now += 61
+        assert await cache.get_json(URI, client) == {"id": "example"}
+        assert len(requests) == 2
+        assert requests[-1].headers["If-None-Match"] == '"v1"'
+
+        # the 304 renews freshness
+        await cache.get_json(URI, client)
+        assert len(requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_no_store_and_eviction():
+    requests = []
+    cache = HTTPCache(max_entries=2)
+    async with make_client("no-store", requests) as client:
+        await cache.get_json(URI, client)
+        assert URI not in cache
+
+    async with make_client("immutable", requests) as client:
+        for i in range(3):
+            await cache.get_json(f"{URI}/{i}", client)
+    assert len(cache) == 2
+    assert f"{URI}/0" not in cache
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_merged():
+    requests = []
+    cache = HTTPCache()
+    async with make_client("max-age=60", requests) as client:
+        results = await asyncio.gather(*(cache.get_json(URI, client) for _ in range(5)))
+        assert results == [{"id": "example"}] * 5
+        assert len(requests) == 1
+
+        # a forced revalidation still goes to the server, conditionally
+        await cache.get_json(URI, client, revalidate=True)
+        assert len(requests) == 2
+        assert requests[-1].headers["If-None-Match"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_default_ttl_per_request():
+    requests = []
+    clock = Clock()
+    cache = HTTPCache(clock=clock)
+    async with make_client("public", requests) as client:
+        await cache.get_json(URI, client, default_ttl=300)
+        clock.now += 299
+        await cache.get_json(URI, client, default_ttl=300)
+        assert len(requests) == 1
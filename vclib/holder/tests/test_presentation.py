@@ -1,9 +1,14 @@
+import json
+
+import jwt
 import pytest
 from fastapi import HTTPException
+from jwcrypto.jwk import JWK
 
 # from fastapi import HTTPException
 from pytest_httpx import HTTPXMock
 
+from vclib.common import IssuerKeyResolver
 from vclib.common.src.data_transfer_objects.vp_auth_request import (
     AuthorizationRequestObject,
 )
@@ -12,8 +17,10 @@ from vclib.holder.src.models.field_selection_object import (
     FieldRequest,
     FieldSelectionObject,
 )
+from vclib.holder.src.models.presentation_session import PresentationSession
 from vclib.holder.src.storage.local_storage_provider import LocalStorageProvider
 from vclib.holder.src.web_holder import WebHolder
+from vclib.verifier import Verifier
 
 # from vclib.holder.src.models.credentials import Credential
 # from vclib.holder.src.models.field_selection_object import FieldSelectionObject
@@ -24,6 +31,11 @@ OWNER_HOST = "https://localhost"
 OWNER_PORT = "8080"
 OWNER_URI = f"{OWNER_HOST}:{OWNER_PORT}"
 
+
+def without_session(session: PresentationSession) -> AuthorizationRequestObject:
+    return AuthorizationRequestObject(**session.model_dump(exclude={"session_id"}))
+
+
 drivers_license_credential = {
     "id": "drivers_license",
     "issuer_url": "https://servicensw.com.au",
@@ -181,7 +193,154 @@ async def test_presentation_initiation(httpx_mock: HTTPXMock, mock_data):
         "https://example.com/request/over_18", auth_header
     )
 
-    assert response == AuthorizationRequestObject(**over_18_auth_req)
+    assert without_session(response) == AuthorizationRequestObject(**over_18_auth_req)
+    assert holder.presentations.get(response.session_id) == response
+
+
+def sign_request(request: dict, key: JWK) -> str:
+    return jwt.encode(
+        request,
+        key.export_to_pem(private_key=True, password=None),
+        algorithm="ES256",
+        headers={"typ": "oauth-authz-req+jwt"},
+    )
+
+
+@pytest.mark.asyncio()
+async def test_signed_request(httpx_mock: HTTPXMock, mock_data):
+    over_18_auth_req, holder, auth_header = mock_data
+    verifier_key = JWK(generate="EC", crv="P-256")
+    holder.verifier_key_resolver = IssuerKeyResolver(
+        pinned_keys={"some did": verifier_key}
+    )
+    signed = sign_request(over_18_auth_req, verifier_key)
+    httpx_mock.add_response(
+        url="https://example.com/request/over_18",
+        content=signed.encode(),
+        headers={"content-type": "application/oauth-authz-req+jwt"},
+    )
+    response = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
+    assert without_session(response) == AuthorizationRequestObject(**over_18_auth_req)
+
+    # a request signed by anyone else is rejected
+    signed = sign_request(over_18_auth_req, JWK(generate="EC", crv="P-256"))
+    httpx_mock.add_response(
+        url="https://example.com/request/over_18",
+        content=signed.encode(),
+        headers={"content-type": "application/oauth-authz-req+jwt"},
+    )
+    with pytest.raises(HTTPException) as e:
+        await holder.get_auth_request(
+            "https://example.com/request/over_18", auth_header
+        )
+    assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio()
+async def test_request_signed_by_verifier(httpx_mock: HTTPXMock, mock_data, tmp_path):
+    over_18_auth_req, holder, auth_header = mock_data
+    did = "did:web:verifier.example.com"
+    signing_key = JWK(generate="EC", crv="P-256")
+    public = {
+        **json.loads(signing_key.export_public()),
+        "kid": "key-1",
+        "alg": "ES256",
+        "use": "sig",
+    }
+    diddoc_path = tmp_path / "did.json"
+    diddoc_path.write_text(
+        json.dumps(
+            {
+                "@context": ["https://www.w3.org/ns/did/v1"],
+                "id": did,
+                "verificationMethod": [
+                    {
+                        "id": f"{did}#key-1",
+                        "type": "JsonWebKey2020",
+                        "controller": did,
+                        "publicKeyJwk": public,
+                    }
+                ],
+                "authentication": [f"{did}#key-1"],
+            }
+        )
+    )
+    definition = AuthorizationRequestObject(**over_18_auth_req).presentation_definition
+    verifier = Verifier(
+        {definition.id: definition},
+        str(diddoc_path),
+        "https://verifier.example.com",
+        issuer_key_resolver=IssuerKeyResolver(),
+        request_signing_key=signing_key,
+    )
+
+    # the holder resolves the verifier's key from the DID document it serves
+    diddoc = await verifier.get_did_json()
+    httpx_mock.add_response(
+        url="https://verifier.example.com/.well-known/did.json",
+        json=diddoc.model_dump(mode="json"),
+    )
+    request = await verifier.serve_authorization_request(definition.id)
+    httpx_mock.add_response(
+        url="https://verifier.example.com/request/over_18",
+        content=request.body,
+        headers={"content-type": request.media_type},
+    )
+    response = await holder.get_auth_request(
+        "https://verifier.example.com/request/over_18", auth_header
+    )
+    assert response.client_id == did
+    assert response.presentation_definition == definition
+
+
+@pytest.mark.asyncio()
+async def test_tampered_signed_request(httpx_mock: HTTPXMock, mock_data):
+    over_18_auth_req, holder, auth_header = mock_data
+    verifier_key = JWK(generate="EC", crv="P-256")
+    holder.verifier_key_resolver = IssuerKeyResolver(
+        pinned_keys={"some did": verifier_key}
+    )
+    header, _, signature = sign_request(over_18_auth_req, verifier_key).split(".")
+    tampered = jwt.encode(
+        {**over_18_auth_req, "response_uri": "https://attacker.example/cb"},
+        "secret",
+    ).split(".")[1]
+    httpx_mock.add_response(
+        url="https://example.com/request/over_18",
+        content=f"{header}.{tampered}.{signature}".encode(),
+        headers={"content-type": "application/oauth-authz-req+jwt"},
+    )
+
+    with pytest.raises(HTTPException) as e:
+        await holder.get_auth_request(
+            "https://example.com/request/over_18", auth_header
+        )
+    assert e.value.status_code == 400
+    assert len(holder.presentations) == 0
+
+
+@pytest.mark.asyncio()
+async def test_request_with_session_id(httpx_mock: HTTPXMock, mock_data):
+    over_18_auth_req, holder, auth_header = mock_data
+    # the verifier can't choose the session a request is kept under
+    over_18_auth_req["session_id"] = "chosen by the verifier"
+    httpx_mock.add_response(
+        url="https://example.com/request/over_18", json=over_18_auth_req
+    )
+    response = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
+    assert response.session_id != "chosen by the verifier"
+    assert holder.presentations.get("chosen by the verifier") is None
+
+    httpx_mock.add_response(url="https://example.com/request/over_18", json=[])
+    with pytest.raises(HTTPException) as e:
+        await holder.get_auth_request(
+            "https://example.com/request/over_18", auth_header
+        )
+    assert e.value.status_code == 400
 
 
 @pytest.mark.asyncio()
@@ -258,11 +417,14 @@ async def test_working_presentation(
 
     httpx_mock.add_response(url="https://example.com/request/over_18", json=auth_req)
 
-    await holder.get_auth_request("https://example.com/request/over_18", auth_header)
+    session = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
 
     httpx_mock.add_response(url="https://example.com/cb", json={"status": "OK"})
 
-    assert holder.current_transaction == AuthorizationRequestObject(**auth_req)
+    assert without_session(session) == AuthorizationRequestObject(**auth_req)
+    over_18_field_selection.session_id = session.session_id
     resp = await holder.present_selection(over_18_field_selection, auth_header)
 
     assert resp == "success"
@@ -279,8 +441,11 @@ async def test_wallet_lacks_credentials(
         url="https://example.com/request/over_18", json=over_18_auth_req
     )
 
-    await holder.get_auth_request("https://example.com/request/over_18", auth_header)
+    session = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
 
+    field_selection.session_id = session.session_id
     with pytest.raises(HTTPException):
         resp = await holder.present_selection(field_selection, auth_header)
         assert resp.status_code == 403
@@ -302,11 +467,14 @@ async def test_multiple_credential_presentation(
 
     httpx_mock.add_response(url="https://example.com/request/over_18", json=auth_req)
 
-    await holder.get_auth_request("https://example.com/request/over_18", auth_header)
+    session = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
 
     httpx_mock.add_response(url="https://example.com/cb", json={"status": "OK"})
 
-    assert holder.current_transaction == AuthorizationRequestObject(**auth_req)
+    assert without_session(session) == AuthorizationRequestObject(**auth_req)
+    selection.session_id = session.session_id
     resp = await holder.present_selection(selection, auth_header)
 
     assert resp == "success"
@@ -320,7 +488,7 @@ async def test_requested_multiple_fields_from_credential(
     input_descriptors = auth_req["presentation_definition"]["input_descriptors"]
     input_descriptors[0]["constraints"]["fields"].append(
         {
-            "path": ["$.is_over_21", "$.credentialSubject.is_over_21"],
+            "path": ["$.is_over_65", "$.credentialSubject.is_over_65"],
             "filter": {"type": "boolean", "const": False},
         }
     )
@@ -335,7 +503,7 @@ async def test_requested_multiple_fields_from_credential(
     over_18_field_selection.field_requests.append(
         FieldRequest(
             field={
-                "path": ["$.is_over_21", "$.credentialSubject.is_over_21"],
+                "path": ["$.is_over_65", "$.credentialSubject.is_over_65"],
                 "filter": {"type": "boolean", "const": False},
             },
             input_descriptor_id="field",
@@ -356,11 +524,14 @@ async def test_requested_multiple_fields_from_credential(
 
     httpx_mock.add_response(url="https://example.com/request/over_18", json=auth_req)
 
-    await holder.get_auth_request("https://example.com/request/over_18", auth_header)
+    session = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
 
     httpx_mock.add_response(url="https://example.com/cb", json={"status": "OK"})
 
-    assert holder.current_transaction == AuthorizationRequestObject(**auth_req)
+    assert without_session(session) == AuthorizationRequestObject(**auth_req)
+    over_18_field_selection.session_id = session.session_id
     resp = await holder.present_selection(over_18_field_selection, auth_header)
 
     assert resp == "success"
@@ -374,13 +545,16 @@ async def test_user_rejected_presentation_request(
 
     httpx_mock.add_response(url="https://example.com/request/over_18", json=auth_req)
 
-    await holder.get_auth_request("https://example.com/request/over_18", auth_header)
+    session = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
 
-    assert holder.current_transaction == AuthorizationRequestObject(**auth_req)
+    assert without_session(session) == AuthorizationRequestObject(**auth_req)
 
     with pytest.raises(HTTPException):
         resp = await holder.present_selection(
-            FieldSelectionObject(field_requests=[]), auth_header
+            FieldSelectionObject(field_requests=[], session_id=session.session_id),
+            auth_header,
         )
         assert "access_denied" in resp.json()["detail"]
 
@@ -438,11 +612,91 @@ async def test_request_property_in_payload(
         url="https://example.com/request/payload_property", json=auth_req
     )
 
-    await holder.get_auth_request(
+    session = await holder.get_auth_request(
         "https://example.com/request/payload_property", auth_header
     )
 
     httpx_mock.add_response(url="https://example.com/cb", json={"status": "OK"})
 
+    selection.session_id = session.session_id
     resp = await holder.present_selection(selection, auth_header)
     assert resp == "success"
+
+
+@pytest.mark.asyncio()
+async def test_concurrent_presentations(
+    httpx_mock: HTTPXMock, mock_data_with_cred, over_18_field_selection
+):
+    auth_req, holder, auth_header = mock_data_with_cred
+    other_req = {**auth_req, "state": "other_state"}
+    httpx_mock.add_response(url="https://example.com/request/over_18", json=auth_req)
+    httpx_mock.add_response(url="https://example.com/request/other", json=other_req)
+
+    first = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
+    second = await holder.get_auth_request(
+        "https://example.com/request/other", auth_header
+    )
+    assert first.session_id != second.session_id
+    assert len(holder.presentations) == 2
+
+    # the second request doesn't replace the first
+    httpx_mock.add_response(url="https://example.com/cb", json={"status": "OK"})
+    over_18_field_selection.session_id = first.session_id
+    resp = await holder.present_selection(over_18_field_selection, auth_header)
+    assert resp == "success"
+    sent = httpx_mock.get_requests(url="https://example.com/cb")[-1]
+    assert b'"state":"d1d9846b-0f0e-4716-8178-88a6e76f1673_1721045932"' in (
+        sent.content
+    )
+
+    # each request is only answered once
+    with pytest.raises(HTTPException):
+        await holder.present_selection(over_18_field_selection, auth_header)
+
+    over_18_field_selection.session_id = second.session_id
+    resp = await holder.present_selection(over_18_field_selection, auth_header)
+    assert resp == "success"
+    sent = httpx_mock.get_requests(url="https://example.com/cb")[-1]
+    assert b'"state":"other_state"' in sent.content
+    assert len(holder.presentations) == 0
+
+
+@pytest.mark.asyncio()
+async def test_presentation_without_session_id(
+    httpx_mock: HTTPXMock, mock_data_with_cred, over_18_field_selection
+):
+    auth_req, holder, auth_header = mock_data_with_cred
+    other_req = {**auth_req, "state": "other_state"}
+    httpx_mock.add_response(url="https://example.com/request/over_18", json=auth_req)
+    httpx_mock.add_response(url="https://example.com/request/other", json=other_req)
+    await holder.get_auth_request("https://example.com/request/over_18", auth_header)
+    await holder.get_auth_request("https://example.com/request/other", auth_header)
+
+    # a client that doesn't know about sessions answers the latest request
+    httpx_mock.add_response(url="https://example.com/cb", json={"status": "OK"})
+    resp = await holder.present_selection(over_18_field_selection, auth_header)
+    assert resp == "success"
+    sent = httpx_mock.get_requests(url="https://example.com/cb")[-1]
+    assert b'"state":"other_state"' in sent.content
+    assert len(holder.presentations) == 1
+
+
+@pytest.mark.asyncio()
+async def test_presentation_expired(
+    httpx_mock: HTTPXMock, mock_data_with_cred, over_18_field_selection
+):
+    auth_req, holder, auth_header = mock_data_with_cred
+    now = [0.0]
+    holder.presentations.clock = lambda: now[0]
+    httpx_mock.add_response(url="https://example.com/request/over_18", json=auth_req)
+
+    session = await holder.get_auth_request(
+        "https://example.com/request/over_18", auth_header
+    )
+    now[0] += holder.presentations.ttl
+
+    over_18_field_selection.session_id = session.session_id
+    with pytest.raises(HTTPException):
+        await holder.present_selection(over_18_field_selection, auth_header)
@@ -0,0 +1,193 @@
+import pytest
+from jwcrypto.jwk import JWK
+
+from vclib.common import SDJWTVCIssuer, vp_auth_request
+from vclib.holder import Credential, LocalStorageProvider
+from vclib.holder.src.claim_index import ClaimIndex
+from vclib.holder.src.presentation_exchange import match_presentation_definition
+
+ISSUER_KEY = JWK(generate="EC", crv="P-256")
+
+
+def credential(cred_id: str, claims: dict, received_at: str) -> Credential:
+    issuance = SDJWTVCIssuer(
+        claims,
+        {"iss": "https://example.com", "vct": "https://example.com/licence", "iat": 0},
+        ISSUER_KEY,
+        None,
+    ).sd_jwt_issuance
+    return Credential(
+        id=cred_id,
+        issuer_url="https://example.com",
+        credential_configuration_id="Licence",
+        is_deferred=False,
+        c_type="openid_credential",
+        raw_sdjwtvc=issuance,
+        received_at=received_at,
+    )
+
+
+def field(name: str, filter: dict | None = None, *, optional: bool = False) -> dict:
+    return {"path": [f"$.{name}"], "filter": filter, "optional": optional}
+
+
+def definition(
+    descriptors: list[dict], **kwargs
+) -> vp_auth_request.PresentationDefinition:
+    return vp_auth_request.PresentationDefinition(
+        id="definition", input_descriptors=descriptors, **kwargs
+    )
+
+
+@pytest.fixture
+def index(tmp_path_factory) -> ClaimIndex:
+    store = LocalStorageProvider(
+        storage_dir_path=tmp_path_factory.mktemp("test_storage")
+    )
+    store.register("asdf", "1234567890")
+    store.add_many(
+        [
+            credential(
+                "old",
+                {"is_over_18": True, "given_name": "Jo"},
+                "2024-01-01T00:00:00+00:00",
+            ),
+            credential("new", {"is_over_18": True}, "2024-06-01T00:00:00+00:00"),
+            credential(
+                "child",
+                {"is_over_18": False, "given_name": "Al"},
+                "2024-07-01T00:00:00+00:00",
+            ),
+            credential("card", {"card_number": 1234}, "2024-02-01T00:00:00+00:00"),
+        ]
+    )
+    index = ClaimIndex(store)
+    store.add_listener(index)
+    return index
+
+
+ADULT = field("is_over_18", {"type": "boolean", "const": True})
+
+
+def test_candidates_ranked(index: ClaimIndex):
+    match = match_presentation_definition(
+        definition([{"id": "adult", "constraints": {"fields": [ADULT]}}]), index
+    )
+    # both disclose one claim, so the most recently received is preferred
+    assert [c.credential_id for c in match.descriptors["adult"].candidates] == [
+        "new",
+        "old",
+    ]
+    assert match.selected == ["adult"]
+    assert match.satisfied
+
+    with_name = definition(
+        [
+            {
+                "id": "adult",
+                "constraints": {"fields": [ADULT, field("given_name", optional=True)]},
+            }
+        ]
+    )
+    best = match_presentation_definition(with_name, index).descriptors["adult"].best
+    # satisfying the optional field ranks first
+    assert best.credential_id == "old"
+    assert best.optional_fields == ("$.given_name",)
+    assert len(best.disclosures) == 2
+    assert best.vp_token().count("~") == 3
+
+
+def test_limit_disclosure(index: ClaimIndex):
+    limited = definition(
+        [
+            {
+                "id": "adult",
+                "constraints": {
+                    "fields": [ADULT, field("given_name", optional=True)],
+                    "limit_disclosure": "required",
+                },
+            }
+        ]
+    )
+    best = match_presentation_definition(limited, index).descriptors["adult"].best
+    assert best.credential_id == "new"
+    assert best.optional_fields == ()
+    assert len(best.disclosures) == 1
+
+
+def test_required_fields(index: ClaimIndex):
+    pd = definition(
+        [
+            {
+                "id": "adult",
+                "constraints": {"fields": [ADULT, field("card_number")]},
+            },
+            {"id": "card", "constraints": {"fields": [field("card_number")]}},
+        ]
+    )
+    match = match_presentation_definition(pd, index)
+    assert match.descriptors["adult"].candidates == []
+    assert match.selected == ["card"]
+    assert not match.satisfied
+
+    # a required field the user declined can't be presented
+    declined = match_presentation_definition(
+        pd, index, lambda f: f.path != ["$.card_number"]
+    )
+    assert declined.selected == []
+
+
+def test_submission_requirements(index: ClaimIndex):
+    descriptors = [
+        {"id": "adult", "group": ["A"], "constraints": {"fields": [ADULT]}},
+        {
+            "id": "card",
+            "group": ["A", "B"],
+            "constraints": {"fields": [field("card_number")]},
+        },
+        {
+            "id": "passport",
+            "group": ["B"],
+            "constraints": {"fields": [field("passport_number")]},
+        },
+    ]
+
+    pick = definition(
+        descriptors, submission_requirements=[{"rule": "pick", "count": 1, "from": "A"}]
+    )
+    match = match_presentation_definition(pick, index)
+    assert match.selected == ["adult"]
+    assert match.satisfied
+
+    nested = definition(
+        descriptors,
+        submission_requirements=[
+            {
+                "rule": "all",
+                "from_nested": [
+                    {"rule": "all", "from": "A"},
+                    {"rule": "pick", "min": 1, "from": "B"},
+                ],
+            }
+        ],
+    )
+    match = match_presentation_definition(nested, index)
+    assert match.selected == ["adult", "card"]
+
+    unmet = definition(
+        descriptors, submission_requirements=[{"rule": "all", "from": "B"}]
+    )
+    match = match_presentation_definition(unmet, index)
+    assert match.selected == []
+    assert not match.satisfied
+
+
+def test_submission_requirement_serialised():
+    requirement = vp_auth_request.SubmissionRequirement(
+        **{"rule": "pick", "count": 1, "from": "A"}
+    )
+    assert requirement.from_ == "A"
+    assert requirement.model_dump()["from"] == "A"
+
+    with pytest.raises(ValueError):
+        vp_auth_request.SubmissionRequirement(rule="all")
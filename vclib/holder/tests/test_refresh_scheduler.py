@@ -0,0 +1,209 @@
+from datetime import UTC, datetime
+
+import pytest
+from pytest_httpx import HTTPXMock
+
+from vclib.holder import AccessToken, DeferredCredential, RefreshScheduler
+from vclib.holder.src.storage.local_storage_provider import LocalStorageProvider
+from vclib.holder.src.web_holder import WebHolder
+
+EXAMPLE_ISSUER = "https://example.com"
+OWNER_URI = "https://localhost:8080"
+
+START = datetime(2024, 7, 15, tzinfo=UTC).timestamp()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def holder(tmp_path_factory):
+    holder = WebHolder(
+        [f"{OWNER_URI}/add"],
+        f"{OWNER_URI}/offer",
+        LocalStorageProvider(storage_dir_path=tmp_path_factory.mktemp("test_storage")),
+    )
+    holder.register("asdf", "1234567890")
+    return holder
+
+
+def deferred(cred_id: str, expires_in: int = 3600) -> DeferredCredential:
+    return DeferredCredential(
+        id=cred_id,
+        issuer_url=EXAMPLE_ISSUER,
+        credential_configuration_id="ExampleCredential",
+        is_deferred=True,
+        c_type="openid_credential",
+        transaction_id=cred_id,
+        deferred_credential_endpoint=f"{EXAMPLE_ISSUER}/deferred",
+        last_request=datetime.fromtimestamp(START, tz=UTC).isoformat(),
+        access_token=AccessToken(
+            access_token="token",
+            token_type="bearer",
+            expires_in=expires_in,
+            expires_at=datetime.fromtimestamp(START + expires_in, tz=UTC).isoformat(),
+        ),
+    )
+
+
+def pending(httpx_mock: HTTPXMock, cred_id: str, headers: dict = {}):
+    httpx_mock.add_response(
+        url=f"{EXAMPLE_ISSUER}/deferred",
+        match_json={"transaction_id": cred_id},
+        status_code=400,
+        headers=headers,
+        json={"error": "issuance_pending"},
+    )
+
+
+@pytest.mark.asyncio()
+async def test_polls_with_backoff_until_issued(
+    httpx_mock: HTTPXMock, holder: WebHolder
+):
+    clock = FakeClock()
+    scheduler = RefreshScheduler(
+        holder, initial_interval=5, max_interval=15, backoff=2, clock=clock
+    )
+    holder.store.add_credential(deferred("cred"))
+    scheduler.load()
+    assert scheduler.next_due() == START + 5
+
+    # nothing is due yet
+    assert await scheduler.run_once() == []
+
+    with scheduler.subscribe() as outcomes:
+        clock.now += 5
+        pending(httpx_mock, "cred", {"Retry-After": "30"})
+        (outcome,) = await scheduler.run_once()
+        assert outcome.status == "pending"
+        # the issuer's wait is honoured over the backoff
+        assert scheduler.next_due() == clock.now + 30
+
+        clock.now += 30
+        pending(httpx_mock, "cred")
+        await scheduler.run_once()
+        assert scheduler.next_due() == clock.now + 15  # 5 * 2 * 2, capped at 15
+
+        clock.now += 15
+        httpx_mock.add_response(
+            url=f"{EXAMPLE_ISSUER}/deferred", json={"credential": "issued~"}
+        )
+        (outcome,) = await scheduler.run_once()
+        assert outcome.status == "issued"
+        assert "cred" not in scheduler
+        assert scheduler.next_due() is None
+
+        assert [outcomes.get_nowait().status for _ in range(3)] == [
+            "pending",
+            "pending",
+            "issued",
+        ]
+    assert holder.store.get_credential("cred").raw_sdjwtvc == "issued~"
+    await holder.aclose()
+
+
+@pytest.mark.asyncio()
+async def test_polls_earliest_due_first(httpx_mock: HTTPXMock, holder: WebHolder):
+    clock = FakeClock()
+    scheduler = RefreshScheduler(holder, initial_interval=5, clock=clock)
+    first, second = deferred("first"), deferred("second")
+    holder.store.add_many([first, second])
+    scheduler.schedule(second, 20)
+    scheduler.schedule(first, 10)
+    # rescheduling replaces the earlier schedule
+    scheduler.schedule(first, 1)
+
+    clock.now += 10
+    pending(httpx_mock, "first", {"Retry-After": "100"})
+    assert [o.credential_id for o in await scheduler.run_once()] == ["first"]
+    assert scheduler.next_due() == START + 20
+
+    # deleted credentials are dropped rather than polled
+    holder.store.delete_credential("second")
+    clock.now += 10
+    assert await scheduler.run_once() == []
+    assert len(scheduler) == 1
+    await holder.aclose()
+
+
+@pytest.mark.asyncio()
+async def test_stops_polling_when_token_expires(
+    httpx_mock: HTTPXMock, holder: WebHolder
+):
+    clock = FakeClock()
+    scheduler = RefreshScheduler(holder, initial_interval=60, clock=clock)
+    cred = deferred("cred", expires_in=30)
+    holder.store.add_credential(cred)
+
+    # the poll is brought forward to just before the token expires
+    scheduler.schedule(cred)
+    assert scheduler.next_due() < START + 30
+
+    clock.now = scheduler.next_due()
+    pending(httpx_mock, "cred")
+    (outcome,) = await scheduler.run_once()
+    assert outcome.status == "pending"
+    assert scheduler.next_due() == START + 30
+
+    clock.now = START + 30
+    (outcome,) = await scheduler.run_once()
+    assert outcome.status == "expired"
+    assert len(scheduler) == 0
+    assert len(httpx_mock.get_requests()) == 1
+    await holder.aclose()
+
+
+@pytest.mark.asyncio()
+async def test_failed_poll_tried_again(httpx_mock: HTTPXMock, holder: WebHolder):
+    clock = FakeClock()
+    scheduler = RefreshScheduler(holder, initial_interval=5, clock=clock)
+    cred = deferred("cred")
+    holder.store.add_credential(cred)
+    scheduler.schedule(cred)
+    clock.now += 5
+
+    async def fail(_):
+        raise RuntimeError("storage unavailable")
+
+    holder._refresh_many = fail
+    with pytest.raises(RuntimeError):
+        await scheduler.run_once()
+    # still due, rather than lost from the queue
+    assert scheduler.next_due() == START + 5
+
+    del holder._refresh_many
+    pending(httpx_mock, "cred")
+    (outcome,) = await scheduler.run_once()
+    assert outcome.status == "pending"
+    assert scheduler.next_due() > clock.now
+    await holder.aclose()
+
+
+@pytest.mark.asyncio()
+async def test_cleared_while_polling(httpx_mock: HTTPXMock, holder: WebHolder):
+    clock = FakeClock()
+    scheduler = RefreshScheduler(holder, initial_interval=5, clock=clock)
+    cred = deferred("cred")
+    holder.store.add_credential(cred)
+    scheduler.schedule(cred)
+    clock.now += 5
+
+    refresh_many = holder._refresh_many
+
+    async def logout_midway(creds):
+        results = await refresh_many(creds)
+        scheduler.clear()
+        return results
+
+    holder._refresh_many = logout_midway
+    pending(httpx_mock, "cred")
+    (outcome,) = await scheduler.run_once()
+    assert outcome.status == "pending"
+    assert len(scheduler) == 0
+    assert scheduler.next_due() is None
+    await holder.aclose()
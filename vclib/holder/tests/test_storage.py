@@ -2,7 +2,7 @@ from datetime import UTC, datetime
 
 import pytest
 
-from vclib.holder import LocalStorageProvider
+from vclib.holder import LocalStorageProvider, RegisteredClientMetadata
 from vclib.holder.src.models.credentials import Credential, DeferredCredential
 
 MOCK_STORE = {
@@ -235,6 +235,29 @@ def test_upsert_credentials(storage_provider, cred_1, cred_2, cred_3):
     assert len(storage_provider.all_credentials()) == 3
 
 
+def test_oauth_clients(storage_provider):
+    storage_provider.register("clients", "clients")
+    assert storage_provider.get_oauth_client("https://example.com") is None
+
+    client = RegisteredClientMetadata(
+        redirect_uris=["https://localhost:8080/add"],
+        credential_offer_endpoint="https://localhost:8080/offer",
+        issuer_uri="https://example.com",
+        client_id="client",
+        client_secret="secret",
+        client_secret_expires_at=0,
+    )
+    storage_provider.put_oauth_client(client)
+    storage_provider.put_oauth_client(client.model_copy(update={"client_id": "new"}))
+
+    storage_provider.logout()
+    storage_provider.login("clients", "clients")
+    assert storage_provider.get_oauth_client("https://example.com").client_id == "new"
+
+    storage_provider.delete_oauth_client("https://example.com")
+    assert storage_provider.get_oauth_client("https://example.com") is None
+
+
 def test_missing_storage_path():
     with pytest.raises(Exception):
         LocalStorageProvider(storage_dir_path="asdfghjkl1234567890")
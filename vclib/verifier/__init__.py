@@ -1,4 +1,35 @@
 """Service Provider (Credential Verifier) module"""
 
 # Add imports from `provider/src` here to expose objects under vclib.provider
+from .src.evaluation_plan import (
+    EvaluationPlan,  # noqa: F401
+    PresentationValidationError,  # noqa: F401
+)
+from .src.nonce_store import (
+    AbstractNonceStore,  # noqa: F401
+    InMemoryNonceStore,  # noqa: F401
+    SQLiteNonceStore,  # noqa: F401
+)
+from .src.qr_codes import (
+    QRCodeProfile,  # noqa: F401
+    QRCodeRenderer,  # noqa: F401
+)
+from .src.registry import (
+    CompiledDefinition,  # noqa: F401
+    DefinitionRegistry,  # noqa: F401
+)
+from .src.replay import (
+    AbstractReplayFilter,  # noqa: F401
+    BloomReplayFilter,  # noqa: F401
+    ReplayCache,  # noqa: F401
+)
+from .src.request_templates import (
+    RequestSigner,  # noqa: F401
+    RequestTemplate,  # noqa: F401
+)
+from .src.sealed_state import StateSealer  # noqa: F401
+from .src.sessions import (
+    SessionStore,  # noqa: F401
+    VerificationSession,  # noqa: F401
+)
 from .src.verifier import Verifier  # noqa: F401
@@ -1,11 +1,16 @@
 import os
-from typing import override
 
 from jwcrypto.jwk import JWK
 
-from vclib.common import vp_auth_request
+from vclib.common import IssuerKeyResolver, vp_auth_request
 from vclib.verifier import Verifier
 
+with open(f"{os.path.dirname(os.path.abspath(__file__))}/example_issuer_jwk.json") as f:
+    EXAMPLE_ISSUER_JWK = JWK.from_json(f.read())  # the only JWK we accept
+
+# Both demo issuers sign with the example key
+EXAMPLE_ISSUERS = ["https://issuer-lib:8082", "https://issuer-lib:8083"]
+
 
 class CarRental(Verifier):
     # this is an example of how a service provider (verifier) might
@@ -88,15 +93,12 @@ class CarRental(Verifier):
             presentation_definitions={"rental_eligibility": rental_car_eligibility},
             base_url=f"https://verifier-lib:{os.getenv('CS3900_CAR_RENTAL_VERIFIER_DEMO_AGENT_PORT')}",
             diddoc_path=f"{os.path.dirname(os.path.abspath(__file__))}/example_diddoc.json",
+            issuer_key_resolver=IssuerKeyResolver(
+                trusted_issuers=EXAMPLE_ISSUERS,
+                pinned_keys=dict.fromkeys(EXAMPLE_ISSUERS, EXAMPLE_ISSUER_JWK),
+            ),
         )
 
-    @override
-    def cb_get_issuer_key(self, iss: str, headers: dict) -> JWK:
-        with open(
-            f"{os.path.dirname(os.path.abspath(__file__))}/example_issuer_jwk.json"
-        ) as f:
-            return JWK.from_json(f.read())  # the only JWK we accept
-
 
 verifier = CarRental()
 
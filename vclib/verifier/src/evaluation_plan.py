@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from typing import Any
+
+from jsonpath_ng import JSONPath
+from jsonschema.protocols import Validator
+
+from vclib.common import compile_jsonpath, compile_schema, vp_auth_request
+
+
+class PresentationValidationError(Exception):
+    """Raised when disclosed fields do not satisfy a presentation definition."""
+
+
+@dataclass(frozen=True)
+class FieldPlan:
+    """A `Field` with its paths parsed and its filter compiled."""
+
+    key: str
+    paths: tuple[JSONPath, ...]
+    validator: Validator | None
+    optional: bool
+
+    @classmethod
+    def compile(cls, field: vp_auth_request.Field) -> "FieldPlan":
+        return cls(
+            key=field.id or field.name or field.path[0],
+            paths=tuple(compile_jsonpath(path) for path in field.path),
+            validator=compile_schema(field.filter) if field.filter else None,
+            optional=bool(field.optional),
+        )
+
+    def match(self, disclosed_fields: dict) -> tuple[bool, Any]:
+        """
+        Finds the first value, at any of the field's paths, that passes its filter.
+
+        ### Returns
+        - `tuple[bool, Any]`: Whether a value was found, and the value
+        """
+        for path in self.paths:
+            for match in path.find(disclosed_fields):
+                if self.validator is None or self.validator.is_valid(match.value):
+                    return True, match.value
+        return False, None
+
+
+@dataclass(frozen=True)
+class DescriptorPlan:
+    id: str
+    fields: tuple[FieldPlan, ...]
+
+    def match(self, credential: dict) -> dict[str, Any] | None:
+        """
+        ### Returns
+        - `dict[str, Any] | None`: The value found for each field, or `None` if
+          a required field is missing or fails its filter
+        """
+        values = {}
+        for field in self.fields:
+            found, value = field.match(credential)
+            if found:
+                values[field.key] = value
+            elif not field.optional:
+                return None
+        return values
+
+
+@dataclass(frozen=True)
+class EvaluationPlan:
+    """
+    A presentation definition compiled for evaluation: JSONPaths parsed and JSON
+    Schema filters compiled once, so that checking a response does no more than
+    walk the disclosed fields.
+    """
+
+    definition: vp_auth_request.PresentationDefinition
+    descriptors: tuple[DescriptorPlan, ...]
+
+    @classmethod
+    def compile(
+        cls, definition: vp_auth_request.PresentationDefinition
+    ) -> "EvaluationPlan":
+        """
+        ### Parameters
+        - definition(`PresentationDefinition`): The definition to compile
+
+        ### Returns
+        - `EvaluationPlan`: The compiled plan
+        """
+        return cls(
+            definition=definition,
+            descriptors=tuple(
+                DescriptorPlan(
+                    id=descriptor.id,
+                    fields=tuple(
+                        FieldPlan.compile(field)
+                        for field in descriptor.constraints.fields or []
+                    ),
+                )
+                for descriptor in definition.input_descriptors
+            ),
+        )
+
+    def evaluate(self, disclosed_fields: dict[str, dict]) -> dict[str, dict[str, Any]]:
+        """
+        Checks that, for every input descriptor, the credential presented under
+        its id discloses each of its required fields and passes their filters.
+
+        ### Parameters
+        - disclosed_fields(`dict[str, dict]`): The fields disclosed by each
+          presented credential, keyed by descriptor id
+
+        ### Returns
+        - `dict[str, dict[str, Any]]`: For each input descriptor, the value found
+          for each of its fields
+
+        ### Raises
+        - `PresentationValidationError`: If a credential was presented for a
+          descriptor not in the definition, or a descriptor's credential is
+          missing or does not satisfy it
+        """
+        unknown = disclosed_fields.keys() - {d.id for d in self.descriptors}
+        if unknown:
+            raise PresentationValidationError(
+                "Credentials presented for unknown input descriptors: "
+                + ", ".join(sorted(unknown))
+            )
+
+        results = {}
+        unsatisfied = []
+        for descriptor in self.descriptors:
+            credential = disclosed_fields.get(descriptor.id)
+            values = None if credential is None else descriptor.match(credential)
+            if values is None:
+                unsatisfied.append(descriptor.id)
+            else:
+                results[descriptor.id] = values
+
+        if unsatisfied:
+            raise PresentationValidationError(
+                "Required fields missing or invalid for input descriptors: "
+                + ", ".join(unsatisfied)
+            )
+        return results
@@ -0,0 +1,203 @@
+import sqlite3
+from abc import ABCMeta, abstractmethod
+from threading import Lock
+from time import time
+
+from vclib.common.src.ttl_store import TTLStore
+
+# How long a wallet has to respond to an authorization request, in seconds
+DEFAULT_NONCE_TTL = 300
+# Outstanding requests kept before the oldest are evicted
+DEFAULT_MAX_NONCES = 100_000
+
+
+class AbstractNonceStore(metaclass=ABCMeta):
+    """
+    Keeps track of outstanding authorization requests.
+
+    Each request is stored under its `state` when it is issued, and consumed
+    exactly once when the matching response arrives. Entries expire after
+    `ttl` seconds, and at most `max_size` are kept at any time.
+    """
+
+    def __init__(
+        self, ttl: float = DEFAULT_NONCE_TTL, max_size: int = DEFAULT_MAX_NONCES
+    ):
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.ttl = ttl
+        self.max_size = max_size
+
+    @abstractmethod
+    def add(self, key: str, value: str):
+        """
+        Stores a new outstanding request.
+
+        ### Parameters
+        - key(`str`): The request's `state`
+        - value(`str`): Whatever needs checking when the response arrives
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def consume(self, key: str) -> str | None:
+        """
+        Removes an outstanding request.
+
+        ### Parameters
+        - key(`str`): The request's `state`
+
+        ### Returns
+        - `str | None`: The value stored with `add`, or `None` if the request is
+          unknown, has expired or was already consumed
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """
+        Removes every expired request.
+
+        ### Returns
+        - `int`: The number of requests removed
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class InMemoryNonceStore(AbstractNonceStore):
+    """
+    Stores outstanding requests in process memory. Suitable when the verifier
+    runs as a single worker.
+    """
+
+    def __init__(
+        self, ttl: float = DEFAULT_NONCE_TTL, max_size: int = DEFAULT_MAX_NONCES
+    ):
+        super().__init__(ttl, max_size)
+        self._store = TTLStore(ttl, max_size)
+
+    def add(self, key: str, value: str):
+        self._store.put(key, value)
+
+    def consume(self, key: str) -> str | None:
+        return self._store.pop(key)
+
+    def purge_expired(self) -> int:
+        return self._store.purge_expired()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+class SQLiteNonceStore(AbstractNonceStore):
+    """
+    Stores outstanding requests in an SQLite database, so that a request issued
+    by one worker can be answered by another. Every worker should be given the
+    same database path.
+
+    The oldest requests are evicted as part of each addition that would exceed
+    `max_size`, so the cap holds across workers. Expired requests are purged
+    every `purge_interval` additions rather than on every write.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS nonces (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS nonces_expires_at ON nonces (expires_at);
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl: float = DEFAULT_NONCE_TTL,
+        max_size: int = DEFAULT_MAX_NONCES,
+        *,
+        purge_interval: int = 1000,
+    ):
+        """
+        ### Parameters
+        - db_path(`str`): Path to the database file, shared between workers
+        - ttl(`float`): Seconds a request remains valid
+        - max_size(`int`): Maximum number of outstanding requests
+        - purge_interval(`int`): Number of additions between purges of expired
+          requests
+        """
+        super().__init__(ttl, max_size)
+        self.purge_interval = max(1, purge_interval)
+        self._adds = 0
+        self._lock = Lock()
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None, timeout=5
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def add(self, key: str, value: str):
+        with self._lock:
+            # One write transaction, so that concurrent workers cannot both
+            # insert past the cap
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO nonces (key, value, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, value, time() + self.ttl),
+                )
+                self._evict_excess()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._adds += 1
+            if self._adds % self.purge_interval == 0:
+                self._purge()
+
+    def consume(self, key: str) -> str | None:
+        # A single DELETE ... RETURNING statement, so that two workers can never
+        # both consume the same request.
+        with self._lock:
+            row = self._conn.execute(
+                "DELETE FROM nonces WHERE key = ? RETURNING value, expires_at", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time():
+            return None
+        return row[0]
+
+    def _evict_excess(self) -> int:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM nonces").fetchone()
+        if count <= self.max_size:
+            return 0
+        return self._conn.execute(
+            """DELETE FROM nonces WHERE key IN (
+                SELECT key FROM nonces ORDER BY expires_at LIMIT ?
+            )""",
+            (count - self.max_size,),
+        ).rowcount
+
+    def _purge(self) -> int:
+        purged = self._conn.execute(
+            "DELETE FROM nonces WHERE expires_at <= ?", (time(),)
+        ).rowcount
+        return purged + self._evict_excess()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM nonces").fetchone()
+        return count
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,146 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from io import BytesIO
+from threading import Lock
+from typing import Literal
+
+import qrcode
+from qrcode.image.pure import PyPNGImage
+from qrcode.image.svg import SvgPathImage
+
+QRCodeFormat = Literal["png", "svg"]
+
+MEDIA_TYPES: dict[str, str] = {"png": "image/png", "svg": "image/svg+xml"}
+
+_IMAGE_FACTORIES = {"png": PyPNGImage, "svg": SvgPathImage}
+_ERROR_CORRECTION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+@dataclass(frozen=True)
+class QRCodeProfile:
+    """
+    How a QR code is drawn.
+
+    - box_size(`int`): Size of each module, in pixels (PNG) or tenths of a
+      millimetre (SVG)
+    - border(`int`): Width of the quiet zone, in modules. The spec minimum is 4.
+    - error_correction(`str`): One of `L`, `M`, `Q` or `H`, recovering roughly
+      7, 15, 25 or 30% of the code respectively. Higher levels survive worn or
+      partially covered prints, at the cost of a denser code.
+    """
+
+    box_size: int = 10
+    border: int = 4
+    error_correction: Literal["L", "M", "Q", "H"] = "M"
+
+    def __post_init__(self):
+        if self.error_correction not in _ERROR_CORRECTION:
+            raise ValueError(f"Unknown error correction level {self.error_correction}")
+        if not 1 <= self.box_size <= 100 or not 0 <= self.border <= 20:
+            raise ValueError("QR code box size or border out of range")
+
+
+class QRCodeRenderer:
+    """
+    Renders QR codes as PNG or SVG, keeping the most recently used images.
+
+    Images are keyed by their content, format and profile, so a code is only
+    drawn once however many times it is requested. Drawing is CPU bound, so
+    `render_async` does it in a worker thread rather than on the event loop.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        ### Parameters
+        - max_entries(`int`): Maximum number of images kept
+        """
+        self.max_entries = max_entries
+        self._images: OrderedDict[tuple, bytes] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def render(
+        self,
+        content: str,
+        fmt: QRCodeFormat = "png",
+        profile: QRCodeProfile = QRCodeProfile(),
+    ) -> bytes:
+        """
+        ### Parameters
+        - content(`str`): The data to encode
+        - fmt(`str`): `png` or `svg`
+        - profile(`QRCodeProfile`): Size and error correction of the code
+
+        ### Returns
+        - `bytes`: The encoded image
+        """
+        key = (content, fmt, profile)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+
+        image = self._draw(content, fmt, profile)
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    async def render_async(
+        self,
+        content: str,
+        fmt: QRCodeFormat = "png",
+        profile: QRCodeProfile = QRCodeProfile(),
+    ) -> bytes:
+        """As `render`, but draws uncached codes in a worker thread."""
+        with self._lock:
+            image = self._images.get((content, fmt, profile))
+        if image is not None:
+            return image
+        return await asyncio.to_thread(self.render, content, fmt, profile)
+
+    def prerender(
+        self,
+        contents: Iterable[str],
+        formats: Iterable[QRCodeFormat] = ("png", "svg"),
+        profile: QRCodeProfile = QRCodeProfile(),
+    ) -> dict[tuple[str, str], bytes]:
+        """
+        Renders a batch of codes, e.g. for printing signage.
+
+        ### Returns
+        - `dict[tuple[str, str], bytes]`: Each image, keyed by content and format
+        """
+        formats = tuple(formats)
+        return {
+            (content, fmt): self.render(content, fmt, profile)
+            for content in contents
+            for fmt in formats
+        }
+
+    @staticmethod
+    def _draw(content: str, fmt: QRCodeFormat, profile: QRCodeProfile) -> bytes:
+        if fmt not in _IMAGE_FACTORIES:
+            raise ValueError(f"Unsupported QR code format {fmt}")
+        qr = qrcode.QRCode(
+            error_correction=_ERROR_CORRECTION[profile.error_correction],
+            box_size=profile.box_size,
+            border=profile.border,
+            image_factory=_IMAGE_FACTORIES[fmt],
+        )
+        qr.add_data(content)
+        qr.make(fit=True)
+        buffer = BytesIO()
+        qr.make_image().save(buffer)
+        return buffer.getvalue()
@@ -0,0 +1,282 @@
+import json
+import os
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+from types import MappingProxyType
+
+import yaml
+
+from vclib.common import vp_auth_request
+
+from .evaluation_plan import EvaluationPlan
+from .request_templates import DefinitionDocument, RequestTemplate
+
+DEFINITION_FILE_EXTENSIONS = (".json", ".yaml", ".yml")
+
+TemplateBuilder = Callable[
+    [str, vp_auth_request.PresentationDefinition, DefinitionDocument],
+    RequestTemplate,
+]
+
+
+@dataclass(frozen=True)
+class CompiledDefinition:
+    """Everything prepared ahead of time for one version of a definition."""
+
+    ref: str
+    definition: vp_auth_request.PresentationDefinition
+    document: DefinitionDocument
+    plan: EvaluationPlan
+    template: RequestTemplate
+
+    @property
+    def digest(self) -> str:
+        return self.document.digest
+
+
+class DefinitionRegistry:
+    """
+    The presentation definitions a verifier accepts, compiled ahead of time.
+
+    Definitions are compiled (validated, JSONPaths parsed, filter schemas
+    checked and compiled, request templates serialised) before they are swapped
+    in, all at once, so a request never sees a half-loaded set. Definitions that
+    have not changed are not recompiled.
+
+    The last `history_size` versions of each definition are kept, so a response
+    to a request issued before a reload is checked against the version it was
+    requested with.
+
+    Definitions can also be loaded from a directory of JSON or YAML files, each
+    containing one definition or a list of them, keyed by their `id`. With
+    `watch`, the directory is checked for changes every `poll_interval` seconds
+    and reloaded in the background.
+    """
+
+    def __init__(
+        self,
+        build_template: TemplateBuilder,
+        definitions: dict[str, vp_auth_request.PresentationDefinition] = {},
+        *,
+        directory: str | None = None,
+        history_size: int = 4,
+    ):
+        """
+        ### Parameters
+        - build_template(`(ref, definition, document) -> RequestTemplate`):
+          Builds the authorization request template for a definition
+        - definitions(`dict[str, PresentationDefinition]`): Definitions defined
+          in code, by reference. Definitions loaded from `directory` with the
+          same reference take precedence.
+        - directory(`str | None`): Directory to load more definitions from
+        - history_size(`int`): Versions of each definition kept for
+          responses to earlier requests
+        """
+        if history_size < 1:
+            raise ValueError("history_size must be at least 1")
+        self.build_template = build_template
+        self.static_definitions = dict(definitions)
+        self.directory = directory
+        self.history_size = history_size
+        self.last_error: str | None = None
+
+        self.current: Mapping[str, CompiledDefinition] = MappingProxyType({})
+        self._versions: dict[str, dict[str, CompiledDefinition]] = {}
+        self._fingerprint = None
+        self._lock = Lock()
+        self._stop = Event()
+        self._watcher: Thread | None = None
+
+        if directory is None:
+            self.load(self.static_definitions)
+        else:
+            self.reload()
+
+    def __contains__(self, ref: str) -> bool:
+        return ref in self.current
+
+    def __len__(self) -> int:
+        return len(self.current)
+
+    def get(self, ref: str, digest: str | None = None) -> CompiledDefinition | None:
+        """
+        ### Parameters
+        - ref(`str`): The definition's reference
+        - digest(`str | None`): The version wanted. Defaults to the current one.
+
+        ### Returns
+        - `CompiledDefinition | None`: The definition, or `None` if there is no
+          such definition or the version is no longer kept
+        """
+        if digest is None:
+            return self.current.get(ref)
+        return self._versions.get(ref, {}).get(digest)
+
+    def versions(self, ref: str) -> list[str]:
+        """The digests of the kept versions of `ref`, oldest first."""
+        return list(self._versions.get(ref, {}))
+
+    def plan_for(
+        self,
+        definition: vp_auth_request.PresentationDefinition,
+        ref: str | None = None,
+    ) -> EvaluationPlan:
+        """
+        ### Parameters
+        - definition(`PresentationDefinition`): The definition
+        - ref(`str | None`): The reference `definition` was registered under.
+          Defaults to its `id`.
+
+        ### Returns
+        - `EvaluationPlan`: The compiled plan for `definition`, compiling it now
+          if it is not one of the registry's definitions
+        """
+        ref = definition.id if ref is None else ref
+        for compiled in reversed(self._versions.get(ref, {}).values()):
+            if compiled.definition is definition:
+                return compiled.plan
+        return EvaluationPlan.compile(definition)
+
+    def compile(
+        self, ref: str, definition: vp_auth_request.PresentationDefinition
+    ) -> CompiledDefinition:
+        """
+        ### Raises
+        - `Exception`: If the definition's paths or filters are invalid
+        """
+        document = DefinitionDocument.from_definition(definition)
+        return CompiledDefinition(
+            ref=ref,
+            definition=definition,
+            document=document,
+            plan=EvaluationPlan.compile(definition),
+            template=self.build_template(ref, definition, document),
+        )
+
+    def load(
+        self,
+        definitions: dict[str, vp_auth_request.PresentationDefinition],
+        *,
+        recompile: bool = False,
+    ):
+        """
+        Compiles `definitions` and swaps them in, replacing the current set. If
+        any definition fails to compile, nothing is swapped in.
+
+        ### Parameters
+        - definitions(`dict[str, PresentationDefinition]`): The definitions to
+          accept, by reference
+        - recompile(`bool`): Whether to recompile definitions that have not
+          changed, e.g. after changing how request templates are built
+
+        ### Raises
+        - `Exception`: If a definition is invalid
+        """
+        with self._lock:
+            compiled = {}
+            for ref, definition in definitions.items():
+                digest = DefinitionDocument.from_definition(definition).digest
+                previous = self._versions.get(ref, {}).get(digest)
+                if previous is not None and not recompile:
+                    compiled[ref] = previous
+                else:
+                    compiled[ref] = self.compile(ref, definition)
+
+            # Copied rather than updated in place, so readers need no lock
+            all_versions = dict(self._versions)
+            for ref, definition in compiled.items():
+                versions = dict(all_versions.get(ref, {}))
+                versions.pop(definition.digest, None)
+                versions[definition.digest] = definition
+                while len(versions) > self.history_size:
+                    del versions[next(iter(versions))]
+                all_versions[ref] = versions
+            self._versions = all_versions
+            self.current = MappingProxyType(compiled)
+
+    def _scan(self) -> tuple:
+        return tuple(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in sorted(os.scandir(self.directory), key=lambda e: e.name)
+            if entry.is_file() and entry.name.endswith(DEFINITION_FILE_EXTENSIONS)
+        )
+
+    def read_directory(self) -> dict[str, vp_auth_request.PresentationDefinition]:
+        """
+        ### Returns
+        - `dict[str, PresentationDefinition]`: The definitions in `directory`,
+          keyed by their `id`
+
+        ### Raises
+        - `ValueError`: If a file is not a valid definition, or two definitions
+          share an `id`
+        """
+        definitions = {}
+        for name, _, _ in self._scan():
+            with open(os.path.join(self.directory, name), "rb") as f:
+                content = json.load(f) if name.endswith(".json") else yaml.safe_load(f)
+            for item in content if isinstance(content, list) else [content]:
+                try:
+                    definition = vp_auth_request.PresentationDefinition.model_validate(
+                        item
+                    )
+                except ValueError as e:
+                    raise ValueError(f"Invalid presentation definition in {name}: {e}")
+                if definition.id in definitions:
+                    raise ValueError(
+                        f"Presentation definition {definition.id} defined twice"
+                    )
+                definitions[definition.id] = definition
+        return definitions
+
+    def reload(self, *, force: bool = False) -> bool:
+        """
+        Reloads definitions from `directory`, if any of its files changed.
+
+        ### Returns
+        - `bool`: Whether the definitions were reloaded
+
+        ### Raises
+        - `Exception`: If a definition is invalid. The current definitions are
+          kept, and the directory is not reloaded again until it changes.
+        """
+        if self.directory is None:
+            return False
+        fingerprint = self._scan()
+        if fingerprint == self._fingerprint and not force:
+            return False
+        self._fingerprint = fingerprint
+        try:
+            self.load(self.static_definitions | self.read_directory())
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        self.last_error = None
+        return True
+
+    def watch(self, poll_interval: float = 5):
+        """
+        Checks `directory` for changes every `poll_interval` seconds, in a
+        background thread, and reloads it when it changes. Errors are recorded
+        in `last_error`, and the previous definitions kept.
+        """
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(poll_interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    self.last_error = str(e)
+
+        self._watcher = Thread(target=run, daemon=True, name="definition-watcher")
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
@@ -0,0 +1,175 @@
+import hashlib
+import math
+from abc import ABCMeta, abstractmethod
+from collections.abc import Callable, Hashable
+from threading import Lock
+from time import time
+
+# How long presented credentials are remembered for, in seconds
+DEFAULT_REPLAY_WINDOW = 600
+
+
+class AbstractReplayFilter(metaclass=ABCMeta):
+    """Remembers values seen until they expire, to reject replays."""
+
+    @abstractmethod
+    def check_and_add(self, value: str, expires_at: float) -> bool:
+        """
+        Records `value` as seen until `expires_at`.
+
+        ### Parameters
+        - value(`str`): The value to check, e.g. a request nonce
+        - expires_at(`float`): UNIX time after which `value` is no longer
+          accepted anyway, and need not be remembered
+
+        ### Returns
+        - `bool`: `True` if `value` had not been seen before, `False` if it is a
+          replay
+        """
+
+
+class ReplayCache(AbstractReplayFilter):
+    """
+    Remembers values seen until they expire, to reject replays.
+
+    Values are grouped into buckets by expiry time, `bucket_seconds` wide, and a
+    bucket is dropped as a whole once everything in it has expired. Memory is
+    therefore bounded by the number of values seen within one validity window,
+    and no per-value bookkeeping is needed to forget them.
+    """
+
+    def __init__(
+        self, bucket_seconds: float = 30, *, clock: Callable[[], float] = time
+    ):
+        """
+        ### Parameters
+        - bucket_seconds(`float`): Width of each bucket. Smaller buckets free
+          memory sooner, at the cost of checking more of them.
+        - clock(`() -> float`): Source of the current UNIX time
+        """
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive")
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self._buckets: dict[int, set[Hashable]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def _purge(self, now: float):
+        current = int(now // self.bucket_seconds)
+        for bucket in [b for b in self._buckets if b < current]:
+            del self._buckets[bucket]
+
+    def check_and_add(self, value: Hashable, expires_at: float) -> bool:
+        with self._lock:
+            self._purge(self.clock())
+            if any(value in bucket for bucket in self._buckets.values()):
+                return False
+            bucket = int(expires_at // self.bucket_seconds)
+            self._buckets.setdefault(bucket, set()).add(value)
+            return True
+
+
+class _BloomFilter:
+    def __init__(self, size: int, hashes: int):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray((size + 7) // 8)
+
+    def _indices(self, digest: bytes) -> list[int]:
+        # double hashing: k indices from two 64 bit halves of one digest
+        h1 = int.from_bytes(digest[:8])
+        h2 = int.from_bytes(digest[8:16]) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[i >> 3] & (1 << (i & 7)) for i in self._indices(digest))
+
+    def add(self, digest: bytes):
+        for i in self._indices(digest):
+            self.bits[i >> 3] |= 1 << (i & 7)
+
+
+class BloomReplayFilter(AbstractReplayFilter):
+    """
+    A fixed-size, probabilistic `ReplayCache`.
+
+    As in `ReplayCache`, values are grouped into buckets by expiry time and
+    whole buckets are dropped once expired, but each bucket is a Bloom filter
+    sized up front. Memory therefore stays the same however many values are
+    seen, and nothing is kept per value. The price is a small chance
+    (`error_rate`) of a value never seen before being taken for a replay, once
+    `capacity` values have been seen within a window. Values never expire
+    later than `window` seconds after they are added.
+
+    Each bucket is sized to hold `capacity` values by itself, so that bursts
+    do not raise the error rate. Fewer, wider buckets therefore use less memory,
+    but keep values for up to `bucket_seconds` longer than needed.
+    """
+
+    def __init__(
+        self,
+        window: float = DEFAULT_REPLAY_WINDOW,
+        capacity: int = 100_000,
+        error_rate: float = 1e-6,
+        *,
+        bucket_seconds: float | None = None,
+        clock: Callable[[], float] = time,
+    ):
+        """
+        ### Parameters
+        - window(`float`): The longest time a value is remembered for
+        - capacity(`int`): Values expected within any `window` seconds
+        - error_rate(`float`): Chance of a new value being rejected, at capacity
+        - bucket_seconds(`float | None`): Width of each bucket. Defaults to a
+          quarter of `window`.
+        - clock(`() -> float`): Source of the current UNIX time
+        """
+        bucket_seconds = bucket_seconds or window / 4
+        if window <= 0 or bucket_seconds <= 0:
+            raise ValueError("window and bucket_seconds must be positive")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+
+        # A lookup checks every live bucket, so each gets a share of the error
+        buckets = math.ceil(window / bucket_seconds) + 1
+        bits = math.ceil(-capacity * math.log(error_rate / buckets) / math.log(2) ** 2)
+        self._bucket_bits = bits
+        self._bucket_hashes = max(1, round(bits / capacity * math.log(2)))
+        self._buckets: dict[int, _BloomFilter] = {}
+        self._lock = Lock()
+
+    @property
+    def memory_bytes(self) -> int:
+        """Memory used by the filters, when every bucket is live."""
+        buckets = math.ceil(self.window / self.bucket_seconds) + 1
+        return buckets * ((self._bucket_bits + 7) // 8)
+
+    def _purge(self, now: float):
+        current = int(now // self.bucket_seconds)
+        for bucket in [b for b in self._buckets if b < current]:
+            del self._buckets[bucket]
+
+    def check_and_add(self, value: str | bytes, expires_at: float) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+        digest = hashlib.sha256(value).digest()
+        with self._lock:
+            now = self.clock()
+            self._purge(now)
+            if any(digest in bucket for bucket in self._buckets.values()):
+                return False
+            bucket = int(min(expires_at, now + self.window) // self.bucket_seconds)
+            if bucket not in self._buckets:
+                self._buckets[bucket] = _BloomFilter(
+                    self._bucket_bits, self._bucket_hashes
+                )
+            self._buckets[bucket].add(digest)
+            return True
@@ -0,0 +1,152 @@
+import hashlib
+import json
+from base64 import urlsafe_b64encode
+from dataclasses import dataclass
+
+from jwcrypto.jwk import JWK
+from jwt.algorithms import get_default_algorithms
+
+from vclib.common import vp_auth_request
+
+# Fields that differ between requests, spliced into the template
+_PER_REQUEST_FIELDS = {"nonce", "state", "wallet_nonce"}
+
+JAR_MEDIA_TYPE = "application/oauth-authz-req+jwt"
+SIOP_AUDIENCE = "https://self-issued.me/v2"
+
+
+def _b64encode(data: bytes) -> bytes:
+    return urlsafe_b64encode(data).rstrip(b"=")
+
+
+@dataclass(frozen=True)
+class DefinitionDocument:
+    """A presentation definition serialised once, with a content-derived ETag."""
+
+    body: bytes
+    digest: str
+
+    @classmethod
+    def from_definition(
+        cls, definition: vp_auth_request.PresentationDefinition
+    ) -> "DefinitionDocument":
+        body = definition.model_dump_json().encode()
+        return cls(body, hashlib.sha256(body).hexdigest()[:32])
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+    def matches(self, if_none_match: str | None) -> bool:
+        """Whether an `If-None-Match` header matches this document's ETag."""
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+
+class RequestSigner:
+    """
+    Signs request objects (JAR, RFC 9101) with a key prepared once, rather than
+    on every signature. The encoded JOSE header is also computed up front.
+    """
+
+    def __init__(self, key: JWK, kid: str | None = None, alg: str | None = None):
+        """
+        ### Parameters
+        - key(`JWK`): The verifier's private signing key
+        - kid(`str | None`): Key ID to put in the JOSE header, e.g. the
+          verification method in the verifier's DIDDoc
+        - alg(`str | None`): Signing algorithm. Defaults to the key's `alg`, or
+          `ES256`.
+        """
+        self.alg = alg or key.get("alg") or "ES256"
+        self._algorithm = get_default_algorithms()[self.alg]
+        self._key = self._algorithm.prepare_key(
+            key.export_to_pem(private_key=True, password=None)
+        )
+        header = {"alg": self.alg, "typ": "oauth-authz-req+jwt"}
+        if kid:
+            header["kid"] = kid
+        self.encoded_header = _b64encode(json.dumps(header).encode())
+
+    def sign(self, encoded_payload: bytes) -> bytes:
+        """
+        ### Parameters
+        - encoded_payload(`bytes`): The base64url encoded payload
+
+        ### Returns
+        - `bytes`: A compact serialised JWS
+        """
+        signing_input = self.encoded_header + b"." + encoded_payload
+        signature = self._algorithm.sign(signing_input, self._key)
+        return signing_input + b"." + _b64encode(signature)
+
+
+class RequestTemplate:
+    """
+    An authorization request for one presentation definition, serialised once.
+
+    Only the nonce, state and wallet nonce change between requests, so they are
+    spliced onto the end of the pre-serialised JSON instead of the request being
+    rebuilt, revalidated and reserialised each time.
+
+    When signing, the static part of the payload is padded with whitespace to a
+    multiple of 3 bytes, so that its base64url encoding can also be computed once
+    and the per-request fields encoded and appended on their own.
+    """
+
+    def __init__(
+        self,
+        request: vp_auth_request.AuthorizationRequestObject,
+        signer: RequestSigner | None = None,
+    ):
+        """
+        ### Parameters
+        - request(`AuthorizationRequestObject`): The request to serialise. Its
+          per-request fields are ignored.
+        - signer(`RequestSigner | None`): If given, requests are rendered as
+          signed request objects
+        """
+        self.request = request
+        self.signer = signer
+
+        static = request.model_dump(mode="json", exclude=_PER_REQUEST_FIELDS)
+        if signer:
+            static |= {"iss": request.client_id, "aud": SIOP_AUDIENCE}
+        prefix = json.dumps(static, separators=(",", ":")).encode()[:-1]
+        if signer:
+            prefix += b" " * (-len(prefix) % 3)
+            self._encoded_prefix = _b64encode(prefix)
+        self._prefix = prefix
+
+    @property
+    def media_type(self) -> str:
+        return JAR_MEDIA_TYPE if self.signer else "application/json"
+
+    def build(
+        self, nonce: str, state: str, wallet_nonce: str | None = None
+    ) -> vp_auth_request.AuthorizationRequestObject:
+        """Returns the request as a model, without revalidating it."""
+        return self.request.model_copy(
+            update={"nonce": nonce, "state": state, "wallet_nonce": wallet_nonce}
+        )
+
+    def render(self, nonce: str, state: str, wallet_nonce: str | None = None) -> bytes:
+        """
+        ### Returns
+        - `bytes`: The serialised request, as JSON or a compact JWS (see
+          `media_type`)
+        """
+        suffix = (
+            b',"nonce":'
+            + json.dumps(nonce).encode()
+            + b',"state":'
+            + json.dumps(state).encode()
+            + b',"wallet_nonce":'
+            + json.dumps(wallet_nonce).encode()
+            + b"}"
+        )
+        if self.signer is None:
+            return self._prefix + suffix
+        return self.signer.sign(self._encoded_prefix + _b64encode(suffix))
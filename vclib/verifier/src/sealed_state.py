@@ -0,0 +1,97 @@
+import hashlib
+import hmac
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Callable
+from time import time
+
+from .nonce_store import DEFAULT_NONCE_TTL
+
+
+def _b64encode(data: bytes) -> str:
+    return urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class StateSealer:
+    """
+    Seals everything needed to check an authorization response into the request's
+    `state`, so that no server-side record of the request has to be kept.
+
+    A sealed state is `<payload>.<tag>`, where `payload` is the base64url encoded
+    JSON `{"nonce", "definition_id", "digest", "exp"}` (`digest` only if given)
+    and `tag` its HMAC-SHA256. Any worker configured with the same secret can
+    open it.
+    """
+
+    def __init__(
+        self,
+        secret: bytes | str,
+        ttl: float = DEFAULT_NONCE_TTL,
+        *,
+        previous_secrets: list[bytes | str] = [],
+        clock: Callable[[], float] = time,
+    ):
+        """
+        ### Parameters
+        - secret(`bytes | str`): Key used to seal new states. Should be at least
+          32 random bytes, and shared by every verifier worker.
+        - ttl(`float`): Seconds a sealed state remains valid
+        - previous_secrets(`list[bytes | str]`): Retired keys still accepted
+          when opening states, to allow the secret to be rotated
+        - clock(`() -> float`): Source of the current UNIX time
+        """
+        if not secret:
+            raise ValueError("A secret is required to seal state")
+        self.ttl = ttl
+        self.clock = clock
+        self._keys = [
+            s.encode() if isinstance(s, str) else s for s in [secret, *previous_secrets]
+        ]
+
+    @staticmethod
+    def _tag(key: bytes, payload: str) -> str:
+        return _b64encode(hmac.new(key, payload.encode(), hashlib.sha256).digest())
+
+    def seal(self, nonce: str, definition_id: str, digest: str | None = None) -> str:
+        """
+        ### Parameters
+        - nonce(`str`): The nonce sent in the authorization request
+        - definition_id(`str`): The requested presentation definition
+        - digest(`str | None`): The version of the definition requested
+
+        ### Returns
+        - `str`: A sealed state to send in the authorization request
+        """
+        transaction = {"nonce": nonce, "definition_id": definition_id}
+        if digest:
+            transaction["digest"] = digest
+        transaction["exp"] = int(self.clock() + self.ttl)
+        payload = _b64encode(json.dumps(transaction, separators=(",", ":")).encode())
+        return f"{payload}.{self._tag(self._keys[0], payload)}"
+
+    def unseal(self, state: str) -> dict | None:
+        """
+        ### Parameters
+        - state(`str`): A state returned by `seal`
+
+        ### Returns
+        - `dict | None`: The sealed `nonce`, `definition_id`, `exp` and `digest`
+          (if sealed), or `None` if the state was not sealed by a known key, is
+          malformed or has expired
+        """
+        payload, _, tag = state.partition(".")
+        if not tag or not any(
+            hmac.compare_digest(tag, self._tag(key, payload)) for key in self._keys
+        ):
+            return None
+        try:
+            transaction = json.loads(_b64decode(payload))
+            if transaction["exp"] <= self.clock():
+                return None
+        except (ValueError, KeyError, TypeError):
+            return None
+        return transaction
@@ -0,0 +1,143 @@
+import asyncio
+from collections.abc import Callable
+from contextlib import suppress
+from dataclasses import dataclass, field
+from secrets import token_urlsafe
+from time import monotonic
+from typing import Literal
+
+from vclib.common import TTLStore
+
+DEFAULT_SESSION_TTL = 600
+DEFAULT_MAX_SESSIONS = 10_000
+
+SessionStatus = Literal["pending", "verified", "rejected"]
+
+
+@dataclass
+class VerificationSession:
+    """
+    A presentation started by a relying party's frontend, and its outcome once
+    the wallet has responded.
+
+    The session has two handles. `id` is an unguessable token only the relying
+    party is given, needed to read the outcome. `state` is the state of the
+    session's authorization request, which the wallet is shown (and anyone who
+    sees the QR code can read), so it only ever addresses the request.
+    """
+
+    id: str
+    state: str
+    definition_id: str
+    nonce: str
+    digest: str | None = None  # the version of the definition requested
+    status: SessionStatus = "pending"
+    claims: dict[str, dict] | None = None  # disclosed fields, by descriptor id
+    error: str | None = None
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status != "pending"
+
+    def complete(self, claims: dict[str, dict]):
+        """Records a successful presentation, waking anyone waiting on it."""
+        self.status, self.claims = "verified", claims
+        self._done.set()
+
+    def reject(self, error: str):
+        """Records a failed presentation, waking anyone waiting on it."""
+        self.status, self.error = "rejected", error
+        self._done.set()
+
+    async def wait(self, seconds: float) -> bool:
+        """
+        Waits up to `seconds` for the wallet's response to be checked.
+
+        ### Returns
+        - `bool`: Whether the session is done
+        """
+        with suppress(TimeoutError):
+            await asyncio.wait_for(self._done.wait(), seconds)
+        return self.done
+
+    def result(self) -> dict:
+        """The session as reported to the frontend."""
+        return {
+            "session_id": self.id,
+            "definition_id": self.definition_id,
+            "status": self.status,
+            "claims": self.claims,
+            "error": self.error,
+        }
+
+
+class SessionStore:
+    """
+    Verification sessions, kept for `ttl` seconds after they are started.
+
+    Sessions live in the memory of the worker that created them, so a frontend
+    must wait on the same worker the wallet's response reaches.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_SESSION_TTL,
+        max_size: int | None = DEFAULT_MAX_SESSIONS,
+        *,
+        clock: Callable[[], float] = monotonic,
+    ):
+        """
+        ### Parameters
+        - ttl(`float`): Seconds a session is kept for, finished or not
+        - max_size(`int | None`): Maximum number of sessions kept. The oldest
+          are dropped first.
+        - clock(`() -> float`): Source of the current time, in seconds
+        """
+        self._sessions = TTLStore(ttl, max_size, clock=clock)
+        self._by_state = TTLStore(ttl, max_size, clock=clock)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(
+        self,
+        state: str,
+        definition_id: str,
+        nonce: str,
+        digest: str | None = None,
+    ) -> VerificationSession:
+        """
+        Starts a session for the authorization request with the given `state`,
+        with a new secret `id`.
+        """
+        session = VerificationSession(
+            token_urlsafe(32), state, definition_id, nonce, digest
+        )
+        self._sessions.put(session.id, session)
+        self._by_state.put(state, session)
+        return session
+
+    def get(self, session_id: str | None) -> VerificationSession | None:
+        """
+        ### Returns
+        - `VerificationSession | None`: The session with the secret `session_id`,
+          or `None` if it is unknown or has expired
+        """
+        if not session_id:
+            return None
+        return self._sessions.get(session_id)
+
+    def for_state(self, state: str | None) -> VerificationSession | None:
+        """
+        ### Returns
+        - `VerificationSession | None`: The session whose authorization request
+          has the given `state`, or `None` if it is unknown or has expired
+        """
+        if not state:
+            return None
+        return self._by_state.get(state)
+
+    def purge_expired(self) -> int:
+        self._by_state.purge_expired()
+        return self._sessions.purge_expired()
@@ -1,17 +1,47 @@
-from urllib.parse import quote_plus
+import asyncio
+import hashlib
+import json
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Annotated, Literal
+from urllib.parse import quote, quote_plus
 from uuid import uuid4
 
-import qrcode
-from fastapi import FastAPI, HTTPException
-from jsonpath_ng.ext import parse as parse_jsonpath
+import jwt
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from jwcrypto.jwk import JWK
 
-from vclib.common import SDJWTVCVerifier, vp_auth_request, vp_auth_response
+from vclib.common import (
+    IssuerKeyResolutionError,
+    IssuerKeyResolver,
+    SDJWTVCVerifier,
+    compile_jsonpath,
+    vp_auth_request,
+    vp_auth_response,
+)
 from vclib.common.src.metadata import DIDJSONResponse
 
+from .nonce_store import AbstractNonceStore, InMemoryNonceStore
+from .qr_codes import MEDIA_TYPES, QRCodeFormat, QRCodeProfile, QRCodeRenderer
+from .registry import CompiledDefinition, DefinitionRegistry
+from .replay import (
+    DEFAULT_REPLAY_WINDOW,
+    AbstractReplayFilter,
+    BloomReplayFilter,
+    ReplayCache,
+)
+from .request_templates import DefinitionDocument, RequestSigner, RequestTemplate
+from .sealed_state import StateSealer
+from .sessions import DEFAULT_SESSION_TTL, SessionStore, VerificationSession
+
+# Seconds between comments sent to keep idle session event streams open
+SSE_KEEPALIVE_INTERVAL = 15
+
 
 class Verifier:
-    valid_nonces: set[str]
+    nonce_store: AbstractNonceStore
 
     def __init__(
         self,
@@ -19,6 +49,20 @@ class Verifier:
         diddoc_path: str,
         base_url: str,
         extra_provider_metadata: dict = {},
+        *,
+        nonce_store: AbstractNonceStore | None = None,
+        state_secret: bytes | str | None = None,
+        issuer_key_resolver: IssuerKeyResolver | None = None,
+        verification_workers: int | None = None,
+        request_signing_key: JWK | None = None,
+        presentation_definition_by_reference: bool = False,
+        qr_code_cache_size: int = 256,
+        session_ttl: float = DEFAULT_SESSION_TTL,
+        presentation_replay_filter: AbstractReplayFilter | None = None,
+        presentation_replay_window: float = DEFAULT_REPLAY_WINDOW,
+        presentation_replay_digests: bool = True,
+        presentation_definitions_dir: str | None = None,
+        definitions_reload_interval: float | None = None,
     ):
         """
         Initialise the verifier (service provider).
@@ -27,10 +71,79 @@ class Verifier:
         - presentation_definitions(`dict[str, PresentationDefinition]`): A map
           from a string identifying the request type to the corresponding
           presentation definition
+        - diddoc_path(`str`): Path to the verifier's DIDDoc
+        - base_url(`str`): The URL the verifier is served at
+        - extra_provider_metadata(`dict`): Client metadata sent with requests
+        - nonce_store(`AbstractNonceStore | None`): Where outstanding
+          authorization requests are kept. Defaults to an `InMemoryNonceStore`;
+          use a shared store (e.g. `SQLiteNonceStore`) when running several
+          workers.
+        - state_secret(`bytes | str | None`): If given, the verifier runs
+          statelessly: the nonce and definition id are sealed into each request's
+          `state` with this secret instead of being stored, so any worker sharing
+          the secret can check the response. Replays are rejected by a per-worker
+          `ReplayCache`.
+        - issuer_key_resolver(`IssuerKeyResolver | None`): Used by the default
+          `cb_get_issuer_key` to look up issuers' keys. Needed unless
+          `cb_get_issuer_key` is overridden; leaving both out is deprecated.
+        - verification_workers(`int | None`): Size of the thread pool presented
+          tokens are verified in. Defaults to `ThreadPoolExecutor`'s default.
+        - request_signing_key(`JWK | None`): If given, authorization requests are
+          served as signed request objects (JAR), signed with this key
+        - presentation_definition_by_reference(`bool`): If `True`, requests refer
+          to their presentation definition with `presentation_definition_uri`,
+          a versioned URL the definition is served at with immutable caching,
+          instead of including it
+        - qr_code_cache_size(`int`): Number of rendered QR code images kept
+        - session_ttl(`float`): Seconds a verification session started with
+          `create_session` is kept for
+        - presentation_replay_filter(`AbstractReplayFilter | None`): Remembers
+          accepted presentations (see `presentation_replay_digests`), so that
+          each can only be presented once.
+          Defaults to a fixed-size `BloomReplayFilter`; pass a `ReplayCache` to
+          remember them exactly instead.
+        - presentation_replay_window(`float`): Seconds a presented credential is
+          remembered for
+        - presentation_replay_digests(`bool`): If `True` (the default), every
+          presented token is remembered by its digest, so the same credential
+          and disclosures can't be presented twice within the window. If
+          `False`, only the `nonce` and `jti` of key binding JWTs are
+          remembered, for wallets that present without key binding and so
+          honestly send the same token each time.
+        - presentation_definitions_dir(`str | None`): A directory of JSON or YAML
+          presentation definitions to accept, in addition to
+          `presentation_definitions`. See `DefinitionRegistry`.
+        - definitions_reload_interval(`float | None`): If given, the directory is
+          checked for changes this often, in seconds, and reloaded without a
+          restart
         """
-        self.valid_nonces = set()
-        self.presentation_definitions = presentation_definitions
-        self.base_url = base_url
+        self.nonce_store = nonce_store or InMemoryNonceStore()
+        self.state_sealer = StateSealer(state_secret) if state_secret else None
+        self.replay_cache = ReplayCache()
+        self.presentation_replay_window = presentation_replay_window
+        self.presentation_replay_digests = presentation_replay_digests
+        self.presentation_replay_filter = (
+            presentation_replay_filter
+            or BloomReplayFilter(window=presentation_replay_window)
+        )
+        self.sessions = SessionStore(session_ttl)
+        if (
+            issuer_key_resolver is None
+            and type(self).cb_get_issuer_key is Verifier.cb_get_issuer_key
+        ):
+            warnings.warn(
+                "Creating a Verifier without an issuer_key_resolver, or an "
+                "overridden cb_get_issuer_key, is deprecated and will be an error "
+                "in a future release. Presentations can't be verified without one.",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+        self.issuer_key_resolver = issuer_key_resolver
+        self.verification_pool = ThreadPoolExecutor(
+            max_workers=verification_workers, thread_name_prefix="vp-verify"
+        )
+        self._base_url = base_url
+        self.qr_code_renderer = QRCodeRenderer(qr_code_cache_size)
         self.extra_provider_metadata = extra_provider_metadata
 
         try:
@@ -41,12 +154,50 @@ class Verifier:
         except ValueError as e:
             raise ValueError(f"Invalid DIDDoc provided: {e}")
 
+        self.request_signer = None
+        if request_signing_key:
+            kid = next(iter(self.diddoc.authentication), None)
+            self.request_signer = RequestSigner(request_signing_key, kid)
+        self.presentation_definition_by_reference = presentation_definition_by_reference
+        self.registry = DefinitionRegistry(
+            self.make_request_template,
+            presentation_definitions,
+            directory=presentation_definitions_dir,
+        )
+        if presentation_definitions_dir and definitions_reload_interval:
+            self.registry.watch(definitions_reload_interval)
+
+    @property
+    def base_url(self) -> str:
+        """The URL the verifier is served at."""
+        return self._base_url
+
+    @base_url.setter
+    def base_url(self, base_url: str):
+        self._base_url = base_url
+        # the response URI is baked into each request template
+        self.registry.load(self.presentation_definitions, recompile=True)
+
+    @property
+    def presentation_definitions(
+        self,
+    ) -> dict[str, vp_auth_request.PresentationDefinition]:
+        """The presentation definitions currently accepted, by reference."""
+        return {ref: c.definition for ref, c in self.registry.current.items()}
+
     def get_server(self) -> FastAPI:
         router = FastAPI()
         router.get("/.well-known/did.json")(self.get_did_json)
-        router.get("/presentationdefs")(self.get_presentation_definition)
-        router.post("/request/{ref}")(self.fetch_authorization_request)
+        router.get("/presentationdefs")(self.serve_presentation_definition)
+        router.get("/presentationdefs/{ref}/{digest}")(
+            self.serve_presentation_definition_version
+        )
+        router.post("/request/{ref}")(self.serve_authorization_request)
+        router.get("/qr/{ref}")(self.serve_presentation_qr_code)
         router.post("/cb")(self.parse_authorization_response)
+        router.post("/sessions/{ref}")(self.create_session)
+        router.get("/sessions/{session_id}")(self.get_session_result)
+        router.get("/sessions/{session_id}/events")(self.stream_session_result)
         return router
 
     async def get_did_json(self) -> DIDJSONResponse:
@@ -70,18 +221,148 @@ class Verifier:
         ### Returns
         - `PresentationDefinition`: Presentation definition
         """
-        if ref not in self.presentation_definitions:
+        compiled = self.registry.get(ref)
+        if compiled is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"Presentation definition matching ref '{ref}' not found",
             )
-        return self.presentation_definitions[ref]
+        return compiled.definition
+
+    def presentation_definition_uri(self, ref: str, digest: str | None = None) -> str:
+        """
+        The versioned URL a definition for `ref` is served at: the version with
+        the given `digest`, or the current one.
+        """
+        digest = digest or self.registry.current[ref].digest
+        return f"{self.base_url}/presentationdefs/{ref}/{digest}"
+
+    def _definition_response(
+        self,
+        ref: str,
+        digest: str | None,
+        if_none_match: str | None,
+    ) -> Response:
+        compiled = self.registry.get(ref, digest)
+        if compiled is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Presentation definition matching ref '{ref}' not found",
+            )
+        document = compiled.document
+        headers = {
+            "ETag": document.etag,
+            # Versioned URLs never change; the plain one must be revalidated
+            "Cache-Control": "public, max-age=31536000, immutable"
+            if digest
+            else "no-cache",
+        }
+        if document.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        return Response(
+            content=document.body, media_type="application/json", headers=headers
+        )
+
+    async def serve_presentation_definition(
+        self, ref: str, if_none_match: Annotated[str | None, Header()] = None
+    ) -> Response:
+        """
+        Serves the current presentation definition for `ref`, with an ETag.
+
+        ### Parameters
+        - ref(`str`): Credential ID
+        - if_none_match(`str | None`): ETags the client already has
+        """
+        return self._definition_response(ref, None, if_none_match)
+
+    async def serve_presentation_definition_version(
+        self,
+        ref: str,
+        digest: str,
+        if_none_match: Annotated[str | None, Header()] = None,
+    ) -> Response:
+        """
+        Serves a presentation definition at its versioned URL, which can be
+        cached indefinitely. See `presentation_definition_uri`.
+
+        ### Parameters
+        - ref(`str`): Credential ID
+        - digest(`str`): The definition's content digest
+        - if_none_match(`str | None`): ETags the client already has
+        """
+        return self._definition_response(ref, digest, if_none_match)
+
+    def make_request_template(
+        self,
+        ref: str,
+        presentation_definition: vp_auth_request.PresentationDefinition,
+        document: DefinitionDocument | None = None,
+    ) -> RequestTemplate:
+        """
+        Builds and validates the parts of an authorization request that are the
+        same for every request for a presentation definition.
+        """
+        if self.presentation_definition_by_reference:
+            document = document or DefinitionDocument.from_definition(
+                presentation_definition
+            )
+            definition = {
+                "presentation_definition_uri": self.presentation_definition_uri(
+                    ref, document.digest
+                )
+            }
+        else:
+            definition = {"presentation_definition": presentation_definition}
+        return RequestTemplate(
+            vp_auth_request.AuthorizationRequestObject(
+                client_id=self.diddoc.id,
+                client_metadata=self.extra_provider_metadata,
+                response_uri=f"{self.base_url}/cb",
+                nonce="",
+                **definition,
+            ),
+            self.request_signer,
+        )
+
+    def _new_transaction(
+        self, ref: str, state: str | None = None
+    ) -> tuple[CompiledDefinition, str, str]:
+        compiled = self.registry.get(ref)
+        if compiled is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Reference {ref} is not an accepted presentation definition",
+            )
+        if state is not None:
+            # the request was already created along with the session, possibly
+            # for an earlier version of the definition
+            session = self.sessions.for_state(state)
+            if session is None or session.definition_id != ref:
+                raise HTTPException(
+                    status_code=404, detail="Unknown or expired session"
+                )
+            compiled = self.registry.get(ref, session.digest) or compiled
+            return compiled, session.nonce, session.state
+
+        nonce = str(uuid4())
+        if self.state_sealer:
+            state = self.state_sealer.seal(nonce, ref, compiled.digest)
+        else:
+            state = str(uuid4())
+            self.nonce_store.add(
+                state,
+                json.dumps(
+                    {"nonce": nonce, "definition_id": ref, "digest": compiled.digest}
+                ),
+            )
+        return compiled, nonce, state
 
     async def fetch_authorization_request(
         self,
         ref: str,
         wallet_metadata: dict | None = None,
         wallet_nonce: str | None = None,
+        state: str | None = None,
     ) -> vp_auth_request.AuthorizationRequestObject:
         """
         Returns authorization request.
@@ -90,27 +371,41 @@ class Verifier:
         - ref(`str`): Credential ID
         - wallet_metadata(`dict | None`): Any wallet metadata
         - wallet_nonce(`str | None`): A wallet-generated nonce to prevent replay attacks
+        - state(`str | None`): The state of the request created along with a
+          session, from its request link (see `create_session`)
 
         ### Returns
         - `AuthorizationRequestObject`: Authorization request information
         """
-        if ref not in self.presentation_definitions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Reference {ref} is not an accepted presentation definition",
-            )
+        compiled, nonce, state = self._new_transaction(ref, state)
+        return compiled.template.build(nonce, state, wallet_nonce)
 
-        while (nonce := str(uuid4())) in self.valid_nonces:
-            continue
-        self.valid_nonces.add(nonce)
+    async def serve_authorization_request(
+        self,
+        ref: str,
+        wallet_metadata: dict | None = None,
+        wallet_nonce: str | None = None,
+        state: str | None = None,
+    ) -> Response:
+        """
+        Returns authorization request, serialised from a prebuilt template. The
+        request is a signed JWT if the verifier has a `request_signing_key`,
+        otherwise JSON.
 
-        return vp_auth_request.AuthorizationRequestObject(
-            client_id=self.diddoc.id,
-            client_metadata=self.extra_provider_metadata,
-            presentation_definition=self.presentation_definitions[ref],
-            response_uri=f"{self.base_url}/cb",
-            nonce=nonce,
-            wallet_nonce=wallet_nonce,
+        ### Parameters
+        - ref(`str`): Credential ID
+        - wallet_metadata(`dict | None`): Any wallet metadata
+        - wallet_nonce(`str | None`): A wallet-generated nonce to prevent replay attacks
+        - state(`str | None`): The state of the request created along with a
+          session, from its request link (see `create_session`)
+
+        ### Returns
+        - `Response`: Authorization request information
+        """
+        compiled, nonce, state = self._new_transaction(ref, state)
+        return Response(
+            content=compiled.template.render(nonce, state, wallet_nonce),
+            media_type=compiled.template.media_type,
         )
 
     async def parse_authorization_response(
@@ -122,27 +417,89 @@ class Verifier:
         ### Body
         - vp_token(`str | list[str]`): Presented credentials
         - presentation_submission(`PresentationSubmissionObject`): Submission info
-        - state(`str`)
+        - state(`str`): The `state` of the authorization request being answered
         """
 
-        # get presentation definition
-        if (
+        # get presentation definition; earlier versions may still be answered
+        if not self.registry.versions(
             auth_response.presentation_submission.definition_id
-            not in self.presentation_definitions
         ):
             raise HTTPException(
                 status_code=400,
                 detail="Specified definition_id does not match a supported presentation definition",  # noqa: E501
             )
-        presentation_definition = self.presentation_definitions[
-            auth_response.presentation_submission.definition_id
-        ]
+
+        # consume the matching request; each may only be answered once
+        transaction = self.consume_transaction(auth_response.state)
+        if transaction is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Unknown, expired or already answered authorization request",
+            )
+
+        # report the outcome to the frontend waiting on the session, if any
+        session = self.sessions.for_state(auth_response.state)
+        try:
+            disclosed_fields = await self._check_presentation(
+                auth_response, transaction
+            )
+        except HTTPException as e:
+            if session:
+                session.reject(e.detail)
+            raise
+        if session:
+            session.complete(disclosed_fields)
+
+        return {"status": "OK"}
+
+    async def _check_presentation(
+        self,
+        auth_response: vp_auth_response.AuthorizationResponseObject,
+        transaction: dict,
+    ) -> dict[str, dict]:
+        """
+        Verifies the credentials in a response to a known request, and checks
+        them against its presentation definition.
+
+        ### Returns
+        - `dict[str, dict]`: Fields disclosed by each credential, keyed by
+          descriptor id
+        """
+        if (
+            transaction["definition_id"]
+            != auth_response.presentation_submission.definition_id
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail="definition_id does not match the authorization request",
+            )
+        # check against the version of the definition that was requested
+        compiled = self.registry.get(
+            transaction["definition_id"], transaction.get("digest")
+        ) or self.registry.get(transaction["definition_id"])
+        if compiled is None:
+            raise HTTPException(
+                status_code=400,
+                detail="The requested presentation definition is no longer supported",
+            )
+        presentation_definition = compiled.definition
 
         # get presented fields
+        descriptor_ids = {d.id for d in presentation_definition.input_descriptors}
         presented_tokens = {}
         for descriptor in auth_response.presentation_submission.descriptor_map:
+            if descriptor.id not in descriptor_ids:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Descriptor {descriptor.id} is not in the presentation definition",  # noqa: E501
+                )
+            if descriptor.id in presented_tokens:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Descriptor {descriptor.id} mapped more than once",
+                )
             try:
-                match = parse_jsonpath(descriptor.path).find(auth_response.vp_token)
+                match = compile_jsonpath(descriptor.path).find(auth_response.vp_token)
             except Exception:
                 raise HTTPException(
                     status_code=400,
@@ -155,38 +512,291 @@ class Verifier:
                 )
             presented_tokens[descriptor.id] = match[0].value
 
-        # verify jwts
-        disclosed_fields = {}
+        # verify jwts, concurrently and off the event loop
+        loop = asyncio.get_running_loop()
         try:
-            for token in presented_tokens.values():
-                disclosed_field = SDJWTVCVerifier(
-                    token, self.cb_get_issuer_key
-                ).get_verified_payload()
-                if not isinstance(disclosed_fields, dict):
-                    raise Exception("Selective disclosures not in key-value pairs")
-                disclosed_fields |= disclosed_field
+            verified = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        self.verification_pool,
+                        self.verify_token,
+                        token,
+                        transaction["nonce"],
+                    )
+                    for token in presented_tokens.values()
+                )
+            )
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"JWT verification failed: {e}")
+        disclosed_fields = dict(zip(presented_tokens, verified, strict=True))
 
-        self.validate_disclosed_fields(presentation_definition, disclosed_fields)
+        try:
+            self.validate_disclosed_fields(
+                presentation_definition, disclosed_fields, ref=compiled.ref
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=400, detail=f"Disclosed fields not accepted: {e}"
+            )
 
-        return {"status": "OK"}
+        # only remembered once accepted, so a rejected presentation can be
+        # corrected and sent again
+        expires_at = time() + self.presentation_replay_window
+        keys = _replay_keys(
+            presented_tokens.values(), digests=self.presentation_replay_digests
+        )
+        for key in keys:
+            if not self.presentation_replay_filter.check_and_add(key, expires_at):
+                raise HTTPException(
+                    status_code=400, detail="Presentation has already been used"
+                )
+        return disclosed_fields
+
+    def verify_token(self, token: str, nonce: str) -> dict:
+        """
+        Verifies a single presented credential. Called from a worker thread.
+
+        ### Parameters
+        - token(`str`): The presented SD-JWT-VC
+        - nonce(`str`): The nonce of the authorization request being answered
+
+        ### Returns
+        - `dict`: The credential's verified payload, with disclosures applied
+
+        ### Raises
+        - `Exception`: If the credential cannot be verified
+        """
+        # a key binding JWT, if present, must answer this request
+        kb = not token.endswith("~")
+        payload = SDJWTVCVerifier(
+            token,
+            self.cb_get_issuer_key,
+            expected_aud=self.diddoc.id if kb else None,
+            expected_nonce=nonce if kb else None,
+        ).get_verified_payload()
+        if not isinstance(payload, dict):
+            raise Exception("Selective disclosures not in key-value pairs")
+        return payload
+
+    def consume_transaction(self, state: str | None) -> dict | None:
+        """
+        Looks up the authorization request a response answers, so that it cannot
+        be answered again.
+
+        ### Parameters
+        - state(`str | None`): The `state` posted with the response
+
+        ### Returns
+        - `dict | None`: The request's `nonce` and `definition_id`, or `None` if
+          the request is unknown, has expired or was already answered
+        """
+        if not state:
+            return None
+        if self.state_sealer:
+            transaction = self.state_sealer.unseal(state)
+            if transaction is None or not self.replay_cache.check_and_add(
+                transaction["nonce"], transaction["exp"]
+            ):
+                return None
+            return transaction
+        transaction = self.nonce_store.consume(state)
+        return json.loads(transaction) if transaction is not None else None
+
+    def presentation_request_link(
+        self, presentation_definition_key: str, state: str | None = None
+    ) -> str:
+        """
+        The data encoded in the QR code for a presentation definition, for the
+        request with the given `state` if it was created with a session.
+        """
+        link = (
+            f"request_uri={quote_plus(self.base_url)}%2Frequest%2F"
+            f"{presentation_definition_key}"
+        )
+        if state:
+            link += quote_plus(f"?state={quote(state, safe='')}")
+        return link
+
+    async def create_session(self, ref: str) -> dict:
+        """
+        Starts a verification session, so that a frontend can learn the outcome
+        of the presentation as soon as the wallet responds. Show the wallet the
+        returned `request_link` (or the QR code at `/qr/{ref}?session_id=...`),
+        then wait on `/sessions/{session_id}` or `/sessions/{session_id}/events`.
+
+        The `session_id` is a secret for the relying party, needed to read the
+        disclosed claims. It never appears in the request link, which only
+        carries the request's `state`.
+
+        ### Parameters
+        - ref(`str`): Credential ID
+
+        ### Returns
+        - `dict`: The `session_id` and the `request_link` for the wallet
+        """
+        compiled, nonce, state = self._new_transaction(ref)
+        session = self.sessions.create(state, ref, nonce, compiled.digest)
+        return {
+            "session_id": session.id,
+            "request_link": self.presentation_request_link(ref, session.state),
+        }
+
+    def _get_session(self, session_id: str) -> VerificationSession:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired session")
+        return session
+
+    async def get_session_result(
+        self, session_id: str, wait: Annotated[float, Query(ge=0, le=60)] = 0
+    ) -> dict:
+        """
+        Long-polls a verification session.
+
+        ### Parameters
+        - session_id(`str`): The session, from `create_session`
+        - wait(`float`): Seconds to wait for the wallet's response before
+          answering with a `pending` status
+
+        ### Returns
+        - `dict`: The session's `status` (`pending`, `verified` or `rejected`),
+          and its disclosed `claims` or `error`
+        """
+        session = self._get_session(session_id)
+        await session.wait(wait)
+        return session.result()
+
+    async def stream_session_result(self, session_id: str) -> StreamingResponse:
+        """
+        Streams a verification session's outcome as server-sent events: a single
+        `result` event once the wallet's response has been checked, or an
+        `expired` event if the session expires first.
+
+        ### Parameters
+        - session_id(`str`): The session, from `create_session`
+        """
+        session = self._get_session(session_id)
+
+        async def events():
+            while not await session.wait(SSE_KEEPALIVE_INTERVAL):
+                if self.sessions.get(session_id) is not session:
+                    yield "event: expired\ndata: {}\n\n"
+                    return
+                yield ": keepalive\n\n"
+            yield f"event: result\ndata: {json.dumps(session.result())}\n\n"
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-store"},
+        )
 
     def create_presentation_qr_code(
-        self, presentation_definition_key: str, image_path: str
+        self,
+        presentation_definition_key: str,
+        image_path: str,
+        fmt: QRCodeFormat = "png",
+        profile: QRCodeProfile = QRCodeProfile(),
     ):
         """### Parameters
         - presentation_definition_key(`str`): The key in the `presentation_definitions`
           dict matching the desired presentation definition
         - image_path(`str`): Where to save the QR code image
+        - fmt(`str`): `png` or `svg`
+        - profile(`QRCodeProfile`): Size and error correction of the code
         """
-        img = qrcode.make(
-            f"request_uri={quote_plus(self.base_url)}%2Frequest%2F{presentation_definition_key}"
+        image = self.qr_code_renderer.render(
+            self.presentation_request_link(presentation_definition_key), fmt, profile
+        )
+        with open(image_path, "wb") as image_file:
+            image_file.write(image)
+
+    def prerender_qr_codes(
+        self,
+        refs: list[str] | None = None,
+        formats: tuple[QRCodeFormat, ...] = ("png", "svg"),
+        profile: QRCodeProfile = QRCodeProfile(),
+    ) -> dict[tuple[str, str], bytes]:
+        """
+        Renders QR codes for several presentation definitions at once, e.g. for
+        printing signage. They are also kept for `serve_presentation_qr_code`.
+
+        ### Parameters
+        - refs(`list[str] | None`): Keys of the presentation definitions to render.
+          Defaults to all of them.
+        - formats(`tuple[str, ...]`): Formats to render each code in
+        - profile(`QRCodeProfile`): Size and error correction of the codes
+
+        ### Returns
+        - `dict[tuple[str, str], bytes]`: Each image, keyed by presentation
+          definition key and format
+        """
+        refs = list(self.registry.current) if refs is None else refs
+        images = self.qr_code_renderer.prerender(
+            map(self.presentation_request_link, refs), formats, profile
+        )
+        return {
+            (ref, fmt): images[(self.presentation_request_link(ref), fmt)]
+            for ref in refs
+            for fmt in formats
+        }
+
+    async def serve_presentation_qr_code(
+        self,
+        ref: str,
+        fmt: Annotated[Literal["png", "svg"], Query(alias="format")] = "png",
+        box_size: Annotated[int, Query(ge=1, le=100)] = 10,
+        border: Annotated[int, Query(ge=0, le=20)] = 4,
+        error_correction: Literal["L", "M", "Q", "H"] = "M",
+        session_id: str | None = None,
+    ) -> Response:
+        """
+        Serves the QR code a wallet scans to start a presentation.
+
+        ### Parameters
+        - ref(`str`): Credential ID
+        - fmt(`str`): `png` or `svg`, given as the `format` query parameter
+        - box_size(`int`): Size of each module, in pixels for PNGs
+        - border(`int`): Width of the quiet zone, in modules
+        - error_correction(`str`): Error correction level, `L`, `M`, `Q` or `H`
+        - session_id(`str | None`): The session whose request to encode, if any
+          (see `create_session`)
+
+        ### Returns
+        - `Response`: The image
+
+        ### Raises
+        - `HTTPException`: 404 if there is no such definition, or `session_id`
+          is not a live session for it
+        """
+        if ref not in self.registry:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Presentation definition matching ref '{ref}' not found",
+            )
+        state = None
+        if session_id is not None:
+            session = self.sessions.get(session_id)
+            if session is None or session.definition_id != ref:
+                raise HTTPException(status_code=404, detail="Session not found")
+            state = session.state
+        image = await self.qr_code_renderer.render_async(
+            self.presentation_request_link(ref, state),
+            fmt,
+            QRCodeProfile(box_size, border, error_correction),
+        )
+        return Response(
+            content=image,
+            media_type=MEDIA_TYPES[fmt],
+            # a session's code is only for whoever created the session
+            headers={"Cache-Control": "no-store" if state else "public, max-age=3600"},
         )
-        img.save(image_path)
 
     def cb_get_issuer_key(self, iss: str, headers: dict) -> JWK:
-        """## !!! This function must be `@override`n !!!
+        """Looks up the issuer's key with `issuer_key_resolver`. If no resolver is
+        given when the verifier is created, this function must be `@override`n.
 
         ### Parameters
         - iss(`str`): JWT issuer claim (URI)
@@ -197,21 +807,57 @@ class Verifier:
 
         ### Raises
         - `Exception`: If the issuer is not trusted
+        - `IssuerKeyResolutionError`: If there is no `issuer_key_resolver`
         """
+        if self.issuer_key_resolver is None:
+            raise IssuerKeyResolutionError(
+                "The verifier has no issuer_key_resolver configured"
+            )
+        return self.issuer_key_resolver(iss, headers)
 
     def validate_disclosed_fields(
         self,
         presentation_definition: vp_auth_request.PresentationDefinition,
-        disclosed_fields: dict,
+        disclosed_fields: dict[str, dict],
+        *,
+        ref: str | None = None,
     ) -> bool:
-        """## !!! This function must be `@override`n !!!
+        """
+        Checks the disclosed fields satisfy every required field of the
+        presentation definition, using its precompiled `EvaluationPlan`. Override
+        this to apply further checks.
 
         ### Parameters
         - presentation_definition(`PresentationDefinition`): Relevant presentation
           definition
-        - disclosed_fields(`dict`): Fields disclosed in presentation
+        - disclosed_fields(`dict[str, dict]`): Fields disclosed in the
+          presentation, keyed by the id of the descriptor (in the presentation
+          submission) each credential was presented for
+        - ref(`str | None`): The reference the definition is registered under.
+          Defaults to its `id`.
 
         ### Raises
         - `Exception`: If the disclosed fields are not satisfactory (by whatever
           standard)
         """
+        self.registry.plan_for(presentation_definition, ref).evaluate(disclosed_fields)
+        return True
+
+
+def _replay_keys(tokens, *, digests: bool = False) -> set[str]:
+    """
+    What identifies a presentation: the `nonce` and `jti` of any key binding
+    JWT, and if `digests`, the digest of each presented token.
+    """
+    keys = set()
+    for token in tokens:
+        if digests:
+            keys.add("vp:" + hashlib.sha256(token.encode()).hexdigest())
+        kb_jwt = token.rpartition("~")[2]
+        if kb_jwt:
+            kb = jwt.decode(kb_jwt, options={"verify_signature": False})
+            if kb.get("nonce"):
+                keys.add(f"kb-nonce:{kb['nonce']}")
+            if kb.get("jti"):
+                keys.add(f"kb-jti:{kb['jti']}")
+    return keys
@@ -1,11 +1,26 @@
+import asyncio
 import os
+import time
 
+import jwt
 import pytest
+import yaml
 from fastapi import HTTPException
 from jwcrypto.jwk import JWK
 
 from vclib.common import vp_auth_request, vp_auth_response
-from vclib.verifier import Verifier
+from vclib.verifier import (
+    BloomReplayFilter,
+    DefinitionRegistry,
+    EvaluationPlan,
+    InMemoryNonceStore,
+    PresentationValidationError,
+    QRCodeProfile,
+    ReplayCache,
+    SQLiteNonceStore,
+    StateSealer,
+    Verifier,
+)
 
 
 @pytest.fixture
@@ -47,12 +62,80 @@ def verifier(presentation_definition) -> Verifier:
     )
 
 
+@pytest.fixture
+def stateless_verifiers(verifier) -> list[Verifier]:
+    """Two independent workers sharing a secret"""
+    return [
+        type(verifier)(
+            presentation_definitions=verifier.presentation_definitions,
+            base_url=verifier.base_url,
+            diddoc_path=f"{os.path.dirname(os.path.abspath(__file__))}/test_diddoc.json",
+            state_secret="test-secret",
+        )
+        for _ in range(2)
+    ]
+
+
+@pytest.fixture
+def signing_verifier(verifier) -> Verifier:
+    key = JWK(generate="EC", crv="P-256")
+    signing_verifier = type(verifier)(
+        presentation_definitions=verifier.presentation_definitions,
+        base_url=verifier.base_url,
+        diddoc_path=f"{os.path.dirname(os.path.abspath(__file__))}/test_diddoc.json",
+        request_signing_key=key,
+    )
+    signing_verifier.request_signing_key = key
+    return signing_verifier
+
+
 @pytest.fixture
 def vp_token() -> str:
     with open(f"{os.path.dirname(os.path.abspath(__file__))}/test_vp_token.txt") as f:
         return f.read()
 
 
+def make_response(
+    vp_token: str, definition_id: str, state: str | None
+) -> vp_auth_response.AuthorizationResponseObject:
+    return vp_auth_response.AuthorizationResponseObject(
+        vp_token=vp_token,
+        presentation_submission=vp_auth_response.PresentationSubmissionObject(
+            id="submission_id",
+            definition_id=definition_id,
+            descriptor_map=[
+                vp_auth_response.DescriptorMapObject(
+                    id="over_18_descriptor", format="jwt_vc", path="$"
+                )
+            ],
+        ),
+        state=state,
+    )
+
+
+@pytest.fixture
+def unresolved_verifier(verifier) -> Verifier:
+    with pytest.warns(DeprecationWarning):
+        return Verifier(
+            presentation_definitions=verifier.presentation_definitions,
+            base_url=verifier.base_url,
+            diddoc_path=f"{os.path.dirname(os.path.abspath(__file__))}/test_diddoc.json",
+        )
+
+
+@pytest.mark.asyncio
+async def test_issuer_key_resolver_required(
+    unresolved_verifier, presentation_definition, vp_token
+):
+    unresolved = unresolved_verifier
+    req = await unresolved.fetch_authorization_request(ref=presentation_definition.id)
+    with pytest.raises(HTTPException) as e:
+        await unresolved.parse_authorization_response(
+            make_response(vp_token, presentation_definition.id, req.state)
+        )
+    assert "no issuer_key_resolver" in e.value.detail
+
+
 @pytest.mark.asyncio
 async def test_get_valid_presentation_definition(verifier, presentation_definition):
     assert (
@@ -83,20 +166,9 @@ async def test_fetch_invalid_authorization_request(verifier, presentation_defini
 async def test_parse_valid_authorization_response(
     verifier, presentation_definition, vp_token
 ):
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
     res = await verifier.parse_authorization_response(
-        auth_response=vp_auth_response.AuthorizationResponseObject(
-            vp_token=vp_token,
-            presentation_submission=vp_auth_response.PresentationSubmissionObject(
-                id="submission_id",
-                definition_id=presentation_definition.id,
-                descriptor_map=[
-                    vp_auth_response.DescriptorMapObject(
-                        id="licence", format="jwt_vc", path="$"
-                    )
-                ],
-            ),
-            state="",
-        )
+        auth_response=make_response(vp_token, presentation_definition.id, req.state)
     )
     assert res == {"status": "OK"}
 
@@ -105,20 +177,13 @@ async def test_parse_valid_authorization_response(
 async def test_parse_authorization_response_with_invalid_jwt(
     verifier, presentation_definition, vp_token
 ):
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
     with pytest.raises(HTTPException):
         await verifier.parse_authorization_response(
-            auth_response=vp_auth_response.AuthorizationResponseObject(
-                vp_token=vp_token.capitalize(),  # invalid jwt
-                presentation_submission=vp_auth_response.PresentationSubmissionObject(
-                    id="random_id",
-                    definition_id=presentation_definition.id,
-                    descriptor_map=[
-                        vp_auth_response.DescriptorMapObject(
-                            id="licence", format="jwt_vc", path="$"
-                        )
-                    ],
-                ),
-                state="",
+            auth_response=make_response(
+                vp_token.capitalize(),  # invalid jwt
+                presentation_definition.id,
+                req.state,
             )
         )
 
@@ -127,20 +192,13 @@ async def test_parse_authorization_response_with_invalid_jwt(
 async def test_parse_authorization_response_with_invalid_id(
     verifier, presentation_definition, vp_token
 ):
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
     with pytest.raises(HTTPException):
         await verifier.parse_authorization_response(
-            auth_response=vp_auth_response.AuthorizationResponseObject(
-                vp_token=vp_token,
-                presentation_submission=vp_auth_response.PresentationSubmissionObject(
-                    id="random_id",
-                    definition_id="random_id",  # invalid id
-                    descriptor_map=[
-                        vp_auth_response.DescriptorMapObject(
-                            id="licence", format="jwt_vc", path="$"
-                        )
-                    ],
-                ),
-                state="",
+            auth_response=make_response(
+                vp_token,
+                "random_id",  # invalid id
+                req.state,
             )
         )
 
@@ -149,19 +207,609 @@ async def test_parse_authorization_response_with_invalid_id(
 async def test_parse_authorization_response_with_invalid_path(
     verifier, presentation_definition, vp_token
 ):
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
     with pytest.raises(HTTPException):
         await verifier.parse_authorization_response(
             auth_response=vp_auth_response.AuthorizationResponseObject(
                 vp_token=vp_token,
                 presentation_submission=vp_auth_response.PresentationSubmissionObject(
                     id="random_id",
-                    definition_id="random_id",
+                    definition_id=presentation_definition.id,
                     descriptor_map=[
                         vp_auth_response.DescriptorMapObject(
-                            id="licence", format="jwt_vc", path="$"
+                            id="over_18_descriptor", format="jwt_vc", path="$.missing"
                         )
                     ],  # invalid path
                 ),
-                state="",
+                state=req.state,
+            )
+        )
+
+
+@pytest.mark.asyncio
+async def test_parse_authorization_response_without_request(
+    verifier, presentation_definition, vp_token
+):
+    with pytest.raises(HTTPException) as e:
+        await verifier.parse_authorization_response(
+            auth_response=make_response(
+                vp_token, presentation_definition.id, "unknown_state"
+            )
+        )
+    assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_parse_authorization_response_replayed(
+    verifier, presentation_definition, vp_token
+):
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
+    response = make_response(vp_token, presentation_definition.id, req.state)
+    assert await verifier.parse_authorization_response(response) == {"status": "OK"}
+    with pytest.raises(HTTPException):
+        await verifier.parse_authorization_response(response)
+    assert len(verifier.nonce_store) == 0
+
+
+@pytest.mark.parametrize(
+    "make_store",
+    [
+        lambda ttl, max_size, path: InMemoryNonceStore(ttl, max_size),
+        lambda ttl, max_size, path: SQLiteNonceStore(
+            path, ttl, max_size, purge_interval=1
+        ),
+    ],
+    ids=["memory", "sqlite"],
+)
+def test_nonce_store(make_store, tmp_path):
+    store = make_store(60, 2, str(tmp_path / "nonces.db"))
+    store.add("a", "1")
+    assert store.consume("a") == "1"
+    assert store.consume("a") is None  # single use
+
+    for key in ["b", "c", "d"]:
+        store.add(key, key)
+    assert len(store) == 2  # oldest evicted
+    assert store.consume("b") is None
+    assert store.consume("d") == "d"
+
+
+def test_nonce_store_expiry(tmp_path):
+    store = InMemoryNonceStore(ttl=60)
+    store._store.clock = lambda: 0
+    store.add("a", "1")
+    store._store.clock = lambda: 61
+    assert store.consume("a") is None
+
+    store = SQLiteNonceStore(str(tmp_path / "nonces.db"), ttl=0.01)
+    store.add("a", "1")
+    time.sleep(0.02)
+    assert store.purge_expired() == 1
+    assert store.consume("a") is None
+
+
+def test_sqlite_nonce_store_shared(tmp_path):
+    path = str(tmp_path / "nonces.db")
+    first, second = SQLiteNonceStore(path), SQLiteNonceStore(path)
+    first.add("a", "1")
+    assert second.consume("a") == "1"
+    assert first.consume("a") is None
+
+
+def test_sqlite_nonce_store_shared_max_size(tmp_path):
+    path = str(tmp_path / "nonces.db")
+    workers = [SQLiteNonceStore(path, max_size=3) for _ in range(2)]
+    for i in range(8):
+        workers[i % 2].add(str(i), "value")
+        assert len(workers[0]) == min(i + 1, 3)
+    assert workers[0].consume("0") is None
+    assert workers[1].consume("7") == "value"
+
+
+@pytest.mark.asyncio
+async def test_stateless_authorization_response(
+    stateless_verifiers, presentation_definition, vp_token
+):
+    worker, other_worker = stateless_verifiers
+    req = await worker.fetch_authorization_request(ref=presentation_definition.id)
+    assert len(worker.nonce_store) == 0
+
+    # any worker with the same secret can check the response, but only once
+    response = make_response(vp_token, presentation_definition.id, req.state)
+    assert await other_worker.parse_authorization_response(response) == {"status": "OK"}
+    with pytest.raises(HTTPException):
+        await other_worker.parse_authorization_response(response)
+
+
+@pytest.mark.asyncio
+async def test_stateless_authorization_response_tampered(
+    stateless_verifiers, presentation_definition, vp_token
+):
+    stateless_verifier = stateless_verifiers[0]
+    req = await stateless_verifier.fetch_authorization_request(
+        ref=presentation_definition.id
+    )
+    payload, tag = req.state.split(".")
+    for state in [f"{payload}x.{tag}", f"{payload}.{tag[::-1]}", payload]:
+        with pytest.raises(HTTPException):
+            await stateless_verifier.parse_authorization_response(
+                make_response(vp_token, presentation_definition.id, state)
+            )
+
+
+def test_state_sealer():
+    now = 1_000_000
+    sealer = StateSealer("secret", ttl=60, clock=lambda: now)
+    state = sealer.seal("nonce", "definition")
+    assert sealer.unseal(state) == {
+        "nonce": "nonce",
+        "definition_id": "definition",
+        "exp": now + 60,
+    }
+    assert StateSealer("other", clock=lambda: now).unseal(state) is None
+    assert (
+        StateSealer("new", previous_secrets=["secret"], clock=lambda: now).unseal(state)
+        is not None
+    )
+
+    now += 61
+    assert sealer.unseal(state) is None
+
+
+def test_replay_cache():
+    now = 1000
+    cache = ReplayCache(bucket_seconds=10, clock=lambda: now)
+    assert cache.check_and_add("a", now + 15)
+    assert cache.check_and_add("b", now + 45)
+    assert not cache.check_and_add("a", now + 15)
+
+    now += 20  # "a" has expired and its bucket is dropped
+    assert cache.check_and_add("c", now + 15)
+    assert len(cache) == 2
+    assert not cache.check_and_add("b", now + 15)
+
+
+def test_bloom_replay_filter():
+    now = 1000
+    bloom = BloomReplayFilter(
+        window=60, capacity=1000, error_rate=1e-4, bucket_seconds=10, clock=lambda: now
+    )
+    size = bloom.memory_bytes
+    assert all(bloom.check_and_add(str(i), now + 15) for i in range(1000))
+    assert not any(bloom.check_and_add(str(i), now + 15) for i in range(1000))
+    assert bloom.check_and_add("long", now + 3600)  # kept for the window only
+
+    now += 30
+    assert bloom.check_and_add("0", now + 15)
+    assert not bloom.check_and_add("long", now + 15)
+    now += 40
+    assert bloom.check_and_add("long", now + 15)
+    assert bloom.memory_bytes == size
+
+
+@pytest.mark.asyncio
+async def test_parse_authorization_response_presented_twice(
+    verifier, presentation_definition, vp_token
+):
+    # without key binding, an honest wallet sends the same token every time,
+    # which can only be accepted again if presentations aren't keyed by digest
+    verifier.presentation_replay_digests = False
+    for _ in range(2):
+        req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
+        response = make_response(vp_token, presentation_definition.id, req.state)
+        assert await verifier.parse_authorization_response(response)
+
+
+@pytest.mark.asyncio
+async def test_parse_authorization_response_presentation_replayed(
+    verifier, presentation_definition, vp_token
+):
+    # a rejected presentation is not remembered
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
+
+    def reject(*_, **__):
+        raise ValueError("not accepted")
+
+    verifier.validate_disclosed_fields = reject
+    with pytest.raises(HTTPException) as e:
+        await verifier.parse_authorization_response(
+            make_response(vp_token, presentation_definition.id, req.state)
+        )
+    assert e.value.detail.startswith("Disclosed fields not accepted")
+    del verifier.validate_disclosed_fields
+
+    # a new request does not make an already presented credential acceptable
+    for ok in (True, False):
+        req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
+        response = make_response(vp_token, presentation_definition.id, req.state)
+        if ok:
+            assert await verifier.parse_authorization_response(response)
+        else:
+            with pytest.raises(HTTPException) as e:
+                await verifier.parse_authorization_response(response)
+            assert e.value.detail == "Presentation has already been used"
+
+
+def test_evaluation_plan(presentation_definition):
+    plan = EvaluationPlan.compile(presentation_definition)
+    assert plan.evaluate({"over_18_descriptor": {"is_over_18": True}}) == {
+        "over_18_descriptor": {"$.credentialSubject.is_over_18": True}
+    }
+    assert plan.evaluate(
+        {"over_18_descriptor": {"credentialSubject": {"is_over_18": True}}}
+    )
+
+    for disclosed in [{}, {"is_over_18": "true"}, {"is_over_18": False}]:
+        with pytest.raises(PresentationValidationError):
+            plan.evaluate({"over_18_descriptor": disclosed})
+    # only the credential mapped to the descriptor counts
+    with pytest.raises(PresentationValidationError):
+        plan.evaluate({"licence": {"is_over_18": True}})
+    with pytest.raises(PresentationValidationError):
+        plan.evaluate(
+            {"over_18_descriptor": {"is_over_18": False}, "b": {"is_over_18": True}}
+        )
+
+
+def test_evaluation_plan_optional_field():
+    plan = EvaluationPlan.compile(
+        vp_auth_request.PresentationDefinition(
+            id="optional",
+            input_descriptors=[
+                vp_auth_request.InputDescriptor(
+                    id="dob_descriptor",
+                    constraints=vp_auth_request.Constraints(
+                        fields=[
+                            vp_auth_request.Field(
+                                path=["$.birthdate"],
+                                name="birthdate",
+                                filter={"type": "number"},
+                                optional=True,
+                            ),
+                            vp_auth_request.Field(path=["$.given_name"]),
+                        ]
+                    ),
+                )
+            ],
+        )
+    )
+    assert plan.evaluate({"dob_descriptor": {"given_name": "A"}}) == {
+        "dob_descriptor": {"$.given_name": "A"}
+    }
+    assert plan.evaluate(
+        {"dob_descriptor": {"given_name": "A", "birthdate": 2000}}
+    ) == {"dob_descriptor": {"birthdate": 2000, "$.given_name": "A"}}
+    with pytest.raises(PresentationValidationError):
+        plan.evaluate({"dob_descriptor": {"birthdate": 2000}})
+
+
+@pytest.mark.asyncio
+async def test_parse_authorization_response_with_unsatisfied_fields(
+    verifier, presentation_definition, vp_token
+):
+    presentation_definition.input_descriptors[0].constraints.fields[0].filter = {
+        "type": "boolean",
+        "const": False,
+    }
+    verifier.registry.load({presentation_definition.id: presentation_definition})
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
+    with pytest.raises(HTTPException) as e:
+        await verifier.parse_authorization_response(
+            make_response(vp_token, presentation_definition.id, req.state)
+        )
+    assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_parse_authorization_response_with_multiple_tokens(
+    verifier, presentation_definition, vp_token
+):
+    verified = []
+    verify_token = verifier.verify_token
+
+    def record(token: str, nonce: str) -> dict:
+        verified.append(token)
+        return verify_token(token, nonce)
+
+    descriptor = presentation_definition.input_descriptors[0]
+    definition = presentation_definition.model_copy(
+        update={
+            "id": "verify_over_18_twice",
+            "input_descriptors": [
+                descriptor,
+                descriptor.model_copy(update={"id": "second_descriptor"}),
+            ],
+        }
+    )
+    verifier.registry.load({definition.id: definition})
+    verifier.verify_token = record
+    ids = [descriptor.id, "second_descriptor"]
+    for tokens, ids, ok in [
+        ([vp_token, vp_token], ids, True),
+        ([vp_token, "invalid"], ids, False),
+        ([vp_token, vp_token], [ids[0], ids[0]], False),
+        ([vp_token, vp_token], [ids[1], "unknown_descriptor"], False),
+    ]:
+        req = await verifier.fetch_authorization_request(ref=definition.id)
+        response = vp_auth_response.AuthorizationResponseObject(
+            vp_token=tokens,
+            presentation_submission=vp_auth_response.PresentationSubmissionObject(
+                id="submission_id",
+                definition_id=definition.id,
+                descriptor_map=[
+                    vp_auth_response.DescriptorMapObject(
+                        id=ids[i], format="vc+sd-jwt", path=f"$[{i}]"
+                    )
+                    for i in range(len(tokens))
+                ],
+            ),
+            state=req.state,
+        )
+        if ok:
+            assert await verifier.parse_authorization_response(response) == {
+                "status": "OK"
+            }
+        else:
+            with pytest.raises(HTTPException):
+                await verifier.parse_authorization_response(response)
+    assert len(verified) == 4
+
+
+@pytest.mark.asyncio
+async def test_serve_authorization_request(verifier, presentation_definition):
+    res = await verifier.serve_authorization_request(
+        ref=presentation_definition.id, wallet_nonce="wallet"
+    )
+    assert res.media_type == "application/json"
+    request = vp_auth_request.AuthorizationRequestObject.model_validate_json(res.body)
+    assert request.presentation_definition == presentation_definition
+    assert request.wallet_nonce == "wallet"
+    assert request.state in verifier.nonce_store._store
+
+    built = await verifier.fetch_authorization_request(ref=presentation_definition.id)
+    assert request.model_dump(exclude={"nonce", "state", "wallet_nonce"}) == (
+        built.model_dump(exclude={"nonce", "state", "wallet_nonce"})
+    )
+
+    with pytest.raises(HTTPException):
+        await verifier.serve_authorization_request(ref="invalid_definition_id")
+
+
+@pytest.mark.asyncio
+async def test_serve_signed_authorization_request(
+    signing_verifier, presentation_definition
+):
+    key = signing_verifier.request_signing_key
+    for wallet_nonce in [None, "a", "ab", "abc"]:  # every padding length
+        res = await signing_verifier.serve_authorization_request(
+            ref=presentation_definition.id, wallet_nonce=wallet_nonce
+        )
+        assert res.media_type == "application/oauth-authz-req+jwt"
+        claims = jwt.decode(
+            res.body,
+            key.export_to_pem(),
+            algorithms=["ES256"],
+            audience="https://self-issued.me/v2",
+        )
+        assert jwt.get_unverified_header(res.body)["typ"] == "oauth-authz-req+jwt"
+        request = vp_auth_request.AuthorizationRequestObject(**claims)
+        assert request.presentation_definition == presentation_definition
+        assert request.wallet_nonce == wallet_nonce
+        assert claims["iss"] == request.client_id
+
+
+@pytest.mark.asyncio
+async def test_base_url_changed(verifier, presentation_definition):
+    verifier.base_url = "https://moved.example.com"
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
+    assert req.response_uri == "https://moved.example.com/cb"
+
+
+@pytest.mark.asyncio
+async def test_presentation_definition_by_reference(verifier, presentation_definition):
+    verifier.presentation_definition_by_reference = True
+    verifier.registry.load(verifier.presentation_definitions, recompile=True)
+    req = await verifier.fetch_authorization_request(ref=presentation_definition.id)
+    assert req.presentation_definition is None
+    uri = req.presentation_definition_uri
+    assert uri == verifier.presentation_definition_uri(presentation_definition.id)
+
+    ref, digest = uri.split("/")[-2:]
+    res = await verifier.serve_presentation_definition_version(ref, digest)
+    assert res.status_code == 200
+    assert "immutable" in res.headers["Cache-Control"]
+    assert (
+        vp_auth_request.PresentationDefinition.model_validate_json(res.body)
+        == presentation_definition
+    )
+
+    etag = res.headers["ETag"]
+    res = await verifier.serve_presentation_definition_version(
+        ref, digest, if_none_match=etag
+    )
+    assert res.status_code == 304
+    assert not res.body
+
+    res = await verifier.serve_presentation_definition(ref, if_none_match=etag)
+    assert res.status_code == 304
+    assert res.headers["Cache-Control"] == "no-cache"
+
+    with pytest.raises(HTTPException):
+        await verifier.serve_presentation_definition_version(ref, "outdated")
+
+
+@pytest.mark.asyncio
+async def test_serve_presentation_qr_code(verifier, presentation_definition):
+    png = await verifier.serve_presentation_qr_code(presentation_definition.id)
+    assert png.media_type == "image/png"
+    assert png.body.startswith(b"\x89PNG")
+
+    svg = await verifier.serve_presentation_qr_code(
+        presentation_definition.id, fmt="svg", error_correction="H"
+    )
+    assert svg.media_type == "image/svg+xml"
+    assert b"<svg" in svg.body
+
+    again = await verifier.serve_presentation_qr_code(presentation_definition.id)
+    assert again.body is png.body  # served from the cache
+    assert len(verifier.qr_code_renderer) == 2
+
+    with pytest.raises(HTTPException):
+        await verifier.serve_presentation_qr_code("invalid")
+
+
+def test_prerender_qr_codes(verifier, presentation_definition):
+    images = verifier.prerender_qr_codes(formats=("png",))
+    assert list(images) == [(presentation_definition.id, "png")]
+    assert len(verifier.qr_code_renderer) == 1
+
+
+@pytest.mark.asyncio
+async def test_session_result(verifier, presentation_definition, vp_token):
+    session = await verifier.create_session(presentation_definition.id)
+    state = verifier.sessions.get(session["session_id"]).state
+    assert "state%3D" in session["request_link"]
+    req = await verifier.fetch_authorization_request(
+        ref=presentation_definition.id, state=state
+    )
+    assert req.state == state
+
+    pending = await verifier.get_session_result(session["session_id"])
+    assert pending["status"] == "pending"
+
+    waiter = asyncio.create_task(
+        verifier.get_session_result(session["session_id"], wait=5)
+    )
+    await verifier.parse_authorization_response(
+        make_response(vp_token, presentation_definition.id, req.state)
+    )
+    result = await asyncio.wait_for(waiter, 1)
+    assert result["status"] == "verified"
+    assert result["claims"]["over_18_descriptor"]["is_over_18"] is True
+
+
+@pytest.mark.asyncio
+async def test_session_result_rejected(verifier, presentation_definition):
+    session = await verifier.create_session(presentation_definition.id)
+    state = verifier.sessions.get(session["session_id"]).state
+    with pytest.raises(HTTPException):
+        await verifier.parse_authorization_response(
+            make_response("invalid", presentation_definition.id, state)
+        )
+    response = await verifier.stream_session_result(session["session_id"])
+    events = [event async for event in response.body_iterator]
+    assert events[0].startswith("event: result\n")
+    assert '"status": "rejected"' in events[0]
+
+    with pytest.raises(HTTPException) as e:
+        await verifier.get_session_result("unknown")
+    assert e.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_session_result_needs_secret(verifier, presentation_definition):
+    session = await verifier.create_session(presentation_definition.id)
+    state = verifier.sessions.get(session["session_id"]).state
+    assert state != session["session_id"]
+
+    # the request link, and the QR code made from it, only carry the state
+    assert session["session_id"] not in session["request_link"]
+    qr = await verifier.serve_presentation_qr_code(
+        presentation_definition.id, session_id=session["session_id"]
+    )
+    assert qr.body == verifier.qr_code_renderer.render(
+        verifier.presentation_request_link(presentation_definition.id, state),
+        "png",
+        QRCodeProfile(),
+    )
+
+    assert qr.headers["cache-control"] == "no-store"
+
+    # only live sessions have a code
+    for session_id in ("unknown", state):
+        with pytest.raises(HTTPException) as e:
+            await verifier.serve_presentation_qr_code(
+                presentation_definition.id, session_id=session_id
             )
+        assert e.value.status_code == 404
+
+    # which can't be used to read the outcome
+    with pytest.raises(HTTPException) as e:
+        await verifier.get_session_result(state)
+    assert e.value.status_code == 404
+    with pytest.raises(HTTPException):
+        await verifier.stream_session_result(state)
+
+
+def write_definition(
+    directory, definition: vp_auth_request.PresentationDefinition, *, const: bool
+):
+    definition = definition.model_copy(deep=True)
+    definition.input_descriptors[0].constraints.fields[0].filter["const"] = const
+    (directory / "definition.json").write_text(definition.model_dump_json())
+
+
+@pytest.fixture
+def reloading_verifier(verifier, presentation_definition, tmp_path) -> Verifier:
+    write_definition(tmp_path, presentation_definition, const=True)
+    return type(verifier)(
+        presentation_definitions={},
+        base_url=verifier.base_url,
+        diddoc_path=f"{os.path.dirname(os.path.abspath(__file__))}/test_diddoc.json",
+        presentation_definitions_dir=str(tmp_path),
+    )
+
+
+def test_definition_registry_directory(verifier, presentation_definition, tmp_path):
+    other = presentation_definition.model_copy(update={"id": "other"})
+    (tmp_path / "more.yaml").write_text(
+        yaml.safe_dump([other.model_dump(mode="json", exclude_none=True)])
+    )
+    write_definition(tmp_path, presentation_definition, const=True)
+    registry = DefinitionRegistry(
+        verifier.make_request_template,
+        {"static": presentation_definition},
+        directory=str(tmp_path),
+    )
+    assert set(registry.current) == {"static", "other", presentation_definition.id}
+    unchanged = registry.current["other"]
+    assert not registry.reload()
+
+    write_definition(tmp_path, presentation_definition, const=False)
+    assert registry.reload()
+    assert registry.current["other"] is unchanged  # not recompiled
+    assert len(registry.versions(presentation_definition.id)) == 2
+
+    (tmp_path / "broken.json").write_text('{"id": "broken"}')
+    with pytest.raises(ValueError):
+        registry.reload()
+    assert registry.last_error is not None
+    assert "broken" not in registry
+    assert len(registry) == 3
+
+
+def test_plan_for_definition_under_other_ref(verifier, presentation_definition):
+    verifier.registry.load({"static": presentation_definition})
+    compiled = verifier.registry.get("static")
+    assert compiled.definition.id != "static"
+    assert verifier.registry.plan_for(compiled.definition, "static") is compiled.plan
+
+
+@pytest.mark.asyncio
+async def test_reload_keeps_requested_version(
+    reloading_verifier, presentation_definition, vp_token, tmp_path
+):
+    ref = presentation_definition.id
+    old = await reloading_verifier.fetch_authorization_request(ref=ref)
+    write_definition(tmp_path, presentation_definition, const=False)
+    assert reloading_verifier.registry.reload()
+    new = await reloading_verifier.fetch_authorization_request(ref=ref)
+
+    # answered against the version each request was made with
+    assert await reloading_verifier.parse_authorization_response(
+        make_response(vp_token, ref, old.state)
+    )
+    with pytest.raises(HTTPException):
+        await reloading_verifier.parse_authorization_response(
+            make_response(vp_token, ref, new.state)
         )